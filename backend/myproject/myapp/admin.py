@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Lead, Offre, Relation, Facture, Deal, Action, Profil
+from .models import Lead, Offre, Relation, Facture, Deal, Action, Profil, CommercialStats, SequenceFacture
 
 class LeadAdmin(admin.ModelAdmin):
     list_display = ('id', 'created_by', 'company_name', 'contact_name', 'email', 'phone', 'siret', 'status', 'notes', 'declared_at', 'created_at', 'updated_at')
@@ -22,6 +22,12 @@ class ActionAdmin(admin.ModelAdmin):
 class ProfilAdmin(admin.ModelAdmin):
     list_display = ('user', 'entreprise', 'telephone', 'created_at', 'updated_at')
 
+class CommercialStatsAdmin(admin.ModelAdmin):
+    list_display = ('commercial', 'leads_nouveau', 'leads_en_cours', 'leads_converti', 'leads_perdu', 'deals_prospection', 'deals_negociation', 'deals_gagne', 'deals_perdu', 'montant_gagne', 'commission_en_attente', 'updated_at')
+
+class SequenceFactureAdmin(admin.ModelAdmin):
+    list_display = ('prefixe', 'dernier_numero', 'updated_at')
+
 admin.site.register(Lead, LeadAdmin)
 admin.site.register(Offre, OffreAdmin)
 admin.site.register(Relation, RelationAdmin)
@@ -29,3 +35,5 @@ admin.site.register(Facture, FactureAdmin)
 admin.site.register(Deal, DealAdmin)
 admin.site.register(Action, ActionAdmin)
 admin.site.register(Profil, ProfilAdmin)
+admin.site.register(CommercialStats, CommercialStatsAdmin)
+admin.site.register(SequenceFacture, SequenceFactureAdmin)
@@ -0,0 +1,135 @@
+"""
+Authentification JWT sans lecture de auth_user à chaque requête.
+
+Les jetons émis par /login/ et /token/refresh/ portent, signés, les champs
+de l'utilisateur et de son profil lus par l'API (voir USER_CLAIM_FIELDS).
+StatelessJWTAuthentication reconstruit à partir d'eux une instance User
+(champs absents différés : chargés à la demande) et son Profil, sans requête.
+
+Révocation : la base fait foi, le cache (settings.CACHES) n'en garde qu'une copie.
+- L'état du compte (actif, valeurs courantes des champs signés) est relu en base
+  au plus une fois par AUTH_USER_CACHE_TTL secondes et par utilisateur. Seuls les
+  comptes actifs sont mis en cache : un compte désactivé ou supprimé est relu à
+  chaque requête et refusé.
+- Un jeton dont les champs diffèrent de la base (utilisateur ou profil modifié
+  depuis son émission) repasse par la lecture en base (JWTAuthentication
+  standard) jusqu'à son expiration.
+- Toute écriture sur User ou Profil (myapp.signals) efface l'entrée du cache :
+  effet immédiat. Cache vidé, expiré ou écriture sans signal (update()) : effet
+  au plus tard à la lecture suivante en base, jamais de retour à un état révoqué.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import Profil
+
+User = get_user_model()
+
+USER_CLAIM_FIELDS = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'is_superuser')
+PROFIL_CLAIM_FIELDS = ('entreprise', 'telephone')
+PROFIL_CLAIM = 'profil'
+
+
+def _claims_key(user_id):
+    return f'myapp:auth:claims:{user_id}'
+
+
+def _profil_claims(profil):
+    return {field: getattr(profil, field) for field in PROFIL_CLAIM_FIELDS} if profil else None
+
+
+def add_user_claims(token, user):
+    for field in USER_CLAIM_FIELDS:
+        token[field] = getattr(user, field)
+    try:
+        profil = user.profil
+    except Profil.DoesNotExist:
+        profil = None
+    token[PROFIL_CLAIM] = _profil_claims(profil)
+    return token
+
+
+def user_changed(user_id):
+    """Les jetons déjà émis pour cet utilisateur sont recomparés à la base dès la requête suivante"""
+    cache.delete(_claims_key(user_id))
+
+
+def current_claims(user_id):
+    """
+    Champs signés tels qu'en base pour un compte actif, None si le compte est
+    désactivé ou supprimé. Lus en base au plus une fois par TTL ; None n'est
+    jamais mis en cache.
+    """
+    claims = cache.get(_claims_key(user_id))
+    if claims is None:
+        user = User.objects.select_related('profil').filter(pk=user_id, is_active=True).first()
+        if user is None:
+            return None
+        claims = add_user_claims({}, user)
+        cache.set(_claims_key(user_id), claims, settings.AUTH_USER_CACHE_TTL)
+    return claims
+
+
+def token_user(validated_token):
+    """Instance User (et Profil) construite depuis les champs signés du jeton"""
+    user_id = validated_token[api_settings.USER_ID_CLAIM]
+    claims = {'id': user_id, 'is_active': True}
+    claims.update((field, validated_token[field]) for field in USER_CLAIM_FIELDS)
+    # from_db : instance « chargée » (assignable aux clés étrangères), autres champs différés
+    fields = [f.attname for f in User._meta.concrete_fields if f.attname in claims]
+    user = User.from_db(DEFAULT_DB_ALIAS, fields, [claims[name] for name in fields])
+
+    profil_claims = validated_token[PROFIL_CLAIM]
+    profil = None
+    if profil_claims is not None:
+        values = {'user_id': user_id, **profil_claims}
+        fields = [f.attname for f in Profil._meta.concrete_fields if f.attname in values]
+        profil = Profil.from_db(DEFAULT_DB_ALIAS, fields, [values[name] for name in fields])
+        Profil.user.field.set_cached_value(profil, user)
+    # user.profil lu sans requête ; None : Profil.DoesNotExist, comme en base
+    User.profil.related.set_cached_value(user, profil)
+    return user
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication sans SELECT sur auth_user, voir le docstring du module"""
+
+    def get_user(self, validated_token):
+        claims_complete = all(field in validated_token for field in USER_CLAIM_FIELDS + (PROFIL_CLAIM,))
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if not claims_complete or user_id is None:
+            # Jeton émis avant ces champs : lecture en base
+            return super().get_user(validated_token)
+
+        claims = current_claims(user_id)
+        if claims is None:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if any(validated_token[name] != value for name, value in claims.items()):
+            # Jeton émis avant une modification de l'utilisateur ou du profil : lecture en base
+            return super().get_user(validated_token)
+        return token_user(validated_token)
+
+
+class CrmTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class CrmTokenRefreshSerializer(TokenRefreshSerializer):
+    """Nouveau jeton d'accès avec les champs relus en base (ROTATE_REFRESH_TOKENS non géré)"""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        user = User.objects.select_related('profil').filter(pk=user_id).first() if user_id else None
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        return {'access': str(add_user_claims(refresh.access_token, user))}
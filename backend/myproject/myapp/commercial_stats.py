@@ -0,0 +1,134 @@
+"""
+Maintenance des compteurs CommercialStats.
+
+Chaque Lead / Deal "contribue" à quelques compteurs de son commercial.
+À chaque écriture, on retire la contribution de l'ancien état et on ajoute
+celle du nouvel état avec des UPDATE ... SET col = col + delta.
+Les chemins qui passent par queryset.update() (pas de signaux) appellent
+refresh_commercial_stats() pour recalculer les compteurs du commercial,
+ou refresh_lead_counters() pour les seuls compteurs de leads de plusieurs
+commerciaux à la fois.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F, Q, Sum
+
+from .models import CommercialStats, Deal, Lead
+from .taxes import centimes, commission, commission_centimes_expression, taux_commission_effectif
+
+LEAD_STATUS_FIELDS = {value: f'leads_{value}' for value, _label in Lead.LEAD_STATUS_CHOICES}
+DEAL_STAGE_FIELDS = {value: f'deals_{value}' for value, _label in Deal.DEAL_STAGE_CHOICES}
+COUNTER_FIELDS = (
+    list(LEAD_STATUS_FIELDS.values())
+    + list(DEAL_STAGE_FIELDS.values())
+    + ['montant_gagne', 'commission_en_attente']
+)
+
+
+def _as_int(value):
+    # Deal.montant / taux_commission sont des IntegerField : même conversion qu'en base
+    return int(value) if value is not None else None
+
+
+def lead_contribution(state):
+    """state: dict(commercial_id, status) ou None"""
+    if not state or not state['commercial_id']:
+        return {}
+    field = LEAD_STATUS_FIELDS.get(state['status'])
+    return {(state['commercial_id'], field): 1} if field else {}
+
+
+def deal_contribution(state):
+    """state: dict(commercial_id, stage, montant, taux_commission, taux_offre, facture_id) ou None"""
+    if not state or not state['commercial_id']:
+        return {}
+    commercial_id = state['commercial_id']
+    contribution = {}
+    field = DEAL_STAGE_FIELDS.get(state['stage'])
+    if field:
+        contribution[(commercial_id, field)] = 1
+    if state['stage'] == 'gagne':
+        contribution[(commercial_id, 'montant_gagne')] = _as_int(state['montant']) or 0
+        if state['facture_id'] is None:
+            taux = taux_commission_effectif(_as_int(state['taux_commission']), state['taux_offre'])
+            contribution[(commercial_id, 'commission_en_attente')] = commission(
+                _as_int(state['montant']), taux
+            )
+    return contribution
+
+
+def apply_contributions(old, new, create_missing=True):
+    """
+    Applique new - old aux compteurs, un UPDATE par commercial concerné.
+    Sans ligne CommercialStats existante, elle est calculée complètement
+    (sauf pour une suppression : le commercial lui-même peut être en cours de suppression).
+    """
+    deltas = defaultdict(dict)
+    for (commercial_id, field), value in new.items():
+        deltas[commercial_id][field] = deltas[commercial_id].get(field, 0) + value
+    for (commercial_id, field), value in old.items():
+        deltas[commercial_id][field] = deltas[commercial_id].get(field, 0) - value
+
+    for commercial_id, fields in deltas.items():
+        changes = {field: F(field) + delta for field, delta in fields.items() if delta}
+        if not changes:
+            continue
+        updated = CommercialStats.objects.filter(pk=commercial_id).update(**changes)
+        if not updated and create_missing:
+            refresh_commercial_stats(commercial_id)
+
+
+def compute_commercial_stats(commercial_id):
+    """Calcule les compteurs depuis les tables Lead / Deal (deux requêtes d'agrégation)"""
+    values = {field: 0 for field in COUNTER_FIELDS}
+
+    lead_counts = Lead.objects.filter(created_by_id=commercial_id).order_by().aggregate(**{
+        field: Count('id', filter=Q(status=status)) for status, field in LEAD_STATUS_FIELDS.items()
+    })
+    values.update(lead_counts)
+
+    deal_aggregates = {
+        field: Count('id', filter=Q(stage=stage)) for stage, field in DEAL_STAGE_FIELDS.items()
+    }
+    deal_aggregates['montant_gagne'] = Sum('montant', filter=Q(stage='gagne'))
+    deal_aggregates['commission_centimes'] = Sum(
+        commission_centimes_expression(),
+        filter=Q(stage='gagne', facture__isnull=True)
+    )
+    deals = Deal.objects.filter(relation__commercial_id=commercial_id).order_by().aggregate(**deal_aggregates)
+    commission_centimes = deals.pop('commission_centimes')
+    values.update({field: value or 0 for field, value in deals.items()})
+    values['commission_en_attente'] = centimes(commission_centimes)
+    return values
+
+
+def refresh_commercial_stats(commercial_id):
+    values = compute_commercial_stats(commercial_id)
+    stats, _created = CommercialStats.objects.update_or_create(
+        commercial_id=commercial_id, defaults=values
+    )
+    return stats
+
+
+def refresh_lead_counters(commercial_ids):
+    """
+    Recalcule les compteurs leads_<statut> de plusieurs commerciaux : une
+    agrégation groupée par créateur et un bulk_update, quel que soit leur nombre.
+    Un commercial sans ligne CommercialStats est calculé complètement.
+    """
+    commercial_ids = set(commercial_ids)
+    if not commercial_ids:
+        return
+    counts = {
+        row.pop('created_by_id'): row
+        for row in Lead.objects.filter(created_by_id__in=commercial_ids).order_by()
+        .values('created_by_id')
+        .annotate(**{field: Count('id', filter=Q(status=status)) for status, field in LEAD_STATUS_FIELDS.items()})
+    }
+    stats = list(CommercialStats.objects.filter(pk__in=commercial_ids).only('pk'))
+    for row in stats:
+        for field in LEAD_STATUS_FIELDS.values():
+            setattr(row, field, counts.get(row.pk, {}).get(field, 0))
+    CommercialStats.objects.bulk_update(stats, list(LEAD_STATUS_FIELDS.values()))
+    for commercial_id in sorted(commercial_ids - {row.pk for row in stats}):
+        refresh_commercial_stats(commercial_id)
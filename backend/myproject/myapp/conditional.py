@@ -0,0 +1,85 @@
+"""
+GET conditionnels (ETag / Last-Modified) pour les viewsets.
+
+ConditionalGetMixin calcule un validateur en une requête, avant toute
+sérialisation : pour chaque ligne affichée, son id, max(updated_at) sur elle et
+les tables dont la réponse affiche des champs (`etag_timestamp_fields`), et le
+nombre de lignes liées. Si l'ETag reçu dans If-None-Match correspond, la
+réponse est un 304 vide.
+
+Liste : seules les lignes de la page sont lues (fenêtre keyset de
+KeysetPagination.window_queryset, par l'index de pagination), pas tout le
+queryset de l'utilisateur. Les ids couvrent les lignes supprimées ou sorties
+de la page, les nombres de lignes liées les suppressions de lignes liées
+(ex. une Relation d'un lead) : max(updated_at) ne voit ni les unes ni les autres.
+Les écritures par queryset.update() doivent renseigner updated_at elles-mêmes
+(auto_now n'est appliqué que par save()).
+"""
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+class ConditionalGetMixin:
+    # Horodatages lus par le validateur ; chemins ORM vers les tables liées affichées
+    etag_timestamp_fields = ['updated_at']
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        paginator = self.paginator
+        if paginator is not None and hasattr(paginator, 'window_queryset'):
+            window = paginator.window_queryset(queryset, request, self)
+            queryset = queryset.filter(pk__in=window.values('pk'))
+        # Liste : pas de Last-Modified, une suppression ne le ferait pas avancer
+        etag, _last_modified = self.get_validators(queryset)
+        return self.conditional_response(request, etag, None, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}
+            )
+            etag, last_modified = self.get_validators(queryset)
+        except (TypeError, ValueError, ValidationError):
+            # Identifiant invalide : get_object() répond 404
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(request, etag, last_modified, super().retrieve, *args, **kwargs)
+
+    def get_validators(self, queryset):
+        """(ETag, Last-Modified) des lignes du queryset, en une requête groupée par ligne"""
+        aggregates = {f'ts_{i}': Max(field) for i, field in enumerate(self.etag_timestamp_fields)}
+        related = sorted({field.rsplit('__', 1)[0] for field in self.etag_timestamp_fields if '__' in field})
+        # distinct : les jointures vers des relations multiples dupliquent les lignes
+        aggregates.update({f'nb_{i}': Count(f'{path}__pk', distinct=True) for i, path in enumerate(related)})
+        rows = list(queryset.order_by('pk').values('pk').annotate(**aggregates))
+        timestamps = [
+            row[f'ts_{i}'] for row in rows for i in range(len(self.etag_timestamp_fields))
+        ]
+        parts = [str(self.request.user.pk), self.request.get_full_path()]
+        parts += [
+            ':'.join(
+                value.isoformat() if hasattr(value, 'isoformat') else '' if value is None else str(value)
+                for value in row.values()
+            )
+            for row in rows
+        ]
+        etag = '"{}"'.format(hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest())
+        last_modified = max((timestamp for timestamp in timestamps if timestamp), default=None)
+        return etag, last_modified
+
+    def conditional_response(self, request, etag, last_modified, render, *args, **kwargs):
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = render(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            # Réponse propre à l'utilisateur, à revalider à chaque affichage
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,73 @@
+"""
+Changement d'étape des deals et ses effets de bord, en requêtes ensemblistes.
+
+Passer des deals à une étape :
+- deal gagné : remporte_le = maintenant ; deal qui quitte 'gagne' : remporte_le
+  vidé (la date ne désigne que le gain en cours, cf. statistiques mensuelles) ;
+- lead de la relation : 'converti' si le deal est gagné, 'perdu' s'il est perdu
+  (règles de DealSerializer.create) ;
+- relation : derniere_action = maintenant.
+
+Chaque effet est un UPDATE sur l'ensemble des lignes concernées : le nombre de
+requêtes ne dépend pas du nombre de deals. Ces UPDATE ne déclenchent pas les
+signaux : les compteurs CommercialStats sont recalculés à la fin, ceux des
+leads en une agrégation groupée pour tous les créateurs concernés.
+"""
+from django.utils import timezone
+
+from .commercial_stats import refresh_commercial_stats, refresh_lead_counters
+from .models import Deal, Lead, Relation
+from .transactions import atomic_write
+
+# Statut du lead selon l'étape atteinte par l'un de ses deals
+LEAD_STATUS_PAR_STAGE = {'gagne': 'converti', 'perdu': 'perdu'}
+
+
+def remporte_le(stage, maintenant):
+    """Valeur de remporte_le d'un deal qui passe à `stage`"""
+    return maintenant if stage == 'gagne' else None
+
+
+def appliquer_effets_stage(deal_ids, stage, maintenant):
+    """
+    Effets de bord sur les leads et relations des deals `deal_ids`, passés à `stage`.
+    Renvoie les commerciaux (créateurs des leads) dont les compteurs de leads ont changé,
+    à passer à refresh_lead_counters().
+    """
+    commerciaux = set()
+    lead_status = LEAD_STATUS_PAR_STAGE.get(stage)
+    if lead_status:
+        leads = Lead.objects.filter(relations__deals__id__in=deal_ids).exclude(status=lead_status)
+        commerciaux = set(leads.order_by().values_list('created_by_id', flat=True).distinct())
+        if commerciaux:
+            leads.update(status=lead_status, updated_at=maintenant)
+    Relation.objects.filter(deals__id__in=deal_ids).update(derniere_action=maintenant, updated_at=maintenant)
+    return commerciaux
+
+
+def changer_stage_deals(commercial, deal_ids, stage):
+    """
+    Passe à `stage` les deals `deal_ids` du commercial, en une transaction.
+    Deals inconnus, d'un autre commercial ou déjà à cette étape : ignorés.
+    Renvoie les ids des deals modifiés.
+    """
+    maintenant = timezone.now()
+    with atomic_write():
+        ids = list(
+            Deal.objects.select_for_update(of=('self',))
+            .filter(id__in=deal_ids, relation__commercial=commercial)
+            .exclude(stage=stage)
+            .values_list('id', flat=True)
+        )
+        if not ids:
+            return []
+
+        Deal.objects.filter(id__in=ids).update(
+            stage=stage, remporte_le=remporte_le(stage, maintenant), updated_at=maintenant
+        )
+
+        createurs = appliquer_effets_stage(ids, stage, maintenant)
+        # Compteurs de deals (et leads) du commercial, puis leads des autres créateurs
+        refresh_commercial_stats(commercial.pk)
+        refresh_lead_counters(createurs - {commercial.pk})
+    return ids
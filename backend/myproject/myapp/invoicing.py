@@ -0,0 +1,168 @@
+"""
+Outils de facturation : allocation des numéros de facture, facturation en masse.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import CommercialStats, Deal, Facture, Relation, SequenceFacture
+from .taxes import annoter_totaux, centimes
+from .transactions import atomic_write
+
+NUMERO_FACTURE_FORMAT = "{prefixe}-{numero:04d}"
+
+
+def facture_prefix(day=None):
+    day = day or timezone.localdate()
+    return f"FACT-{day.strftime('%Y%m%d')}"
+
+
+def dernier_numero_existant(prefixe):
+    """
+    Plus grand numéro déjà attribué sous `prefixe`, 0 s'il n'y en a aucun.
+    Sert à amorcer le compteur d'un jour qui a des factures antérieures à
+    SequenceFacture (numérotées FACT-AAAAMMJJ-NNNN par l'ancien code).
+    """
+    numeros = Facture.objects.filter(numero_facture__startswith=f"{prefixe}-").values_list(
+        'numero_facture', flat=True
+    )
+    suffixes = (numero[len(prefixe) + 1:] for numero in numeros)
+    return max((int(suffixe) for suffixe in suffixes if suffixe.isdigit()), default=0)
+
+
+def allocate_numeros_facture(count=1, day=None):
+    """
+    Réserve `count` numéros consécutifs pour le jour donné et les renvoie.
+
+    Doit être appelé dans la transaction qui crée les factures : l'UPDATE
+    verrouille la ligne du compteur jusqu'au commit (les autres workers
+    attendent au lieu de calculer le même numéro), et un rollback rend
+    les numéros. Coût constant, quel que soit le nombre de factures.
+    """
+    if count < 1:
+        return []
+    prefixe = facture_prefix(day)
+    with atomic_write():
+        updated = SequenceFacture.objects.filter(prefixe=prefixe).update(
+            dernier_numero=F('dernier_numero') + count,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            try:
+                # Premier appel du jour : compteur amorcé sur les factures existantes ;
+                # savepoint pour survivre à une création concurrente
+                with transaction.atomic():
+                    SequenceFacture.objects.create(
+                        prefixe=prefixe, dernier_numero=dernier_numero_existant(prefixe) + count
+                    )
+            except IntegrityError:
+                SequenceFacture.objects.filter(prefixe=prefixe).update(
+                    dernier_numero=F('dernier_numero') + count,
+                    updated_at=timezone.now(),
+                )
+        dernier = SequenceFacture.objects.values_list('dernier_numero', flat=True).get(prefixe=prefixe)
+    return [
+        NUMERO_FACTURE_FORMAT.format(prefixe=prefixe, numero=numero)
+        for numero in range(dernier - count + 1, dernier + 1)
+    ]
+
+
+def allocate_numero_facture(day=None):
+    return allocate_numeros_facture(1, day)[0]
+
+
+DELAI_ECHEANCE = timedelta(days=30)
+
+
+def deals_a_facturer(commercial_ids=None):
+    """Deals gagnés et non facturés, éventuellement limités à certains commerciaux"""
+    deals = Deal.objects.filter(stage='gagne', facture__isnull=True)
+    if commercial_ids is not None:
+        deals = deals.filter(relation__commercial_id__in=commercial_ids)
+    return deals
+
+
+def generer_factures_en_masse(commercial_ids=None, day=None, batch_size=500):
+    """
+    Facture en une passe tous les deals gagnés non facturés, une facture par commercial.
+
+    1. liste des commerciaux concernés (une requête DISTINCT) ;
+    2. numéros réservés en un seul UPDATE, factures créées par bulk_create ;
+    3. deals rattachés par lot de commerciaux avec un UPDATE ... CASE ;
+    4. totaux HT / TVA calculés en base (voir taxes.annoter_totaux) sur les deals
+       effectivement rattachés, puis écrits par bulk_update.
+    Renvoie (factures créées, nombre de deals facturés).
+    """
+    day = day or timezone.localdate()
+    with atomic_write():
+        if connection.features.has_select_for_update:
+            # Les deals éligibles ne peuvent plus changer d'état jusqu'au commit :
+            # chaque facture créée recevra bien ses deals, sans numéro perdu
+            locked = deals_a_facturer(commercial_ids).select_for_update(of=('self',))
+            list(locked.values_list('pk', flat=True))
+
+        commercials = list(
+            deals_a_facturer(commercial_ids)
+            .order_by('relation__commercial_id')
+            .values_list('relation__commercial_id', flat=True)
+            .distinct()
+        )
+        if not commercials:
+            return [], 0
+
+        numeros = allocate_numeros_facture(len(commercials), day)
+        Facture.objects.bulk_create(
+            [
+                Facture(
+                    commercial_id=commercial_id,
+                    numero_facture=numero,
+                    montant_ht=0,
+                    montant_ttc=0,
+                    date_facture=day,
+                    date_echeance=day + DELAI_ECHEANCE,
+                    statut_paiement='pending',
+                )
+                for commercial_id, numero in zip(commercials, numeros)
+            ],
+            batch_size=batch_size,
+        )
+        # Relecture par numéro : bulk_create ne renvoie pas les id sur tous les moteurs
+        factures = {
+            facture.commercial_id: facture
+            for facture in Facture.objects.filter(numero_facture__in=numeros)
+        }
+
+        nb_deals = 0
+        for start in range(0, len(commercials), batch_size):
+            batch = commercials[start:start + batch_size]
+            nb_deals += deals_a_facturer(batch).update(facture_id=Case(
+                *[
+                    When(
+                        relation__in=Relation.objects.filter(commercial_id=commercial_id).values('id'),
+                        then=Value(factures[commercial_id].pk),
+                    )
+                    for commercial_id in batch
+                ],
+                output_field=models.BigIntegerField(),
+            ), updated_at=timezone.now())
+
+        totaux = {
+            row['facture']: row
+            for row in annoter_totaux(
+                Deal.objects.filter(facture__in=factures.values()).order_by().values('facture')
+            )
+        }
+        for facture in factures.values():
+            row = totaux.get(facture.pk)
+            montant_ht = Decimal(row['montant_ht'] if row else 0)
+            facture.montant_ht = montant_ht
+            facture.montant_ttc = montant_ht + centimes(row['tva_centimes'] if row else 0)
+        Facture.objects.bulk_update(list(factures.values()), ['montant_ht', 'montant_ttc'], batch_size=batch_size)
+
+        # Tous les deals gagnés de ces commerciaux sont facturés : plus de commission en attente
+        CommercialStats.objects.filter(pk__in=list(factures)).update(commission_en_attente=0)
+
+    return list(factures.values()), nb_deals
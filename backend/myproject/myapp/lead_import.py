@@ -0,0 +1,306 @@
+"""
+Import en masse de leads depuis un fichier CSV ou XLSX.
+
+Le fichier est lu ligne à ligne (csv sur un flux texte, openpyxl en mode
+read_only), jamais chargé en entier. Les lignes sont traitées par lots :
+1. validation de chaque ligne (champs obligatoires, email, SIRET, téléphone,
+   statut) avec les validateurs du modèle Lead ;
+2. une seule requête par lot pour retrouver les emails déjà en base
+   (Lead.email est unique) ;
+3. bulk_create des nouveaux leads puis de leurs relations, bulk_update des
+   leads existants du même commercial si mise_a_jour=True ;
+4. un lot = une transaction (atomic_write).
+
+bulk_create / bulk_update ne déclenchent pas les signaux : les compteurs du
+commercial (CommercialStats) sont recalculés à la fin, et le nom d'entreprise
+dénormalisé des deals (Deal.nom_entreprise) est recopié pour les leads mis à jour.
+L'index plein texte (myapp/search.py) suit par ses triggers.
+"""
+import codecs
+import csv
+import itertools
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.validators import EmailValidator, RegexValidator
+from django.db import IntegrityError
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .commercial_stats import refresh_commercial_stats
+from .models import Deal, Lead, Relation
+from .offres import offres_actives
+from .transactions import atomic_write
+
+IMPORT_FIELDS = ('company_name', 'contact_name', 'email', 'phone', 'siret', 'status', 'notes')
+REQUIRED_FIELDS = ('company_name', 'contact_name', 'email')
+# En-têtes acceptés en plus des noms de champs (comparés en minuscules, sans accents ni espaces)
+HEADER_ALIASES = {
+    'entreprise': 'company_name',
+    'societe': 'company_name',
+    'raison_sociale': 'company_name',
+    'contact': 'contact_name',
+    'nom_contact': 'contact_name',
+    'mail': 'email',
+    'telephone': 'phone',
+    'tel': 'phone',
+    'statut': 'status',
+}
+UPDATE_FIELDS = ('company_name', 'contact_name', 'phone', 'siret', 'status', 'notes', 'updated_at')
+MAX_ERRORS = 1000
+# Tentatives d'écriture d'un lot en cas de conflit d'unicité concurrent
+BATCH_ATTEMPTS = 3
+
+STATUS_VALUES = {value for value, _label in Lead.LEAD_STATUS_CHOICES}
+MAX_LENGTHS = {field: Lead._meta.get_field(field).max_length for field in IMPORT_FIELDS if field != 'notes'}
+validate_email = EmailValidator()
+validate_phone = RegexValidator(regex=r'^\+?1?\d{9,15}$', message="Format de téléphone invalide")
+validate_siret = RegexValidator(regex=r'^\d{9}$', message="Le SIRET doit contenir exactement 9 chiffres")
+
+
+class ImportFormatError(ValueError):
+    """Fichier illisible : format non géré, en-têtes manquants"""
+
+
+def normalize_header(header):
+    key = str(header or '').strip().lower()
+    for accented, plain in (('é', 'e'), ('è', 'e'), ('ê', 'e'), ('à', 'a'), ('ç', 'c')):
+        key = key.replace(accented, plain)
+    key = '_'.join(key.replace('-', ' ').split())
+    return HEADER_ALIASES.get(key, key)
+
+
+def _cell(value):
+    # XLSX : SIRET et téléphones saisis comme nombres
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return '' if value is None else str(value).strip()
+
+
+def _records(header, rows):
+    columns = [normalize_header(name) for name in header]
+    missing = [field for field in REQUIRED_FIELDS if field not in columns]
+    if missing:
+        raise ImportFormatError(f"Colonnes obligatoires absentes : {', '.join(missing)}")
+    # Ligne 1 : en-têtes
+    for number, row in enumerate(rows, start=2):
+        if not any(_cell(value) for value in row):
+            continue
+        yield number, {column: _cell(value) for column, value in zip(columns, row) if column in IMPORT_FIELDS}
+
+
+def detect_encoding(fileobj):
+    """utf-8 (avec ou sans BOM) si le début du fichier est décodable, sinon cp1252 (exports Excel)"""
+    sample = fileobj.read(65536)
+    fileobj.seek(0)
+    try:
+        # final=False : un caractère coupé en fin d'échantillon n'est pas une erreur
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return 'cp1252'
+    return 'utf-8-sig'
+
+
+def decode_lines(fileobj, encoding):
+    """
+    Lignes texte du flux binaire. L'encodage n'est estimé que sur le début du
+    fichier : une ligne plus loin qui n'est pas en utf-8 est relue en cp1252.
+    """
+    for number, raw in enumerate(fileobj):
+        try:
+            # BOM éventuel : première ligne seulement
+            yield raw.decode(encoding if number == 0 else encoding.replace('-sig', ''))
+        except UnicodeDecodeError:
+            # cp1252 laisse 5 octets non définis : remplacés plutôt que bloquer l'import
+            yield raw.decode('cp1252', errors='replace')
+
+
+def read_csv(fileobj):
+    lines = decode_lines(fileobj, detect_encoding(fileobj))
+    # Échantillon du Sniffer : premières lignes, rejouées ensuite devant le reste du flux
+    head, size = [], 0
+    for line in lines:
+        head.append(line)
+        size += len(line)
+        if size >= 8192:
+            break
+    try:
+        # Exports tableur français : souvent séparés par des points-virgules
+        dialect = csv.Sniffer().sniff(''.join(head), delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(itertools.chain(head, lines), dialect)
+    try:
+        header = next(reader, None)
+        if header is None:
+            raise ImportFormatError("Fichier vide")
+        yield from _records(header, reader)
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise ImportFormatError(f"Fichier CSV illisible : {exc}")
+
+
+def read_xlsx(fileobj):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFormatError("Import XLSX indisponible : installer openpyxl")
+    # read_only : feuille parcourue en flux, sans charger le classeur
+    try:
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    except Exception as exc:  # zip invalide, classeur corrompu
+        raise ImportFormatError(f"Fichier XLSX illisible : {exc}")
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise ImportFormatError("Fichier vide")
+        yield from _records(header, rows)
+    finally:
+        workbook.close()
+
+
+def read_leads(fileobj, filename):
+    """(numéro de ligne, dict des champs) pour chaque ligne non vide du fichier"""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.csv':
+        return read_csv(fileobj)
+    if extension == '.xlsx':
+        return read_xlsx(fileobj)
+    raise ImportFormatError(f"Format non géré : '{extension or filename}' (attendu : .csv ou .xlsx)")
+
+
+def clean_lead(data):
+    """(données nettoyées, erreurs par champ)"""
+    data = {field: data.get(field, '') for field in IMPORT_FIELDS}
+    data['status'] = data['status'] or 'nouveau'
+    errors = {}
+    for field in REQUIRED_FIELDS:
+        if not data[field]:
+            errors[field] = ["Champ obligatoire"]
+    for field, max_length in MAX_LENGTHS.items():
+        if len(data[field]) > max_length and field not in errors:
+            errors[field] = [f"{max_length} caractères maximum"]
+    for field, validator in (('email', validate_email), ('phone', validate_phone), ('siret', validate_siret)):
+        if data[field] and field not in errors:
+            try:
+                validator(data[field])
+            except ValidationError as exc:
+                errors[field] = list(exc.messages)
+    if data['status'] not in STATUS_VALUES:
+        errors['status'] = [f"Statut inconnu (attendu : {', '.join(sorted(STATUS_VALUES))})"]
+    for field in ('phone', 'siret', 'notes'):
+        data[field] = data[field] or None
+    return data, errors
+
+
+class LeadImporter:
+    """Importe les lignes de read_leads() pour un commercial, par lots"""
+
+    def __init__(self, user, offre=None, update_existing=False, batch_size=1000):
+        self.user = user
+        # Offre des relations créées : celle choisie, sinon la première active (comme LeadViewSet)
+        self.offre = offre or next(iter(offres_actives()), None)
+        self.update_existing = update_existing
+        self.batch_size = max(batch_size, 1)
+        self.report = {
+            'lignes': 0,
+            'crees': 0,
+            'mis_a_jour': 0,
+            'nb_erreurs': 0,
+            'erreurs': [],
+        }
+        self.seen_emails = set()
+
+    def error(self, line, errors):
+        self.report['nb_erreurs'] += 1
+        # Rapport borné : le décompte reste exact au-delà
+        if len(self.report['erreurs']) < MAX_ERRORS:
+            self.report['erreurs'].append({'ligne': line, 'erreurs': errors})
+
+    def run(self, records):
+        started = time.perf_counter()
+        batch = []
+        for line, data in records:
+            self.report['lignes'] += 1
+            cleaned, errors = clean_lead(data)
+            if not errors and cleaned['email'] in self.seen_emails:
+                errors = {'email': ["Email en double dans le fichier"]}
+            if errors:
+                self.error(line, errors)
+                continue
+            self.seen_emails.add(cleaned['email'])
+            batch.append((line, cleaned))
+            if len(batch) >= self.batch_size:
+                self.write_batch(batch)
+                batch = []
+        if batch:
+            self.write_batch(batch)
+        if self.report['crees'] or self.report['mis_a_jour']:
+            refresh_commercial_stats(self.user.pk)
+        self.report['erreurs'].sort(key=lambda error: error['ligne'])
+
+        elapsed = time.perf_counter() - started
+        self.report['duree_s'] = round(elapsed, 3)
+        self.report['lignes_par_seconde'] = round(self.report['lignes'] / elapsed, 1) if elapsed > 0 else None
+        return self.report
+
+    def write_batch(self, batch):
+        for attempt in range(BATCH_ATTEMPTS):
+            try:
+                # Recherche des emails et écritures dans la même transaction
+                with atomic_write():
+                    created, updated, errors = self._write_batch(batch)
+                break
+            except IntegrityError:
+                # Email inséré par une autre écriture entre la recherche et l'INSERT :
+                # lot rejoué, la ligne concurrente est alors vue comme existante
+                if attempt == BATCH_ATTEMPTS - 1:
+                    created, updated = 0, 0
+                    errors = [(line, {'email': ["Conflit d'écriture concurrente, ligne non importée"]}) for line, _data in batch]
+        for line, line_errors in errors:
+            self.error(line, line_errors)
+        self.report['crees'] += created
+        self.report['mis_a_jour'] += updated
+
+    def _write_batch(self, batch):
+        """(nombre créé, nombre mis à jour, erreurs par ligne) ; à appeler dans une transaction"""
+        emails = [data['email'] for _line, data in batch]
+        # Une requête par lot pour l'unicité de Lead.email
+        existing = {
+            lead.email: lead
+            for lead in Lead.objects.filter(email__in=emails).only('id', 'email', 'created_by_id', 'company_name')
+        }
+        now = timezone.now()
+        to_create, to_update, renamed, errors = [], [], [], []
+        for line, data in batch:
+            lead = existing.get(data['email'])
+            if lead is None:
+                to_create.append(Lead(created_by=self.user, declared_at=now, **data))
+            elif lead.created_by_id == self.user.pk and self.update_existing:
+                if lead.company_name != data['company_name']:
+                    renamed.append(lead.pk)
+                for field in IMPORT_FIELDS:
+                    setattr(lead, field, data[field])
+                lead.updated_at = now
+                to_update.append(lead)
+            else:
+                errors.append((line, {'email': ["Un lead avec cet email existe déjà"]}))
+
+        created = Lead.objects.bulk_create(to_create)
+        if self.offre is not None and created:
+            Relation.objects.bulk_create([
+                Relation(lead=lead, commercial=self.user, offre=self.offre, statut='active')
+                for lead in created
+            ])
+        if to_update:
+            Lead.objects.bulk_update(to_update, UPDATE_FIELDS)
+        if renamed:
+            # Nom d'entreprise dénormalisé des deals, en un UPDATE
+            Deal.objects.filter(relation__lead_id__in=renamed).update(
+                nom_entreprise=Subquery(
+                    Lead.objects.filter(relations=OuterRef('relation_id')).values('company_name')[:1]
+                ),
+                updated_at=now,
+            )
+        return len(created), len(to_update), errors
@@ -0,0 +1,52 @@
+"""
+Journalisation structurée de myapp.
+
+Chaque module de vue obtient son logger avec `get_logger(__name__)`
+(ex. "myapp.views.deal"), ce qui permet d'activer DEBUG pour un seul
+endpoint via settings.LOGGING / la variable LOG_DEBUG_LOGGERS.
+
+Les messages utilisent le formatage paresseux du module logging
+(`logger.debug("... %s", valeur)`) : rien n'est formaté ni écrit quand
+le niveau est désactivé, ce qui rend les appels quasi gratuits en
+production (WARNING).
+"""
+import logging
+import random
+
+LOGGER_PREFIX = 'myapp'
+
+
+def get_logger(name):
+    if name != LOGGER_PREFIX and not name.startswith(LOGGER_PREFIX + '.'):
+        name = f'{LOGGER_PREFIX}.{name}'
+    return logging.getLogger(name)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Ne laisse passer qu'une fraction `rate` des messages de niveau <= `max_level`
+    (DEBUG/INFO par défaut) ; WARNING et au-delà sont toujours conservés.
+    """
+
+    def __init__(self, rate=1.0, max_level=logging.INFO):
+        super().__init__()
+        self.rate = float(rate)
+        self.max_level = logging._checkLevel(max_level)
+
+    def filter(self, record):
+        if record.levelno > self.max_level or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Ajoute au message les champs passés dans `extra={...}` sous forme clé=valeur"""
+
+    _reserved = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+    def format(self, record):
+        message = super().format(record)
+        fields = {k: v for k, v in vars(record).items() if k not in self._reserved}
+        if fields:
+            message += ' ' + ' '.join(f'{k}={v!r}' for k, v in sorted(fields.items()))
+        return message
@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from myproject.sqlite3.base import DEFAULT_PRAGMAS
+
+# Configurations comparées : (journal_mode + PRAGMA, mode de BEGIN des écritures)
+CONFIGURATIONS = {
+    "django-defaut": ({"journal_mode": "DELETE"}, "DEFERRED"),
+    "wal-deferred": (DEFAULT_PRAGMAS, "DEFERRED"),
+    "wal-immediate": (DEFAULT_PRAGMAS, "IMMEDIATE"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Banc de concurrence SQLite : écrivains (lecture du compteur puis écriture, comme "
+        "create_facture_from_deals) et lecteurs simultanés, avec le journal par défaut puis "
+        "WAL + BEGIN IMMEDIATE ; compte les erreurs 'database is locked'"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8, help="Threads écrivains (une connexion chacun)")
+        parser.add_argument("--readers", type=int, default=8, help="Threads lecteurs")
+        parser.add_argument("--duration", type=float, default=5, help="Durée par configuration en secondes")
+        parser.add_argument("--timeout", type=float, default=5, help="Busy timeout en secondes")
+        parser.add_argument(
+            "--config",
+            dest="configs",
+            action="append",
+            choices=sorted(CONFIGURATIONS),
+            help="Limiter aux configurations données, option répétable",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'configuration':<16}{'écritures':>11}{'lectures':>10}{'verrous':>9}{'p95 écriture ms':>17}")
+        for name in options["configs"] or list(CONFIGURATIONS):
+            pragmas, begin = CONFIGURATIONS[name]
+            with tempfile.TemporaryDirectory() as directory:
+                result = self.run(os.path.join(directory, "bench.sqlite3"), pragmas, begin, options)
+            self.stdout.write(
+                f"{name:<16}{result['writes']:>11}{result['reads']:>10}{result['locked']:>9}"
+                f"{result['p95_ms']:>17.2f}"
+            )
+
+    def connect(self, path, pragmas, timeout):
+        # isolation_level=None : transactions explicites, comme le backend Django
+        conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        for key, value in pragmas.items():
+            conn.execute(f"PRAGMA {key} = {value}")
+        return conn
+
+    def run(self, path, pragmas, begin, options):
+        setup = self.connect(path, pragmas, options["timeout"])
+        setup.execute("CREATE TABLE sequence (id INTEGER PRIMARY KEY, dernier_numero INTEGER NOT NULL)")
+        setup.execute("CREATE TABLE facture (id INTEGER PRIMARY KEY, numero INTEGER UNIQUE, montant INTEGER)")
+        setup.execute("INSERT INTO sequence VALUES (1, 0)")
+        setup.close()
+
+        stop_at = time.perf_counter() + options["duration"]
+        lock = threading.Lock()
+        result = {"writes": 0, "reads": 0, "locked": 0, "latencies": []}
+
+        def writer():
+            conn = self.connect(path, pragmas, options["timeout"])
+            while time.perf_counter() < stop_at:
+                started = time.perf_counter()
+                try:
+                    conn.execute(f"BEGIN {begin}")
+                    # Lecture puis écriture dans la même transaction : en DEFERRED le verrou
+                    # partagé doit être promu, ce qui échoue si un autre écrivain est passé
+                    numero = conn.execute("SELECT dernier_numero FROM sequence WHERE id = 1").fetchone()[0] + 1
+                    conn.execute("UPDATE sequence SET dernier_numero = ? WHERE id = 1", (numero,))
+                    conn.execute("INSERT INTO facture (numero, montant) VALUES (?, ?)", (numero, numero % 1000))
+                    conn.execute("COMMIT")
+                except sqlite3.OperationalError as exc:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    if "locked" not in str(exc) and "busy" not in str(exc):
+                        raise
+                    with lock:
+                        result["locked"] += 1
+                    continue
+                with lock:
+                    result["writes"] += 1
+                    result["latencies"].append((time.perf_counter() - started) * 1000)
+            conn.close()
+
+        def reader():
+            conn = self.connect(path, pragmas, options["timeout"])
+            while time.perf_counter() < stop_at:
+                try:
+                    conn.execute("SELECT COUNT(*), SUM(montant) FROM facture").fetchone()
+                except sqlite3.OperationalError:
+                    with lock:
+                        result["locked"] += 1
+                    continue
+                with lock:
+                    result["reads"] += 1
+            conn.close()
+
+        threads = [threading.Thread(target=writer) for _ in range(options["writers"])]
+        threads += [threading.Thread(target=reader) for _ in range(options["readers"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        latencies = sorted(result.pop("latencies"))
+        result["p95_ms"] = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+        return result
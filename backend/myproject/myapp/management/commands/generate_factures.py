@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from myapp.invoicing import generer_factures_en_masse
+
+
+class Command(BaseCommand):
+    help = "Facturation de fin de mois : une facture par commercial pour ses deals gagnés non facturés"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--commercial",
+            type=int,
+            dest="commercial_ids",
+            action="append",
+            help="Limiter à un commercial (id), option répétable",
+        )
+        parser.add_argument("--date", help="Date de facture (YYYY-MM-DD), aujourd'hui par défaut")
+        parser.add_argument("--batch-size", type=int, default=500, help="Commerciaux par lot d'écriture")
+
+    def handle(self, *args, **options):
+        day = None
+        if options["date"]:
+            try:
+                day = parse_date(options["date"])
+            except ValueError:
+                # Bien formée mais impossible (ex. 2025-02-31)
+                day = None
+            if day is None:
+                raise CommandError("Date invalide (format attendu: YYYY-MM-DD)")
+
+        started = time.perf_counter()
+        factures, nb_deals = generer_factures_en_masse(
+            commercial_ids=options["commercial_ids"],
+            day=day,
+            batch_size=options["batch_size"],
+        )
+        elapsed = time.perf_counter() - started
+
+        rate = nb_deals / elapsed if elapsed > 0 else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(factures)} facture(s), {nb_deals} deal(s) facturé(s) en {elapsed:.2f}s ({rate:.0f} deals/s)"
+        ))
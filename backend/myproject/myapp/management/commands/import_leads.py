@@ -0,0 +1,65 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.lead_import import ImportFormatError, LeadImporter, read_leads
+from myapp.offres import offre_active
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe des leads depuis un fichier CSV ou XLSX pour un commercial : lecture en flux, "
+        "validation et écriture par lots (bulk_create), rapport d'erreurs par ligne"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Fichier .csv ou .xlsx (en-têtes : company_name, contact_name, email, ...)")
+        parser.add_argument("--user", required=True, help="Commercial propriétaire (username ou id)")
+        parser.add_argument("--offre", type=int, help="Offre des relations créées (défaut : première offre active)")
+        parser.add_argument(
+            "--update",
+            action="store_true",
+            help="Met à jour les leads existants du commercial (même email) au lieu de les signaler",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Lignes par lot (une transaction chacun)")
+        parser.add_argument("--report", help="Écrit le rapport complet (JSON) dans ce fichier")
+
+    def handle(self, *args, **options):
+        lookup = {"pk": options["user"]} if options["user"].isdigit() else {"username": options["user"]}
+        user = User.objects.filter(**lookup).first()
+        if user is None:
+            raise CommandError(f"Commercial introuvable : {options['user']}")
+        offre = None
+        if options["offre"] is not None:
+            offre = offre_active(options["offre"])
+            if offre is None:
+                raise CommandError(f"Offre inconnue ou inactive : {options['offre']}")
+
+        importer = LeadImporter(
+            user, offre=offre, update_existing=options["update"], batch_size=options["batch_size"]
+        )
+        try:
+            with open(options["path"], "rb") as fichier:
+                report = importer.run(read_leads(fichier, options["path"]))
+        except OSError as exc:
+            raise CommandError(f"Lecture impossible : {exc}")
+        except ImportFormatError as exc:
+            raise CommandError(str(exc))
+
+        if options["report"]:
+            with open(options["report"], "w", encoding="utf-8") as output:
+                json.dump(report, output, indent=2, ensure_ascii=False)
+                output.write("\n")
+        for error in report["erreurs"][:20]:
+            details = "; ".join(f"{field}: {' '.join(messages)}" for field, messages in error["erreurs"].items())
+            self.stdout.write(f"ligne {error['ligne']}: {details}")
+        if report["nb_erreurs"] > 20:
+            self.stdout.write(f"... {report['nb_erreurs'] - 20} autre(s) erreur(s)")
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['lignes']} ligne(s) : {report['crees']} créé(s), {report['mis_a_jour']} mis à jour, "
+            f"{report['nb_erreurs']} erreur(s) en {report['duree_s']:.2f}s "
+            f"({report['lignes_par_seconde'] or 0:.0f} lignes/s)"
+        ))
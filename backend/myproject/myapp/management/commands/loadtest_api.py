@@ -0,0 +1,281 @@
+import http.client
+import json
+import math
+import random
+import statistics
+import subprocess
+import threading
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+# Scénarios rejoués, avec leur poids dans le mélange : appels des pages du frontend
+# (Dashboard, Leads, Deals, Commissions, Tasks)
+SCENARIOS = {
+    "dashboard-stats": 20,
+    "lead-list": 15,
+    "lead-create": 3,
+    "deal-list": 15,
+    "deal-commissions": 10,
+    "deal-create-facture": 2,
+    "action-list": 10,
+    "action-actions-du-jour": 10,
+    "action-statistiques": 10,
+}
+
+
+def percentile(sorted_values, pct):
+    """Percentile par rang le plus proche sur une liste triée"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class ApiClient:
+    """Connexion HTTP persistante (keep-alive) par thread, jeton JWT partagé"""
+
+    def __init__(self, base_url, runner):
+        parts = urlsplit(base_url)
+        self.scheme, self.netloc, self.prefix = parts.scheme, parts.netloc, parts.path.rstrip("/")
+        self.runner = runner
+        self.connection = None
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        self.connection = cls(self.netloc, timeout=self.runner.timeout)
+
+    def request(self, method, path, params=None, payload=None, auth=True):
+        url = path if path.startswith(self.prefix + "/") else self.prefix + path
+        if params:
+            url += "?" + urlencode(params)
+        headers = {"Accept": "application/json"}
+        body = None
+        if payload is not None:
+            body = json.dumps(payload)
+            headers["Content-Type"] = "application/json"
+        if auth:
+            headers["Authorization"] = f"Bearer {self.runner.access_token}"
+
+        # Connexion keep-alive fermée par le serveur : une nouvelle tentative, pour GET
+        # seulement (un POST a pu être traité avant la coupure, le rejouer le dupliquerait)
+        attempts = 2 if method == "GET" else 1
+        for attempt in range(1, attempts + 1):
+            if self.connection is None:
+                self._connect()
+            try:
+                self.connection.request(method, url, body=body, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                self.connection.close()
+                self.connection = None
+                if attempt == attempts:
+                    raise
+        return response.status, response.getheader("Server-Timing"), data
+
+
+class Command(BaseCommand):
+    help = (
+        "Banc de charge HTTP de l'API : rejoue un mélange d'appels du frontend sur un serveur "
+        "lancé (runserver ou gunicorn) et écrit p50/p95/p99 et débit par endpoint dans un JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000/api", help="URL de l'API")
+        parser.add_argument("--username", default="seed-0", help="Compte utilisé (voir seed_crm)")
+        parser.add_argument("--password", default="seed-password")
+        parser.add_argument("--concurrency", type=int, default=8, help="Clients simultanés")
+        parser.add_argument("--duration", type=float, default=30, help="Durée de la mesure en secondes")
+        parser.add_argument("--warmup", type=float, default=3, help="Durée de chauffe non mesurée en secondes")
+        parser.add_argument("--timeout", type=float, default=30, help="Timeout d'une requête en secondes")
+        parser.add_argument(
+            "--scenario",
+            dest="scenarios",
+            action="append",
+            choices=sorted(SCENARIOS),
+            help="Limiter le mélange à un scénario, option répétable",
+        )
+        parser.add_argument("--seed", type=int, default=1, help="Graine du tirage des scénarios")
+        parser.add_argument("--output", default="loadtest.json", help="Fichier de résultats JSON")
+
+    def handle(self, *args, **options):
+        self.timeout = options["timeout"]
+        self.base_url = options["base_url"].rstrip("/")
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.facture_deal_ids = []
+
+        scenarios = options["scenarios"] or list(SCENARIOS)
+        weights = [SCENARIOS[name] for name in scenarios]
+
+        self.login(options["username"], options["password"])
+        self.prepare()
+
+        stop_at = time.perf_counter() + options["warmup"] + options["duration"]
+        self.measure_from = time.perf_counter() + options["warmup"]
+        threads = [
+            threading.Thread(
+                target=self.worker,
+                args=(random.Random(options["seed"] + i), scenarios, weights, stop_at),
+                daemon=True,
+            )
+            for i in range(options["concurrency"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        report = self.report(options)
+        with open(options["output"], "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+            output.write("\n")
+        self.print_report(report)
+        self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {options['output']}"))
+
+    # --- Préparation ---------------------------------------------------------
+
+    def login(self, username, password):
+        client = ApiClient(self.base_url, self)
+        try:
+            status, _timing, data = client.request(
+                "POST", "/login/", payload={"username": username, "password": password}, auth=False
+            )
+        except (http.client.HTTPException, OSError) as exc:
+            raise CommandError(f"Serveur injoignable sur {self.base_url} : {exc}")
+        if status != 200:
+            raise CommandError(f"Connexion refusée pour {username} (HTTP {status})")
+        self.access_token = json.loads(data)["access"]
+
+    def prepare(self):
+        """Deals gagnés non facturés (consommés par create_facture_from_deals) et offres actives"""
+        client = ApiClient(self.base_url, self)
+        status, _timing, data = client.request("GET", "/deals/commissions/", params={"page_size": 500})
+        if status == 200:
+            self.facture_deal_ids = [deal["id"] for deal in json.loads(data)["results"]]
+        status, _timing, data = client.request("GET", "/leads/available-offres/")
+        self.offre_ids = [offre["id"] for offre in json.loads(data)] if status == 200 else []
+
+    # --- Scénarios ------------------------------------------------------------
+
+    def run_scenario(self, client, name, rng):
+        if name == "dashboard-stats":
+            return client.request("GET", "/dashboard-stats/")
+        if name == "lead-list":
+            return client.request("GET", "/leads/")
+        if name == "lead-create":
+            # Lead.email est unique : aléatoire indépendant de --seed pour pouvoir relancer le banc
+            token = uuid.uuid4().hex[:12]
+            payload = {
+                "company_name": f"Loadtest {token}",
+                "contact_name": "Contact",
+                "email": f"loadtest-{token}@example.com",
+                "status": "nouveau",
+            }
+            if self.offre_ids:
+                payload["offre_id"] = rng.choice(self.offre_ids)
+            return client.request("POST", "/leads/", payload=payload)
+        if name == "deal-list":
+            return client.request("GET", "/deals/")
+        if name == "deal-commissions":
+            return client.request("GET", "/deals/commissions/")
+        if name == "deal-create-facture":
+            with self.lock:
+                deal_ids = [self.facture_deal_ids.pop() for _ in range(min(3, len(self.facture_deal_ids)))]
+            if not deal_ids:
+                return None
+            return client.request("POST", "/deals/create_facture_from_deals/", payload={"deal_ids": deal_ids})
+        if name == "action-list":
+            return client.request("GET", "/actions/", params={"statut": "en_attente"})
+        if name == "action-actions-du-jour":
+            return client.request("GET", "/actions/actions_du_jour/")
+        if name == "action-statistiques":
+            return client.request("GET", "/actions/statistiques/")
+        raise CommandError(f"Scénario inconnu : {name}")
+
+    def worker(self, rng, scenarios, weights, stop_at):
+        client = ApiClient(self.base_url, self)
+        while True:
+            started = time.perf_counter()
+            if started >= stop_at:
+                return
+            name = rng.choices(scenarios, weights=weights)[0]
+            try:
+                result = self.run_scenario(client, name, rng)
+            except (http.client.HTTPException, OSError):
+                # Erreur réseau ou réponse illisible (RemoteDisconnected, BadStatusLine) : comptée en erreur
+                result = (0, None, b"")
+            if result is None:
+                continue
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if started < self.measure_from:
+                continue
+            status, server_timing, _data = result
+            with self.lock:
+                self.samples.setdefault(name, []).append((elapsed_ms, status, server_timing))
+
+    # --- Rapport --------------------------------------------------------------
+
+    def parse_queries(self, server_timing):
+        # Server-Timing: db;dur=1.2;desc="5 queries", app;dur=8.3 (myapp.metrics.RequestMetricsMiddleware)
+        if not server_timing or 'desc="' not in server_timing:
+            return None
+        try:
+            return int(server_timing.split('desc="', 1)[1].split(" ", 1)[0])
+        except ValueError:
+            return None
+
+    def summarize(self, samples, duration):
+        latencies = sorted(sample[0] for sample in samples)
+        errors = sum(1 for sample in samples if not 200 <= sample[1] < 400)
+        queries = [q for q in (self.parse_queries(sample[2]) for sample in samples) if q is not None]
+        return {
+            "requests": len(samples),
+            "errors": errors,
+            "throughput_rps": round(len(samples) / duration, 2),
+            "mean_ms": round(statistics.fmean(latencies), 2) if latencies else None,
+            "p50_ms": round(percentile(latencies, 50), 2) if latencies else None,
+            "p95_ms": round(percentile(latencies, 95), 2) if latencies else None,
+            "p99_ms": round(percentile(latencies, 99), 2) if latencies else None,
+            "max_ms": round(latencies[-1], 2) if latencies else None,
+            "queries_avg": round(statistics.fmean(queries), 2) if queries else None,
+        }
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def report(self, options):
+        duration = options["duration"]
+        all_samples = [sample for samples in self.samples.values() for sample in samples]
+        return {
+            "meta": {
+                "base_url": self.base_url,
+                "commit": self.git_commit(),
+                "concurrency": options["concurrency"],
+                "duration_s": duration,
+                "date": timezone.now().isoformat(timespec="seconds"),
+            },
+            "total": self.summarize(all_samples, duration),
+            "endpoints": {name: self.summarize(samples, duration) for name, samples in self.samples.items()},
+        }
+
+    def print_report(self, report):
+        header = f"{'endpoint':<26}{'req':>7}{'err':>5}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'sql':>7}"
+        self.stdout.write(header)
+        rows = sorted(report["endpoints"].items()) + [("TOTAL", report["total"])]
+        for name, stats in rows:
+            self.stdout.write(
+                f"{name:<26}{stats['requests']:>7}{stats['errors']:>5}{stats['throughput_rps']:>9}"
+                f"{stats['p50_ms'] or '-':>9}{stats['p95_ms'] or '-':>9}{stats['p99_ms'] or '-':>9}"
+                f"{stats['queries_avg'] if stats['queries_avg'] is not None else '-':>7}"
+            )
@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from myapp.commercial_stats import COUNTER_FIELDS, compute_commercial_stats, refresh_commercial_stats
+from myapp.models import CommercialStats
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Reconstruit (ou vérifie avec --verify) les compteurs CommercialStats depuis Lead/Deal"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Compare les compteurs stockés au recalcul sans rien écrire",
+        )
+        parser.add_argument(
+            "--user",
+            type=int,
+            dest="user_ids",
+            action="append",
+            help="Limiter à un commercial (id), option répétable",
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by("id")
+        if options["user_ids"]:
+            users = users.filter(id__in=options["user_ids"])
+        user_ids = users.values_list("id", flat=True)
+
+        if options["verify"]:
+            self.verify(list(user_ids))
+            return
+
+        count = 0
+        # iterator() : curseur serveur sous PostgreSQL, les ids ne sont pas chargés d'un bloc
+        for user_id in user_ids.iterator(chunk_size=2000):
+            with transaction.atomic():
+                refresh_commercial_stats(user_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"{count} commercial(aux) recalculé(s)"))
+
+    def verify(self, user_ids):
+        stored = CommercialStats.objects.in_bulk(user_ids)
+        mismatches = 0
+        for user_id in user_ids:
+            expected = compute_commercial_stats(user_id)
+            current = stored.get(user_id)
+            diffs = [
+                f"{field}: {getattr(current, field) if current else None} != {expected[field]}"
+                for field in COUNTER_FIELDS
+                if current is None or getattr(current, field) != expected[field]
+            ]
+            if diffs:
+                mismatches += 1
+                self.stdout.write(f"Commercial {user_id}: " + ", ".join(diffs))
+        if mismatches:
+            raise CommandError(f"{mismatches} commercial(aux) avec des compteurs incorrects")
+        self.stdout.write(self.style.SUCCESS(f"{len(user_ids)} commercial(aux) vérifié(s), compteurs à jour"))
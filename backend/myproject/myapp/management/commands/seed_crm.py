@@ -0,0 +1,251 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from myapp.commercial_stats import refresh_commercial_stats
+from myapp.models import Action, Deal, Facture, Lead, Offre, Profil, Relation
+from myapp.offres import invalider_catalogue
+from myapp.taxes import montant_ttc
+from myapp.transactions import atomic_write
+
+User = get_user_model()
+
+DEFAULT_STAGE_WEIGHTS = "prospection=30,negociation=25,gagne=30,perdu=15"
+
+
+def parse_weights(value, choices):
+    """"prospection=30,gagne=70" -> {'prospection': 30.0, 'gagne': 70.0}, clés validées contre choices"""
+    valid = {key for key, _label in choices}
+    weights = {}
+    for item in value.split(","):
+        key, _sep, weight = item.partition("=")
+        key = key.strip()
+        if key not in valid:
+            raise CommandError(f"Valeur inconnue '{key}' (attendu : {', '.join(sorted(valid))})")
+        try:
+            weights[key] = float(weight)
+        except ValueError:
+            raise CommandError(f"Poids invalide pour '{key}': {weight!r}")
+    if not any(weights.values()):
+        raise CommandError("Au moins un poids doit être positif")
+    return weights
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un jeu de données synthétique (commerciaux, leads, relations, offres, deals, "
+        "actions, factures) par bulk_create, reproductible avec --seed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--commercials", type=int, default=10, help="Nombre de commerciaux à créer")
+        parser.add_argument("--leads", type=int, default=100, help="Leads par commercial (moyenne)")
+        parser.add_argument("--deals", type=float, default=2, help="Deals par lead (moyenne)")
+        parser.add_argument("--actions", type=float, default=2, help="Actions par lead (moyenne)")
+        parser.add_argument("--offres", type=int, default=5, help="Offres créées et partagées par les commerciaux")
+        parser.add_argument(
+            "--stages",
+            default=DEFAULT_STAGE_WEIGHTS,
+            help=f"Répartition des étapes de deal (défaut : {DEFAULT_STAGE_WEIGHTS})",
+        )
+        parser.add_argument(
+            "--invoiced",
+            type=float,
+            default=0.5,
+            help="Part des deals gagnés rattachés à une facture (0 à 1)",
+        )
+        parser.add_argument("--deals-per-facture", type=int, default=10, help="Deals maximum par facture")
+        parser.add_argument("--seed", type=int, default=42, help="Graine du générateur aléatoire")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Lignes par INSERT")
+        parser.add_argument(
+            "--prefix",
+            default="seed",
+            help="Préfixe des identifiants, emails et numéros de facture (un préfixe par jeu généré)",
+        )
+        parser.add_argument("--password", default="seed-password", help="Mot de passe des commerciaux créés")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.prefix = options["prefix"]
+        self.stage_weights = parse_weights(options["stages"], Deal.DEAL_STAGE_CHOICES)
+        if not 0 <= options["invoiced"] <= 1:
+            raise CommandError("--invoiced doit être compris entre 0 et 1")
+        if User.objects.filter(username__startswith=f"{self.prefix}-").exists():
+            raise CommandError(f"Des données existent déjà pour le préfixe '{self.prefix}' (voir --prefix)")
+
+        started = time.perf_counter()
+        self.now = timezone.now()
+        offres = self.create_offres(options["offres"])
+        # bulk_create ne déclenche pas les signaux : catalogue des offres en cache à recharger
+        invalider_catalogue()
+        commercials = self.create_commercials(options["commercials"], options["password"])
+
+        totals = {"leads": 0, "deals": 0, "actions": 0, "factures": 0}
+        for index, commercial in enumerate(commercials):
+            # Une transaction par commercial : écritures groupées, mémoire bornée
+            with atomic_write():
+                counts = self.seed_commercial(commercial, index, offres, options)
+                # bulk_create ne déclenche pas les signaux : compteurs recalculés
+                refresh_commercial_stats(commercial.pk)
+            for key, value in counts.items():
+                totals[key] += value
+            if options["verbosity"] >= 2:
+                self.stdout.write(f"{commercial.username}: " + ", ".join(f"{v} {k}" for k, v in counts.items()))
+
+        elapsed = time.perf_counter() - started
+        rate = totals["deals"] / elapsed if elapsed > 0 else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(commercials)} commercial(aux), {len(offres)} offre(s), {totals['leads']} lead(s), "
+            f"{totals['deals']} deal(s), {totals['actions']} action(s), {totals['factures']} facture(s) "
+            f"en {elapsed:.2f}s ({rate:.0f} deals/s)"
+        ))
+
+    def bulk(self, model, objects):
+        return model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def create_offres(self, count):
+        plans = [value for value, _label in Offre.COMMISSION_PLAN_CHOICES]
+        return self.bulk(Offre, [
+            Offre(
+                nom_offre=f"{self.prefix} offre {i}",
+                plan_commission=plans[i % len(plans)],
+                taux_commission=self.rng.choice([5, 10, 12.5, 15, 20]),
+                condition_commission_additionel="",
+                actif=i % 10 != 9,
+            )
+            for i in range(count)
+        ])
+
+    def create_commercials(self, count, password):
+        # Un seul hachage pour tous les comptes (PBKDF2 coûte plusieurs centaines de ms)
+        hashed = make_password(password)
+        commercials = self.bulk(User, [
+            User(
+                username=f"{self.prefix}-{i}",
+                email=f"{self.prefix}-{i}@example.com",
+                first_name="Commercial",
+                last_name=str(i),
+                password=hashed,
+            )
+            for i in range(count)
+        ])
+        self.bulk(Profil, [Profil(user=user, entreprise=f"Agence {i % 7}") for i, user in enumerate(commercials)])
+        return commercials
+
+    def around(self, mean):
+        """Tirage entier de moyenne `mean` (uniforme sur [0, 2 * mean])"""
+        return int(self.rng.uniform(0, 2 * mean) + 0.5) if mean > 0 else 0
+
+    def random_date(self, days_before, days_after=0):
+        return self.now + timedelta(seconds=self.rng.randint(-days_before * 86400, days_after * 86400))
+
+    def seed_commercial(self, commercial, index, offres, options):
+        rng = self.rng
+        stages = list(self.stage_weights)
+        stage_weights = list(self.stage_weights.values())
+        # ±50 % autour de la moyenne : pas de commercial vide
+        nb_leads = int(rng.uniform(0.5, 1.5) * options["leads"] + 0.5)
+
+        # Étapes des deals tirées d'abord : le statut du lead en découle
+        lead_stages = [
+            rng.choices(stages, weights=stage_weights, k=self.around(options["deals"]))
+            for _ in range(nb_leads)
+        ]
+        leads = self.bulk(Lead, [
+            Lead(
+                created_by=commercial,
+                company_name=f"Société {index}-{i}",
+                contact_name=f"Contact {i}",
+                # Lead.email est unique : commercial et rang dans le nom
+                email=f"{self.prefix}-{index}-{i}@leads.example.com",
+                phone=f"+33{rng.randint(100000000, 999999999)}",
+                siret=f"{rng.randint(0, 999999999):09d}",
+                status=self.lead_status(deal_stages),
+                declared_at=self.random_date(365),
+            )
+            for i, deal_stages in enumerate(lead_stages)
+        ])
+
+        # Une relation par lead : (lead, offre, commercial) reste unique
+        relations = self.bulk(Relation, [
+            Relation(
+                lead=lead,
+                commercial=commercial,
+                offre=rng.choice(offres),
+                statut="active" if rng.random() < 0.9 else "non_active",
+                derniere_action=self.random_date(90),
+            )
+            for lead in leads
+        ])
+
+        deals = []
+        for relation, deal_stages in zip(relations, lead_stages):
+            for n, stage in enumerate(deal_stages):
+                deals.append(Deal(
+                    relation=relation,
+                    nom_deal=f"Deal {relation.lead.company_name} #{n + 1}",
+                    # bulk_create ne passe pas par Deal.save() : copie dénormalisée renseignée ici
+                    nom_entreprise=relation.lead.company_name,
+                    type_deal=relation.offre.plan_commission,
+                    stage=stage,
+                    montant=rng.randint(5, 500) * 100,
+                    # Taux propre au deal dans 20 % des cas, sinon celui de l'offre
+                    taux_commission=rng.choice([5, 8, 10, 15]) if rng.random() < 0.2 else None,
+                    remporte_le=self.random_date(365) if stage == "gagne" else None,
+                ))
+        factures = self.create_factures(commercial, index, deals, options)
+        self.bulk(Deal, deals)
+
+        actions = [
+            Action(
+                lead=lead,
+                commercial=commercial,
+                action_type=rng.choice(Action.ACTION_TYPE_CHOICES)[0],
+                date_echeance=self.random_date(60, 30),
+                titre=f"Relance {lead.company_name}",
+                priorite=rng.choice(Action.PRIORITY_CHOICES)[0],
+                statut=rng.choices(["en_attente", "terminee", "annulee"], weights=[50, 40, 10])[0],
+            )
+            for lead in leads
+            for _ in range(self.around(options["actions"]))
+        ]
+        self.bulk(Action, actions)
+        return {"leads": len(leads), "deals": len(deals), "actions": len(actions), "factures": len(factures)}
+
+    def lead_status(self, deal_stages):
+        if "gagne" in deal_stages:
+            return "converti"
+        if deal_stages and all(stage == "perdu" for stage in deal_stages):
+            return "perdu"
+        return "en_cours" if deal_stages else "nouveau"
+
+    def create_factures(self, commercial, index, deals, options):
+        """Regroupe une part des deals gagnés en factures et les y rattache (avant leur insertion)"""
+        invoiced = [deal for deal in deals if deal.stage == "gagne" and self.rng.random() < options["invoiced"]]
+        size = max(options["deals_per_facture"], 1)
+        groups = [invoiced[start:start + size] for start in range(0, len(invoiced), size)]
+        factures = []
+        for n, group in enumerate(groups):
+            date_facture = max(deal.remporte_le for deal in group).date()
+            montant_ht = sum(deal.montant for deal in group)
+            factures.append(Facture(
+                commercial=commercial,
+                # Hors du format FACT-AAAAMMJJ-NNNN des SequenceFacture : pas de collision
+                numero_facture=f"{self.prefix.upper()}-{index}-{n + 1:05d}",
+                montant_ht=montant_ht,
+                montant_ttc=montant_ttc(montant_ht),
+                date_facture=date_facture,
+                date_echeance=date_facture + timedelta(days=30),
+                statut_paiement=self.rng.choice(Facture.PAYMENT_STATUS_CHOICES)[0],
+            ))
+        self.bulk(Facture, factures)
+        for facture, group in zip(factures, groups):
+            for deal in group:
+                deal.facture = facture
+        return factures
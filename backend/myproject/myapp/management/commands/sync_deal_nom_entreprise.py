@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from myapp.models import Deal, Relation
+
+
+def nom_entreprise_attendu():
+    """Expression : nom du lead de la relation du deal, '' sans lead"""
+    return Coalesce(
+        Subquery(Relation.objects.filter(pk=OuterRef("relation_id")).values("lead__company_name")[:1]),
+        Value(""),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Recopie (ou vérifie avec --verify) Deal.nom_entreprise depuis le lead de la relation, "
+        "par UPDATE ensemblistes sur des plages d'id"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Compte les deals désynchronisés sans rien écrire",
+        )
+        parser.add_argument("--batch-size", type=int, default=10000, help="Deals par plage d'id (une transaction chacune)")
+
+    def handle(self, *args, **options):
+        if options["verify"]:
+            self.verify()
+            return
+
+        batch_size = max(options["batch_size"], 1)
+        last_id = Deal.objects.aggregate(last=Max("id"))["last"] or 0
+        updated = 0
+        for start in range(0, last_id, batch_size):
+            # Seules les lignes désynchronisées sont réécrites
+            with transaction.atomic():
+                updated += self.stale_deals().filter(id__gt=start, id__lte=start + batch_size).update(
+                    nom_entreprise=nom_entreprise_attendu(), updated_at=timezone.now()
+                )
+        self.stdout.write(self.style.SUCCESS(f"{updated} deal(s) mis à jour"))
+
+    def stale_deals(self):
+        return Deal.objects.alias(attendu=nom_entreprise_attendu()).exclude(nom_entreprise=F("attendu"))
+
+    def verify(self):
+        count = self.stale_deals().count()
+        if count:
+            raise CommandError(f"{count} deal(s) avec un nom d'entreprise désynchronisé")
+        self.stdout.write(self.style.SUCCESS("Noms d'entreprise des deals à jour"))
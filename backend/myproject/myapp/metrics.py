@@ -0,0 +1,146 @@
+"""
+Instrumentation des requêtes HTTP.
+
+RequestMetricsMiddleware mesure, pour chaque requête, le nombre de requêtes SQL,
+le temps passé en base et le temps total, puis :
+- les renvoie dans l'en-tête `Server-Timing` (visible dans l'onglet Réseau du navigateur) ;
+- les agrège par nom de vue résolu ("deal-list", "action-statistiques", ...)
+  dans un histogramme en mémoire du processus (GET /api/metrics/requests/) ;
+- journalise un WARNING quand une requête dépasse le budget de requêtes SQL
+  (settings.QUERY_BUDGET, surchargeable par vue avec settings.QUERY_BUDGETS).
+"""
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+# Bornes supérieures (ms) des classes de l'histogramme de latence ; la dernière classe est "+Inf"
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+UNRESOLVED_VIEW = '<unresolved>'
+
+
+def query_budget(view_name):
+    """Nombre maximal de requêtes SQL attendu pour une vue (None : pas de budget)"""
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    if view_name in budgets:
+        return budgets[view_name]
+    return getattr(settings, 'QUERY_BUDGET', None)
+
+
+class QueryCounter:
+    """execute_wrapper Django : compte les requêtes SQL et cumule leur durée"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsRegistry:
+    """Agrégats par vue, protégés par un verrou (serveurs multi-threads)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view_name, queries, db_ms, total_ms, over_budget):
+        with self._lock:
+            stats = self._views.get(view_name)
+            if stats is None:
+                stats = self._views[view_name] = {
+                    'count': 0,
+                    'over_budget': 0,
+                    'queries_total': 0,
+                    'queries_max': 0,
+                    'db_ms_total': 0.0,
+                    'total_ms_total': 0.0,
+                    'total_ms_max': 0.0,
+                    'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                }
+            stats['count'] += 1
+            stats['over_budget'] += int(over_budget)
+            stats['queries_total'] += queries
+            stats['queries_max'] = max(stats['queries_max'], queries)
+            stats['db_ms_total'] += db_ms
+            stats['total_ms_total'] += total_ms
+            stats['total_ms_max'] = max(stats['total_ms_max'], total_ms)
+            index = next(
+                (i for i, bound in enumerate(LATENCY_BUCKETS_MS) if total_ms <= bound),
+                len(LATENCY_BUCKETS_MS)
+            )
+            stats['buckets'][index] += 1
+
+    def snapshot(self):
+        with self._lock:
+            views = {name: dict(stats, buckets=list(stats['buckets'])) for name, stats in self._views.items()}
+
+        bounds = [str(bound) for bound in LATENCY_BUCKETS_MS] + ['+Inf']
+        result = {}
+        for name, stats in sorted(views.items()):
+            count = stats['count']
+            result[name] = {
+                'count': count,
+                'over_budget': stats['over_budget'],
+                'query_budget': query_budget(name),
+                'queries_avg': round(stats['queries_total'] / count, 2),
+                'queries_max': stats['queries_max'],
+                'db_ms_avg': round(stats['db_ms_total'] / count, 2),
+                'total_ms_avg': round(stats['total_ms_total'] / count, 2),
+                'total_ms_max': round(stats['total_ms_max'], 2),
+                'latency_ms': dict(zip(bounds, stats['buckets'])),
+            }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetricsMiddleware:
+    """À placer en tête de MIDDLEWARE pour que le temps total couvre toute la pile"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = counter.duration * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = (match.view_name if match else None) or UNRESOLVED_VIEW
+        budget = query_budget(view_name)
+        over_budget = budget is not None and counter.count > budget
+
+        registry.record(view_name, counter.count, db_ms, total_ms, over_budget)
+        response['Server-Timing'] = (
+            f'db;dur={db_ms:.1f};desc="{counter.count} queries", app;dur={total_ms:.1f}'
+        )
+        if over_budget:
+            logger.warning(
+                "Budget de requêtes SQL dépassé sur %s : %d > %d",
+                view_name, counter.count, budget,
+                extra={'path': request.path, 'method': request.method},
+            )
+        return response
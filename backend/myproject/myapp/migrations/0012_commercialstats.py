@@ -0,0 +1,36 @@
+# Generated by Django 4.2.26 on 2026-10-17 14:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('myapp', '0011_facture_fichier_delete_commission'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommercialStats',
+            fields=[
+                ('commercial', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='commercial_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('leads_nouveau', models.IntegerField(default=0)),
+                ('leads_en_cours', models.IntegerField(default=0)),
+                ('leads_converti', models.IntegerField(default=0)),
+                ('leads_perdu', models.IntegerField(default=0)),
+                ('deals_prospection', models.IntegerField(default=0)),
+                ('deals_negociation', models.IntegerField(default=0)),
+                ('deals_gagne', models.IntegerField(default=0)),
+                ('deals_perdu', models.IntegerField(default=0)),
+                ('montant_gagne', models.BigIntegerField(default=0, help_text='Somme des montants des deals gagnés')),
+                ('commission_en_attente', models.DecimalField(decimal_places=2, default=0, help_text='Commissions des deals gagnés non encore facturés', max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Commercial stats',
+            },
+        ),
+    ]
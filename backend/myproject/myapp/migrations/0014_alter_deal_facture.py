@@ -0,0 +1,19 @@
+# Generated by Django 4.2.26 on 2026-10-17 14:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0013_sequencefacture'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='deal',
+            name='facture',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='deals', to='myapp.facture'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.26 on 2026-10-17 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0014_alter_deal_facture'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(fields=['-created_at', '-id'], name='deal_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('facture__isnull', True), ('stage', 'gagne')), fields=['relation'], name='deal_a_facturer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facture',
+            index=models.Index(fields=['commercial', '-date_facture'], name='facture_commercial_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='lead_commercial_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# Index plein texte des leads (voir myapp/search.py), SQL figé à la date de la migration
+SQLITE_CREATE = [
+    """CREATE VIRTUAL TABLE myapp_lead_fts USING fts5(
+    company_name, contact_name, email, siret,
+    content='myapp_lead', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+)""",
+    """CREATE TRIGGER myapp_lead_fts_insert AFTER INSERT ON myapp_lead BEGIN
+    INSERT INTO myapp_lead_fts(rowid, company_name, contact_name, email, siret)
+    VALUES (new.id, new.company_name, new.contact_name, new.email, new.siret);
+END""",
+    """CREATE TRIGGER myapp_lead_fts_delete AFTER DELETE ON myapp_lead BEGIN
+    INSERT INTO myapp_lead_fts(myapp_lead_fts, rowid, company_name, contact_name, email, siret)
+    VALUES ('delete', old.id, old.company_name, old.contact_name, old.email, old.siret);
+END""",
+    """CREATE TRIGGER myapp_lead_fts_update AFTER UPDATE OF company_name, contact_name, email, siret ON myapp_lead BEGIN
+    INSERT INTO myapp_lead_fts(myapp_lead_fts, rowid, company_name, contact_name, email, siret)
+    VALUES ('delete', old.id, old.company_name, old.contact_name, old.email, old.siret);
+    INSERT INTO myapp_lead_fts(rowid, company_name, contact_name, email, siret)
+    VALUES (new.id, new.company_name, new.contact_name, new.email, new.siret);
+END""",
+    "INSERT INTO myapp_lead_fts(myapp_lead_fts) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS myapp_lead_fts_insert",
+    "DROP TRIGGER IF EXISTS myapp_lead_fts_delete",
+    "DROP TRIGGER IF EXISTS myapp_lead_fts_update",
+    "DROP TABLE IF EXISTS myapp_lead_fts",
+]
+POSTGRES_CREATE = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """CREATE OR REPLACE FUNCTION myapp_unaccent(text) RETURNS text
+    AS $$ SELECT public.unaccent('public.unaccent', $1) $$
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT""",
+    """CREATE INDEX myapp_lead_search_idx ON myapp_lead USING gin ((
+    setweight(to_tsvector('simple', myapp_unaccent(coalesce(company_name, ''))), 'A')
+    || setweight(to_tsvector('simple', myapp_unaccent(coalesce(contact_name, ''))), 'B')
+    || setweight(to_tsvector('simple', myapp_unaccent(coalesce(email, ''))), 'C')
+    || setweight(to_tsvector('simple', myapp_unaccent(coalesce(siret, ''))), 'D')
+))""",
+]
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS myapp_lead_search_idx",
+    "DROP FUNCTION IF EXISTS myapp_unaccent(text)",
+]
+
+
+def run_statements(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0015_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_statements({'sqlite': SQLITE_CREATE, 'postgresql': POSTGRES_CREATE}),
+            run_statements({'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}),
+        ),
+    ]
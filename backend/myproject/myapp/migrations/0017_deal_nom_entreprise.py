@@ -0,0 +1,33 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def remplir_nom_entreprise(apps, schema_editor):
+    # Un seul UPDATE ensembliste : nom du lead de la relation, '' sans lead
+    Deal = apps.get_model('myapp', 'Deal')
+    Relation = apps.get_model('myapp', 'Relation')
+    Deal.objects.update(nom_entreprise=Coalesce(
+        Subquery(Relation.objects.filter(pk=OuterRef('relation_id')).values('lead__company_name')[:1]),
+        Value(''),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0016_lead_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deal',
+            name='nom_entreprise',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(fields=['nom_entreprise', 'id'], name='deal_nom_entreprise_idx'),
+        ),
+        migrations.RunPython(remplir_nom_entreprise, migrations.RunPython.noop),
+    ]
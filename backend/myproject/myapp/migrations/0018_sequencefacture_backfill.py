@@ -0,0 +1,41 @@
+import re
+
+from django.db import migrations
+
+# Numéros de l'ancien code : FACT-AAAAMMJJ-NNNN
+NUMERO_HISTORIQUE = re.compile(r'^(FACT-\d{8})-(\d+)$')
+
+
+def amorcer_sequences(apps, schema_editor):
+    # Compteurs alignés sur le plus grand numéro existant de chaque préfixe
+    Facture = apps.get_model('myapp', 'Facture')
+    SequenceFacture = apps.get_model('myapp', 'SequenceFacture')
+    derniers = {}
+    numeros = Facture.objects.filter(numero_facture__startswith='FACT-').values_list('numero_facture', flat=True)
+    for numero in numeros.iterator():
+        match = NUMERO_HISTORIQUE.match(numero)
+        if match:
+            prefixe, valeur = match.group(1), int(match.group(2))
+            derniers[prefixe] = max(derniers.get(prefixe, 0), valeur)
+    existants = SequenceFacture.objects.in_bulk(list(derniers), field_name='prefixe')
+    SequenceFacture.objects.bulk_create([
+        SequenceFacture(prefixe=prefixe, dernier_numero=dernier)
+        for prefixe, dernier in derniers.items() if prefixe not in existants
+    ])
+    a_corriger = []
+    for prefixe, sequence in existants.items():
+        if sequence.dernier_numero < derniers[prefixe]:
+            sequence.dernier_numero = derniers[prefixe]
+            a_corriger.append(sequence)
+    SequenceFacture.objects.bulk_update(a_corriger, ['dernier_numero'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0017_deal_nom_entreprise'),
+    ]
+
+    operations = [
+        migrations.RunPython(amorcer_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.26 on 2026-10-17 15:53
+
+import importlib
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+search_index = importlib.import_module('myapp.migrations.0016_lead_search_index')
+
+
+def remplir_declared_at(apps, schema_editor):
+    # Un seul UPDATE : leads sans date de déclaration datés de leur création
+    Lead = apps.get_model('myapp', 'Lead')
+    Lead.objects.filter(declared_at__isnull=True).update(declared_at=F('created_at'))
+
+
+def recreer_index_recherche(apps, schema_editor):
+    # SQLite reconstruit myapp_lead pour l'AlterField : ses triggers FTS disparaissent avec l'ancienne table
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in search_index.SQLITE_DROP + search_index.SQLITE_CREATE:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0018_sequencefacture_backfill'),
+    ]
+
+    operations = [
+        migrations.RunPython(remplir_declared_at, recreer_index_recherche),
+        migrations.AlterField(
+            model_name='lead',
+            name='declared_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(recreer_index_recherche, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['created_by', '-declared_at', '-id'], name='lead_commercial_declared_idx'),
+        ),
+    ]
@@ -3,6 +3,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import EmailValidator, RegexValidator
+from django.utils import timezone
 import uuid
 
 class Lead(models.Model):
@@ -21,7 +22,8 @@ class Lead(models.Model):
     siret = models.CharField(max_length=9,blank=True,null=True,validators=[RegexValidator(regex=r'^\d{9}$')],help_text="SIRET number (9 digits)")
     status = models.CharField(max_length=20,choices=LEAD_STATUS_CHOICES,default='nouveau')
     notes = models.TextField(blank=True, null=True)
-    declared_at = models.DateTimeField(blank=True, null=True)
+    # Jamais NULL : colonne de tri de la pagination keyset (comme created_at)
+    declared_at = models.DateTimeField(default=timezone.now)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -30,6 +32,9 @@ class Lead(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['created_at']),
             models.Index(fields=['company_name']),
+            # Liste paginée (keyset) des leads d'un commercial
+            models.Index(fields=['created_by', '-created_at', '-id'], name='lead_commercial_recent_idx'),
+            models.Index(fields=['created_by', '-declared_at', '-id'], name='lead_commercial_declared_idx'),
         ]
 
     def __str__(self):
@@ -153,12 +158,32 @@ class Facture(models.Model):
         indexes = [
             models.Index(fields=['statut_paiement']),
             models.Index(fields=['date_facture']),
+            models.Index(fields=['commercial', '-date_facture'], name='facture_commercial_date_idx'),
         ]
         ordering = ['-date_facture']
 
     def __str__(self):
         return f"Facture {self.numero_facture}"
 
+class SequenceFacture(models.Model):
+    """
+    Compteur de numérotation des factures, une ligne par préfixe (ex. FACT-20251128).
+    Incrémenté dans la transaction qui crée la facture : numéros uniques et sans trous.
+    """
+    prefixe = models.CharField(max_length=30, unique=True)
+    dernier_numero = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Séquences factures"
+
+    def __str__(self):
+        return f"{self.prefixe} ({self.dernier_numero})"
+
+# Deal._nom_entreprise_source : lead de la relation non connu (relation non chargée)
+_LEAD_INCONNU = object()
+
+
 class Deal(models.Model):
     DEAL_STAGE_CHOICES = [
         ('prospection', 'Prospection'),
@@ -174,12 +199,13 @@ class Deal(models.Model):
         ('durable', 'Durable'),
     ]
     
-    facture = models.OneToOneField(
+    # Une facture regroupe un ou plusieurs deals (facturation groupée par commercial)
+    facture = models.ForeignKey(
         Facture, 
         on_delete=models.SET_NULL, 
         null=True, 
         blank=True,
-        related_name='deal'
+        related_name='deals'
     )
     relation = models.ForeignKey(
         Relation, 
@@ -187,8 +213,10 @@ class Deal(models.Model):
         related_name='deals'
     )
     nom_deal = models.CharField(max_length=255)
-    # nom_entreprise = models.CharField(max_length=255)
-    # à supprimer   
+    # Copie de relation.lead.company_name (recherche et tri sans jointure) :
+    # calculée dans save(), resynchronisée par signaux (myapp.signals) et par
+    # la commande sync_deal_nom_entreprise
+    nom_entreprise = models.CharField(max_length=255, blank=True, default='', editable=False)
     type_deal = models.CharField(
         max_length=20,
         choices=DEAL_TYPE_CHOICES,
@@ -218,6 +246,15 @@ class Deal(models.Model):
             models.Index(fields=['stage']),
             models.Index(fields=['type_deal']),
             models.Index(fields=['remporte_le']),
+            models.Index(fields=['-created_at', '-id'], name='deal_recent_idx'),
+            # Tri par entreprise + pagination keyset (nom_entreprise, id)
+            models.Index(fields=['nom_entreprise', 'id'], name='deal_nom_entreprise_idx'),
+            # Index partiel : seuls les deals gagnés non facturés (page Commissions, facturation en masse)
+            models.Index(
+                fields=['relation'],
+                name='deal_a_facturer_idx',
+                condition=models.Q(stage='gagne', facture__isnull=True),
+            ),
         ]
 
     def __str__(self):
@@ -232,8 +269,45 @@ class Deal(models.Model):
             ).exists()
             if existing_deals:
                 self.type_deal = 'one_shot'
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'nom_entreprise' in update_fields:
+            self.nom_entreprise = self.nom_entreprise_relation()
+            relation = self.relation if Deal.relation.is_cached(self) else None
+            self._nom_entreprise_source = (self.relation_id, relation.lead_id if relation else _LEAD_INCONNU)
         super().save(*args, **kwargs)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'nom_entreprise' in field_names and 'relation_id' in field_names:
+            # Valeur lue en base, tenue à jour par les signaux de Lead et Relation
+            instance._nom_entreprise_source = (instance.relation_id, _LEAD_INCONNU)
+        return instance
+
+    def nom_entreprise_relation(self):
+        """
+        Nom de l'entreprise du lead de la relation ('' sans lead). Relation et lead
+        inchangés depuis le dernier calcul (ou la lecture) : valeur courante, sans requête.
+        """
+        if not self.relation_id:
+            return ''
+        relation = self.relation if Deal.relation.is_cached(self) else None
+        if relation is not None and Relation.lead.is_cached(relation):
+            return relation.lead.company_name if relation.lead else ''
+        source = getattr(self, '_nom_entreprise_source', None)
+        if source is not None and source[0] == self.relation_id:
+            if relation is None or source[1] in (_LEAD_INCONNU, relation.lead_id):
+                return self.nom_entreprise
+        if relation is not None:
+            # Relation chargée : seul le nom du lead est lu
+            if not relation.lead_id:
+                return ''
+            return Lead.objects.filter(pk=relation.lead_id).values_list('company_name', flat=True).first() or ''
+        # Relation non chargée : une seule requête
+        return Relation.objects.filter(pk=self.relation_id).values_list(
+            'lead__company_name', flat=True
+        ).first() or ''
+
 class Action(models.Model):
     ACTION_TYPE_CHOICES = [
         ('call', 'Appel'),
@@ -319,3 +393,49 @@ class Profil(models.Model):
     def __str__(self):
         return f"Profil de {self.user.username}"
 
+
+class CommercialStats(models.Model):
+    """
+    Compteurs dénormalisés par commercial pour le dashboard.
+    Maintenus par les signaux sur Lead/Deal (voir signals.py),
+    reconstruits par `manage.py rebuild_commercial_stats`.
+    """
+    commercial = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='commercial_stats'
+    )
+    leads_nouveau = models.IntegerField(default=0)
+    leads_en_cours = models.IntegerField(default=0)
+    leads_converti = models.IntegerField(default=0)
+    leads_perdu = models.IntegerField(default=0)
+    deals_prospection = models.IntegerField(default=0)
+    deals_negociation = models.IntegerField(default=0)
+    deals_gagne = models.IntegerField(default=0)
+    deals_perdu = models.IntegerField(default=0)
+    montant_gagne = models.BigIntegerField(
+        default=0,
+        help_text="Somme des montants des deals gagnés"
+    )
+    commission_en_attente = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        help_text="Commissions des deals gagnés non encore facturés"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Commercial stats"
+
+    def __str__(self):
+        return f"Stats de {self.commercial.username}"
+
+    @property
+    def total_leads(self):
+        return self.leads_nouveau + self.leads_en_cours + self.leads_converti + self.leads_perdu
+
+    @property
+    def active_deals(self):
+        return self.deals_prospection + self.deals_negociation
@@ -0,0 +1,58 @@
+"""
+Cache du catalogue des offres actives.
+
+Le catalogue change rarement mais il est lu à chaque formulaire et à chaque
+création de lead. Chaque processus en garde une copie en mémoire, étiquetée
+par un numéro de version stocké dans le cache Django partagé (settings.CACHES,
+commun aux workers) : une lecture coûte un accès au cache, pas de requête SQL
+tant que la version n'a pas changé.
+
+Toute écriture sur Offre (save / delete, voir myapp.signals) change la
+version, immédiatement puis de nouveau au commit : un processus qui aurait
+relu la table avant le commit recharge le catalogue au passage suivant.
+Les écritures par queryset.update() doivent appeler invalider_catalogue().
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Offre
+
+VERSION_KEY = 'myapp:offres:version'
+
+# (version, offres) du processus ; remplacé d'un bloc, lisible sans verrou entre threads
+_catalogue = (None, ())
+
+
+def catalogue_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Premier accès (ou cache vidé) : add() pour que tous les workers retiennent la même
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def offres_actives():
+    """Offres actives triées par id (tuple partagé : ne pas modifier les instances)"""
+    global _catalogue
+    version = catalogue_version()
+    cached_version, offres = _catalogue
+    if version is None or cached_version != version:
+        offres = tuple(Offre.objects.filter(actif=True).order_by('id'))
+        _catalogue = (version, offres)
+    return offres
+
+
+def offre_active(pk):
+    """Offre active d'id `pk`, ou None"""
+    for offre in offres_actives():
+        if offre.pk == pk:
+            return offre
+    return None
+
+
+def invalider_catalogue():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+    transaction.on_commit(lambda: cache.set(VERSION_KEY, uuid.uuid4().hex, None))
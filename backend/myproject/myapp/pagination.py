@@ -0,0 +1,169 @@
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination par curseur (keyset) sur une colonne indexée + `id`.
+
+    La page suivante est obtenue par un `WHERE (col, id) < (valeur, id)` au lieu
+    d'un OFFSET : une page profonde coûte autant que la première.
+    La colonne est lue sur la vue (`keyset_ordering`, ex. "-date_facture", ou
+    `get_keyset_ordering()`), `id` sert de départage stable dans le même sens.
+    `?ordering=` sur une colonne de `keyset_ordering_fields` (dotée d'un index
+    (col, id)) remplace cet ordre ; toute autre colonne est refusée en 400
+    plutôt qu'ignorée.
+    """
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = '-created_at'
+    ordering_query_param = 'ordering'
+    invalid_cursor_message = 'Curseur invalide'
+    invalid_ordering_message = 'Tri non disponible pour cette liste : {}'
+
+    def get_ordering(self, view):
+        # get_keyset_ordering() : ordre propre à la requête (ex. pertinence d'une recherche)
+        if hasattr(view, 'get_keyset_ordering'):
+            return view.get_keyset_ordering()
+        # ?ordering= déjà validé par check_ordering()
+        ordering = view.request.query_params.get(self.ordering_query_param, '').strip()
+        return ordering or getattr(view, 'keyset_ordering', self.ordering)
+
+    def check_ordering(self, request, view):
+        ordering = request.query_params.get(self.ordering_query_param, '').strip()
+        allowed = getattr(view, 'keyset_ordering_fields', ())
+        if ordering and ordering.lstrip('-') not in allowed:
+            raise ValidationError({
+                self.ordering_query_param: [self.invalid_ordering_message.format(', '.join(allowed) or 'aucun')]
+            })
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def window_queryset(self, queryset, request, view=None):
+        """
+        Lignes de la page demandée, plus une pour savoir s'il existe une page suivante :
+        queryset trié, filtré par le curseur et tronqué, non évalué.
+        Sert aussi aux validateurs ETag (voir myapp/conditional.py).
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.check_ordering(request, view)
+        ordering = self.get_ordering(view)
+        self.field = ordering.lstrip('-')
+        self.descending = ordering.startswith('-')
+        self.cursor = self.decode_cursor(request, queryset.model)
+
+        reverse = bool(self.cursor and self.cursor['reverse'])
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(prefix + self.field, prefix + 'id')
+
+        if self.cursor is not None:
+            lookup = 'lt' if descending else 'gt'
+            value, pk = self.cursor['value'], self.cursor['id']
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': value})
+                | Q(**{self.field: value, f'id__{lookup}': pk})
+            )
+        return queryset[:self.page_size + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        results = list(self.window_queryset(queryset, request, view))
+        reverse = bool(self.cursor and self.cursor['reverse'])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next = self.cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.page = results
+        return results
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8')
+            data = json.loads(raw)
+            try:
+                value = model._meta.get_field(self.field).to_python(data['v'])
+            except FieldDoesNotExist:
+                # Annotation (ex. search_rank) : valeur JSON telle quelle
+                value = data['v']
+            return {
+                'value': value,
+                'id': int(data['id']),
+                'reverse': bool(data.get('r')),
+            }
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        # Instances de modèle ou lignes values() (la projection doit inclure la colonne et `id`)
+        if isinstance(obj, dict):
+            value, pk = obj[self.field], obj['id']
+        else:
+            value, pk = getattr(obj, self.field), obj.pk
+        data = {
+            'v': value.isoformat() if hasattr(value, 'isoformat') else value,
+            'id': pk,
+            'r': 1 if reverse else 0,
+        }
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,122 @@
+"""
+Recherche plein texte des leads (paramètre ?search=).
+
+L'index couvre company_name, contact_name, email et siret :
+- SQLite : table virtuelle FTS5 `myapp_lead_fts` (contenu externe = myapp_lead),
+  tenue à jour par des triggers sur myapp_lead, donc aussi pour bulk_create / update() ;
+- PostgreSQL : index GIN sur une expression tsvector (extension unaccent),
+  maintenu par le moteur.
+
+Les deux ignorent casse et accents ("societe" trouve "Société"), chaque mot
+saisi est traité comme un préfixe ("soc gen" -> "Société Générale") pour la
+saisie semi-automatique, et les résultats sont classés par pertinence
+(annotation `search_rank`, plus petit = plus pertinent).
+Voir la migration 0016_lead_search_index.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, F, FloatField, Func, Value
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+FTS_TABLE = 'myapp_lead_fts'
+SEARCH_COLUMNS = ('company_name', 'contact_name', 'email', 'siret')
+# Poids de chaque colonne dans le classement (même ordre que SEARCH_COLUMNS)
+SEARCH_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def postgres_vector():
+    """
+    Document tsvector pondéré (A..D dans l'ordre de SEARCH_COLUMNS), sans accents.
+    Doit rester identique à l'expression de l'index myapp_lead_search_idx. Les colonnes
+    sont des F() : qualifiées par l'alias de la requête (auth_user, joint par
+    select_related, a aussi un email), y compris dans une sous-requête.
+    """
+    return Func(
+        *[
+            Func(F(column), template=f"setweight(to_tsvector('simple', myapp_unaccent(coalesce(%(expressions)s, ''))), '{label}')")
+            for column, label in zip(SEARCH_COLUMNS, 'ABCD')
+        ],
+        template='%(expressions)s',
+        arg_joiner=' || ',
+    )
+
+
+class Bm25Rank(Func):
+    """
+    bm25 de la ligne pour la requête FTS5 : Bm25Rank(Value(requête), F('id')).
+    L'id est compilé avec l'alias de la requête, y compris dans une sous-requête
+    (fenêtre keyset des validateurs ETag).
+    """
+    template = (
+        f"(SELECT bm25({FTS_TABLE}, {', '.join(str(weight) for weight in SEARCH_WEIGHTS)}) "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %(expressions)s)"
+    )
+    arg_joiner = ' AND rowid = '
+    output_field = FloatField()
+
+
+def search_tokens(term):
+    return _TOKEN_RE.findall(term or '')
+
+
+def fts5_query(tokens):
+    # Chaque mot entre guillemets (pas d'opérateurs FTS5 saisis par l'utilisateur), en préfixe
+    return ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+
+
+def tsquery(tokens):
+    return ' & '.join(f'{token}:*' for token in tokens)
+
+
+def search_leads(queryset, term):
+    """Filtre un queryset de Lead et l'annote avec `search_rank` (None : recherche vide ou moteur sans index)"""
+    tokens = search_tokens(term)
+    if not tokens:
+        return None
+    vendor = connection.vendor
+    if vendor == 'sqlite':
+        query = fts5_query(tokens)
+        return queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [query])
+        ).annotate(
+            # bm25 : négatif, plus petit = plus pertinent
+            search_rank=Bm25Rank(Value(query), F('id'))
+        )
+    if vendor == 'postgresql':
+        query = tsquery(tokens)
+        vector = postgres_vector()
+        return queryset.filter(Func(
+            vector, Value(query),
+            template="(%(expressions)s))",
+            arg_joiner=") @@ to_tsquery('simple', myapp_unaccent(",
+            output_field=BooleanField(),
+        )).annotate(search_rank=Func(
+            # Opposé de ts_rank pour partager le sens de tri (croissant) avec bm25 ; poids {D, C, B, A}
+            vector, Value(query),
+            template="-ts_rank('{0.1, 0.2, 0.5, 1.0}', (%(expressions)s)))",
+            arg_joiner="), to_tsquery('simple', myapp_unaccent(",
+            output_field=FloatField(),
+        ))
+    return None
+
+
+class LeadSearchFilter(filters.SearchFilter):
+    """
+    ?search= servi par l'index plein texte ; sur un autre moteur, repli sur
+    le SearchFilter de DRF (icontains sur search_fields) sans classement.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '')
+        if not search_tokens(term):
+            return queryset
+        results = search_leads(queryset, term)
+        if results is None:
+            results = super().filter_queryset(request, queryset, view).annotate(
+                search_rank=Value(0.0, output_field=FloatField())
+            )
+        return results
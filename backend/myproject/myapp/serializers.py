@@ -5,15 +5,37 @@ from .models import Lead, Action, Offre, Relation, Facture, Deal, Profil
 from django.contrib.auth import get_user_model
 import re
 from django.utils import timezone
+from .logging import get_logger
+from .offres import offre_active
+from .commercial_stats import refresh_lead_counters
+from .deal_stages import appliquer_effets_stage, remporte_le
+from .transactions import atomic_write
 
 User = get_user_model()
+logger = get_logger(__name__)
+
+class OffreActiveField(serializers.PrimaryKeyRelatedField):
+    """Offre active par id, lue dans le catalogue en cache (myapp/offres.py) plutôt qu'en base"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        offre = offre_active(pk)
+        if offre is None:
+            self.fail('does_not_exist', pk_value=data)
+        return offre
+
 
 class LeadSerializer(serializers.ModelSerializer):
     created_by = serializers.PrimaryKeyRelatedField(read_only=True)
     created_by_username = serializers.SerializerMethodField(read_only=True)
     
     # Champ pour l'écriture
-    offre_id = serializers.PrimaryKeyRelatedField(
+    offre_id = OffreActiveField(
         queryset=Offre.objects.filter(actif=True),
         write_only=True,
         required=False,
@@ -36,33 +58,29 @@ class LeadSerializer(serializers.ModelSerializer):
     def get_created_by_username(self, obj):
         return obj.created_by.username if obj.created_by else None
     
+    def _get_current_relation(self, obj):
+        """Relation courante du lead (la plus ancienne), prefetchée par la vue si possible"""
+        prefetched = getattr(obj, 'prefetched_relations', None)
+        if prefetched is not None:
+            return prefetched[0] if prefetched else None
+        return Relation.objects.filter(lead=obj).select_related('offre').order_by('id').first()
+
     def get_current_offre_id(self, obj):
         """Récupérer l'ID de l'offre depuis la relation"""
-        try:
-            # Trouver la relation associée à ce lead
-            relation = Relation.objects.filter(lead=obj).first()
-            if relation and relation.offre:
-                return relation.offre.id
-            return None
-        except Exception:
-            return None
+        relation = self._get_current_relation(obj)
+        return relation.offre_id if relation else None
     
     def get_offre_details(self, obj):
         """Récupérer les détails de l'offre depuis la relation"""
-        try:
-            # Trouver la relation associée à ce lead
-            relation = Relation.objects.filter(lead=obj).first()
-            if relation and relation.offre:
-                return {
-                    'id': relation.offre.id,
-                    'nom': relation.offre.nom_offre,
-                    'taux_commission': relation.offre.taux_commission,
-                    'plan_commission': relation.offre.plan_commission,
-                }
-            return None
-        except Exception as e:
-            print(f"Error getting offre details: {e}")
-            return None
+        relation = self._get_current_relation(obj)
+        if relation and relation.offre:
+            return {
+                'id': relation.offre.id,
+                'nom': relation.offre.nom_offre,
+                'taux_commission': relation.offre.taux_commission,
+                'plan_commission': relation.offre.plan_commission,
+            }
+        return None
     
     def create(self, validated_data):
         offre = validated_data.pop('offre', None)
@@ -88,14 +106,16 @@ class LeadSerializer(serializers.ModelSerializer):
                     commercial=user,  # ou le commercial approprié
                     # autres champs requis par votre modèle Relation
                 )
-            except Exception as e:
-                print(f"Error creating relation: {e}")
+                # Lu par LeadViewSet.create_relation_for_lead : relation déjà créée
+                lead._offre = offre
+            except Exception:
+                logger.exception("Erreur lors de la création de la relation du lead %s", lead.id)
             
         return lead
     
 #  *************************************************************
 class LeadUpdateSerializer(serializers.ModelSerializer):
-    offre_id = serializers.PrimaryKeyRelatedField(
+    offre_id = OffreActiveField(
     queryset=Offre.objects.filter(actif=True),
     required=False,  # Optionnel pour la mise à jour
     source='offre'
@@ -155,7 +175,6 @@ class RelationInfoSerializer(serializers.ModelSerializer):
 #  *************************************************************
 
 class DealSerializer(serializers.ModelSerializer):
-    nom_entreprise = serializers.CharField(source='relation.lead.company_name', read_only=True)
     lead_info = serializers.SerializerMethodField()
     
     class Meta:
@@ -228,17 +247,17 @@ class DealSerializer(serializers.ModelSerializer):
         # Récupérer la relation
         relation = validated_data.get('relation')
         
-        print(f"🔄 Création du deal pour la relation: {relation.id}")
+        logger.debug("Création du deal pour la relation %s", relation.id)
         
         # 1. Gestion du taux de commission
         if 'taux_commission' not in validated_data or validated_data['taux_commission'] is None:
             # Utiliser le taux de commission de l'offre de la relation
             if relation and relation.offre:
                 validated_data['taux_commission'] = relation.offre.taux_commission
-                print(f"📊 Taux de commission utilisé depuis l'offre: {relation.offre.taux_commission}")
+                logger.debug("Taux de commission repris de l'offre: %s", relation.offre.taux_commission)
             else:
                 validated_data['taux_commission'] = 0
-                print("📊 Taux de commission par défaut: 0")
+                logger.debug("Taux de commission par défaut: 0")
         
         # 2. Déterminer automatiquement le type_deal si non fourni
         if not validated_data.get('type_deal'):
@@ -251,31 +270,27 @@ class DealSerializer(serializers.ModelSerializer):
                 
                 if existing_durable_deals:
                     validated_data['type_deal'] = 'one_shot'
-                    print("🎯 Type de deal déterminé: one_shot (déjà un deal durable existant)")
+                    logger.debug("Type de deal: one_shot (deal durable déjà existant)")
                 else:
                     # Utiliser le plan de commission de l'offre comme indicateur
                     if relation.offre and relation.offre.plan_commission == 'durable':
                         validated_data['type_deal'] = 'durable'
-                        print("🎯 Type de deal déterminé: durable (selon l'offre)")
+                        logger.debug("Type de deal: durable (selon l'offre)")
                     else:
                         validated_data['type_deal'] = 'one_shot'
-                        print("🎯 Type de deal déterminé: one_shot (par défaut)")
+                        logger.debug("Type de deal: one_shot (par défaut)")
             else:
                 validated_data['type_deal'] = 'one_shot'
-                print("🎯 Type de deal par défaut: one_shot")
+                logger.debug("Type de deal par défaut: one_shot")
         
         # 3. Mettre à jour la date de dernière action de la relation
         if relation:
             relation.derniere_action = timezone.now()
             relation.save(update_fields=['derniere_action'])
-            print("🕐 Date de dernière action de la relation mise à jour")
         
         # 4. Si le deal est gagné, mettre à jour la date de remport
         if validated_data.get('stage') == 'gagne' and not validated_data.get('remporte_le'):
             validated_data['remporte_le'] = timezone.now()
-            print("🏆 Date de remport automatiquement définie")
-        
-        print(f"✅ Données validées pour la création: {validated_data}")
         
         try:
             # Créer l'instance
@@ -286,20 +301,34 @@ class DealSerializer(serializers.ModelSerializer):
                 if instance.stage == 'gagne':
                     relation.lead.status = 'converti'
                     relation.lead.save(update_fields=['status'])
-                    print("🔄 Statut du lead mis à jour: converti")
+                    logger.debug("Lead %s converti", relation.lead_id)
                 elif instance.stage == 'perdu':
                     relation.lead.status = 'perdu'
                     relation.lead.save(update_fields=['status'])
-                    print("🔄 Statut du lead mis à jour: perdu")
+                    logger.debug("Lead %s perdu", relation.lead_id)
             
-            print(f"✅ Deal créé avec succès: {instance.id}")
+            logger.debug("Deal créé: %s", instance.id)
             return instance
             
         except Exception as e:
-            print(f"❌ Erreur lors de la création du deal: {str(e)}")
+            logger.exception("Erreur lors de la création du deal")
             raise serializers.ValidationError({
                 "non_field_errors": [f"Erreur lors de la création du deal: {str(e)}"]
             })
+
+    def update(self, instance, validated_data):
+        """Changement d'étape : mêmes effets de bord que le changement en masse (myapp/deal_stages.py)"""
+        stage = validated_data.get('stage')
+        if stage is None or stage == instance.stage:
+            return super().update(instance, validated_data)
+
+        maintenant = timezone.now()
+        validated_data['remporte_le'] = remporte_le(stage, maintenant)
+        with atomic_write():
+            # Compteurs des deals : signaux de Deal.save()
+            instance = super().update(instance, validated_data)
+            refresh_lead_counters(appliquer_effets_stage([instance.pk], stage, maintenant))
+        return instance
 # *************************************************************
 
 class ActionSerializer(serializers.ModelSerializer):
@@ -358,7 +387,7 @@ class RelationSerializer(serializers.ModelSerializer):
         fields = '__all__'
 # *************************************************************
 class FactureSerializer(serializers.ModelSerializer):
-    deal = DealSerializer(read_only=True)
+    deals = DealSerializer(many=True, read_only=True)
     commercial_name = serializers.CharField(source='commercial.get_full_name', read_only=True)
     
     class Meta:
@@ -366,7 +395,7 @@ class FactureSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'numero_facture', 'montant_ht', 'montant_ttc', 
             'date_facture', 'date_echeance', 'statut_paiement', 'fichier',
-            'deal', 'commercial_name', 'created_at', 'updated_at'
+            'deals', 'commercial_name', 'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
 
@@ -0,0 +1,193 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .authentication import user_changed
+from .commercial_stats import apply_contributions, deal_contribution, lead_contribution, refresh_commercial_stats
+from .models import CommercialStats, Deal, Facture, Lead, Offre, Profil, Relation
+from .offres import invalider_catalogue
+
+
+def _lead_state(lead):
+    return {'commercial_id': lead.created_by_id, 'status': lead.status}
+
+
+def _deal_state(deal):
+    # Le taux de l'offre ne sert que pour une commission en attente sans taux propre au deal
+    needs_offre = (
+        deal.relation_id and deal.stage == 'gagne'
+        and deal.facture_id is None and deal.taux_commission is None
+    )
+    return {
+        'commercial_id': deal.relation.commercial_id if deal.relation_id else None,
+        'stage': deal.stage,
+        'montant': deal.montant,
+        'taux_commission': deal.taux_commission,
+        'taux_offre': deal.relation.offre.taux_commission if needs_offre else None,
+        'facture_id': deal.facture_id,
+    }
+
+
+@receiver(pre_save, sender=Lead)
+def lead_pre_save(sender, instance, raw=False, **kwargs):
+    instance._stats_old = None
+    if instance.pk and not raw:
+        instance._stats_old = (
+            Lead.objects.filter(pk=instance.pk)
+            .values('status', 'company_name', commercial_id=F('created_by_id'))
+            .first()
+        )
+
+
+@receiver(post_save, sender=Lead)
+def lead_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old_state = getattr(instance, '_stats_old', None)
+    apply_contributions(lead_contribution(old_state), lead_contribution(_lead_state(instance)))
+    if old_state and old_state['company_name'] != instance.company_name:
+        # Lead renommé : nom_entreprise dénormalisé sur ses deals
+        Deal.objects.filter(relation__lead=instance).update(
+            nom_entreprise=instance.company_name, updated_at=timezone.now()
+        )
+
+
+@receiver(pre_delete, sender=Lead)
+def lead_pre_delete(sender, instance, **kwargs):
+    # Les relations passent à lead=NULL (SET_NULL, sans signaux) : deals sans entreprise
+    Deal.objects.filter(relation__lead=instance).update(nom_entreprise='', updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Lead)
+def lead_post_delete(sender, instance, **kwargs):
+    apply_contributions(lead_contribution(_lead_state(instance)), {}, create_missing=False)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def user_post_write(sender, instance, created=False, raw=False, **kwargs):
+    # Champs signés des jetons déjà émis périmés (myapp/authentication.py) ; création : aucun jeton
+    if not created and not raw:
+        user_changed(instance.pk)
+
+
+@receiver(post_save, sender=Profil)
+@receiver(post_delete, sender=Profil)
+def profil_post_write(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        user_changed(instance.user_id)
+
+
+@receiver(pre_save, sender=Offre)
+def offre_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._taux_old = None
+    if update_fields is not None and 'taux_commission' not in update_fields:
+        return
+    if instance.pk and not raw:
+        instance._taux_old = Offre.objects.filter(pk=instance.pk).values_list('taux_commission', flat=True).first()
+
+
+@receiver(post_save, sender=Offre)
+@receiver(post_delete, sender=Offre)
+def offre_changed(sender, instance, raw=False, **kwargs):
+    # Catalogue des offres actives mis en cache par chaque processus (myapp/offres.py)
+    invalider_catalogue()
+
+
+@receiver(post_save, sender=Offre)
+def offre_post_save(sender, instance, raw=False, **kwargs):
+    old_taux = getattr(instance, '_taux_old', None)
+    if raw or old_taux is None or old_taux == Decimal(str(instance.taux_commission)):
+        return
+    # Taux de l'offre : commission en attente des deals gagnés non facturés sans taux propre
+    commercial_ids = (
+        Deal.objects.filter(relation__offre=instance, stage='gagne', facture__isnull=True, taux_commission__isnull=True)
+        .order_by().values_list('relation__commercial_id', flat=True).distinct()
+    )
+    for commercial_id in sorted(commercial_ids):
+        refresh_commercial_stats(commercial_id)
+
+
+@receiver(pre_delete, sender=Facture)
+def facture_pre_delete(sender, instance, **kwargs):
+    # Deals repassés à facture=NULL par le collecteur (update, sans signaux) : commission en attente
+    instance._stats_commercial_ids = {instance.commercial_id} | set(
+        Deal.objects.filter(facture=instance).values_list('relation__commercial_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Facture)
+def facture_post_delete(sender, instance, **kwargs):
+    commercial_ids = getattr(instance, '_stats_commercial_ids', {instance.commercial_id})
+    # Commercial supprimé en cascade : pas de ligne CommercialStats à recréer
+    existing = CommercialStats.objects.filter(commercial_id__in=commercial_ids).values_list('commercial_id', flat=True)
+    for commercial_id in sorted(existing):
+        refresh_commercial_stats(commercial_id)
+
+
+@receiver(pre_save, sender=Relation)
+def relation_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._stats_old = None
+    if update_fields is not None and not {'commercial', 'offre', 'lead'} & set(update_fields):
+        # save(update_fields=['derniere_action']) : pas de lecture supplémentaire
+        return
+    if instance.pk and not raw:
+        instance._stats_old = (
+            Relation.objects.filter(pk=instance.pk).values('commercial_id', 'offre_id', 'lead_id').first()
+        )
+
+
+@receiver(post_save, sender=Relation)
+def relation_post_save(sender, instance, created=False, raw=False, **kwargs):
+    old = getattr(instance, '_stats_old', None)
+    if raw or created or old is None:
+        # Ni commercial, ni offre, ni lead dans update_fields : rien à recalculer
+        return
+    if (old['commercial_id'], old['offre_id']) != (instance.commercial_id, instance.offre_id):
+        # Compteurs de deals rattachés au commercial de la relation ; taux de repli de l'offre
+        if Deal.objects.filter(relation=instance).exists():
+            for commercial_id in sorted({old['commercial_id'], instance.commercial_id}):
+                refresh_commercial_stats(commercial_id)
+    if old['lead_id'] == instance.lead_id:
+        return
+    # Lead de la relation changé : deals dont le nom diffère seulement
+    company_name = instance.lead.company_name if instance.lead_id else ''
+    Deal.objects.filter(relation=instance).exclude(nom_entreprise=company_name).update(
+        nom_entreprise=company_name, updated_at=timezone.now()
+    )
+
+
+@receiver(pre_save, sender=Deal)
+def deal_pre_save(sender, instance, raw=False, **kwargs):
+    instance._stats_old = None
+    if instance.pk and not raw:
+        instance._stats_old = (
+            Deal.objects.filter(pk=instance.pk)
+            .values('stage', 'montant', 'taux_commission', 'facture_id',
+                    commercial_id=F('relation__commercial_id'),
+                    taux_offre=F('relation__offre__taux_commission'))
+            .first()
+        )
+
+
+@receiver(post_save, sender=Deal)
+def deal_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old = deal_contribution(getattr(instance, '_stats_old', None))
+    apply_contributions(old, deal_contribution(_deal_state(instance)))
+
+
+@receiver(pre_delete, sender=Deal)
+def deal_pre_delete(sender, instance, **kwargs):
+    # La relation peut être supprimée en cascade : on lit l'état avant suppression
+    instance._stats_old = _deal_state(instance)
+
+
+@receiver(post_delete, sender=Deal)
+def deal_post_delete(sender, instance, **kwargs):
+    apply_contributions(deal_contribution(getattr(instance, '_stats_old', None)), {}, create_missing=False)
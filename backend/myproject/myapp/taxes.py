@@ -0,0 +1,123 @@
+"""
+Calcul exact des commissions et de la TVA.
+
+Côté Python les montants sont des Decimal ; côté base on calcule en entiers
+(centimes, taux en centièmes de pour-cent) : SQLite stocke les DecimalField
+en flottants, l'arithmétique entière donne le même résultat au centime près
+sur tous les moteurs. Arrondi au demi supérieur (en s'éloignant de zéro),
+deal par deal pour les commissions, sur le total HT pour la TVA.
+
+Taux de commission d'un deal : Deal.taux_commission s'il est renseigné,
+sinon celui de l'offre de la relation. Taux de TVA : settings.TAUX_TVA.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
+from django.db.models.lookups import LessThan
+
+CENT = Decimal('0.01')
+TAUX_TVA_DEFAUT = Decimal('20.00')
+
+
+def taux_tva():
+    """Taux de TVA en pour-cent (ex. Decimal('20.00'))"""
+    return Decimal(str(getattr(settings, 'TAUX_TVA', TAUX_TVA_DEFAUT)))
+
+
+# --- Calcul unitaire (Python) ---------------------------------------------
+
+def arrondi_centime(montant):
+    return Decimal(montant).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def taux_commission_effectif(deal_taux, offre_taux):
+    taux = deal_taux if deal_taux is not None else offre_taux
+    return Decimal(str(taux)) if taux is not None else Decimal('0')
+
+
+def commission(montant, taux):
+    """montant * taux / 100, arrondi au centime"""
+    return arrondi_centime(Decimal(montant or 0) * Decimal(str(taux or 0)) / 100)
+
+
+def tva(montant_ht, taux=None):
+    taux = taux_tva() if taux is None else Decimal(str(taux))
+    return arrondi_centime(Decimal(montant_ht or 0) * taux / 100)
+
+
+def montant_ttc(montant_ht, taux=None):
+    return arrondi_centime(montant_ht or 0) + tva(montant_ht, taux)
+
+
+def centimes(valeur):
+    """Entier en centimes (résultat des expressions SQL) -> Decimal en euros"""
+    return (Decimal(valeur or 0) / 100).quantize(CENT)
+
+
+# --- Expressions SQL (calcul vectorisé sur un queryset) ---------------------
+
+def _division_arrondie(numerateur, diviseur):
+    """Division entière de deux expressions entières, arrondie au demi supérieur"""
+    demi = diviseur // 2
+    return Case(
+        When(LessThan(numerateur, 0), then=-((-numerateur + demi) / diviseur)),
+        default=(numerateur + demi) / diviseur,
+        output_field=IntegerField(),
+    )
+
+
+def taux_commission_expression(prefix=''):
+    """Taux de commission effectif d'un deal, en centièmes de pour-cent (15.25 % -> 1525)"""
+    return Coalesce(
+        F(f'{prefix}taux_commission') * 100,
+        Cast(Round(F(f'{prefix}relation__offre__taux_commission') * 100), output_field=IntegerField()),
+        Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def commission_centimes_expression(prefix=''):
+    """Commission d'un deal en centimes : montant (€) * taux (centièmes de %) / 100"""
+    produit = Coalesce(F(f'{prefix}montant'), Value(0)) * taux_commission_expression(prefix)
+    return _division_arrondie(produit, 100)
+
+
+def tva_centimes_expression(montant_ht, taux=None):
+    """TVA en centimes sur une expression de montant HT en euros entiers (ex. Sum('montant'))"""
+    taux = taux_tva() if taux is None else Decimal(str(taux))
+    taux_centiemes = int((taux * 100).to_integral_value(rounding=ROUND_HALF_UP))
+    return _division_arrondie(montant_ht * Value(taux_centiemes), 100)
+
+
+def totaux_deals(queryset, taux=None):
+    """
+    Agrégats d'un queryset de Deal en une requête :
+    {'montant_ht', 'tva', 'montant_ttc', 'commission'} en Decimal.
+    """
+    totaux = queryset.order_by().aggregate(
+        montant_ht=Coalesce(Sum('montant'), 0),
+        commission=Coalesce(Sum(commission_centimes_expression()), 0),
+    )
+    montant_ht = Decimal(totaux['montant_ht']).quantize(CENT)
+    taxe = tva(montant_ht, taux)
+    return {
+        'montant_ht': montant_ht,
+        'tva': taxe,
+        'montant_ttc': montant_ht + taxe,
+        'commission': centimes(totaux['commission']),
+    }
+
+
+def annoter_totaux(queryset, taux=None):
+    """
+    Annote un queryset déjà groupé (values(...)) avec montant_ht (€), tva_centimes,
+    commission_centimes : un seul passage SQL pour tous les groupes.
+    """
+    return queryset.annotate(
+        montant_ht=Coalesce(Sum('montant'), 0),
+        commission_centimes=Coalesce(Sum(commission_centimes_expression()), 0),
+    ).annotate(
+        tva_centimes=tva_centimes_expression(F('montant_ht'), taux),
+    )
@@ -0,0 +1,28 @@
+"""
+Lanceur de tests du projet (settings.TEST_RUNNER).
+
+Le cache par défaut est un FileBasedCache sur disque, partagé avec le serveur de
+développement : une suite de tests qui le lit hériterait de ses entrées (versions
+du catalogue d'offres, comptes en cache) et inversement. Pendant les tests, le
+cache est remplacé par un LocMemCache propre au processus.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "crm-tests",
+    }
+}
+
+
+class CrmTestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(CACHES=TEST_CACHES)
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
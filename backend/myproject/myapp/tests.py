@@ -1,3 +1,1707 @@
-from django.test import TestCase
+import csv
+import http.client
+import importlib
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+import pyarrow.dataset as pyarrow_dataset
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import taxes
+from .commercial_stats import COUNTER_FIELDS, compute_commercial_stats, refresh_commercial_stats
+from .invoicing import allocate_numeros_facture, facture_prefix, generer_factures_en_masse
+from .logging import KeyValueFormatter, SamplingFilter, get_logger
+from .metrics import registry
+from .offres import VERSION_KEY, offres_actives
+from .transactions import atomic_write
+from .models import Action, CommercialStats, Deal, Facture, Lead, Offre, Profil, Relation, SequenceFacture
+
+
+def create_commercial(username="commercial", **extra):
+    return User.objects.create_user(username=username, password="secret", **extra)
+
+
+def create_offre(nom_offre="Offre A", taux_commission="10.00", plan_commission="one_shot"):
+    return Offre.objects.create(
+        nom_offre=nom_offre,
+        plan_commission=plan_commission,
+        taux_commission=taux_commission,
+        condition_commission_additionel="",
+    )
+
+
+class CommercialTestCase(TestCase):
+    """Commercial authentifié sur l'API et son offre one_shot, communs à la plupart des tests"""
+
+    taux_commission = "10.00"
+
+    def setUp(self):
+        self.user = create_commercial()
+        self.offre = create_offre(taux_commission=self.taux_commission)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class LeadListQueryCountTests(CommercialTestCase):
+    """Le nombre de requêtes de GET /api/leads/ ne dépend pas du nombre de leads"""
+
+    taux_commission = "15.00"
+
+    def _create_leads(self, count):
+        start = Lead.objects.count()
+        for i in range(start, start + count):
+            lead = Lead.objects.create(
+                created_by=self.user,
+                company_name=f"Société {i}",
+                contact_name=f"Contact {i}",
+                email=f"contact{i}@example.com",
+            )
+            Relation.objects.create(lead=lead, commercial=self.user, offre=self.offre)
+
+    def _count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("lead-list"))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()["results"]
+
+    def test_query_count_is_constant(self):
+        self._create_leads(2)
+        small, _ = self._count_list_queries()
+        self._create_leads(20)
+        large, data = self._count_list_queries()
+        self.assertEqual(small, large)
+        self.assertEqual(len(data), 22)
+
+    def test_current_offre_from_prefetch(self):
+        self._create_leads(1)
+        _, data = self._count_list_queries()
+        self.assertEqual(data[0]["current_offre_id"], self.offre.id)
+        self.assertEqual(data[0]["offre_details"]["nom"], "Offre A")
+        self.assertEqual(data[0]["created_by_username"], "commercial")
+
+
+class KeysetPaginationTests(TestCase):
+    """Parcours complet d'une liste via les curseurs `next` / `previous`"""
+
+    def setUp(self):
+        self.user = create_commercial()
+        self.lead = Lead.objects.create(
+            created_by=self.user,
+            company_name="Société",
+            contact_name="Contact",
+            email="contact@example.com",
+        )
+        # Plusieurs actions partagent la même échéance : le départage se fait sur l'id
+        echeance = timezone.now()
+        for i in range(7):
+            Action.objects.create(
+                lead=self.lead,
+                commercial=self.user,
+                action_type="call",
+                date_echeance=echeance + timedelta(days=i // 3),
+                titre=f"Action {i}",
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_next_links_cover_every_row_once(self):
+        url = reverse("action-list") + "?page_size=2"
+        seen = []
+        while url:
+            data = self.client.get(url).json()
+            seen.extend(row["id"] for row in data["results"])
+            url = data["next"]
+        expected = list(Action.objects.order_by("date_echeance", "id").values_list("id", flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_previous_link_returns_prior_page(self):
+        first = self.client.get(reverse("action-list") + "?page_size=3").json()
+        self.assertIsNone(first["previous"])
+        second = self.client.get(first["next"]).json()
+        back = self.client.get(second["previous"]).json()
+        self.assertEqual(back["results"], first["results"])
+
+    def test_lead_list_honours_ordering(self):
+        now = timezone.now()
+        # Déclarés dans l'ordre inverse de leur création, deux à la même date
+        for i in range(5):
+            Lead.objects.create(
+                created_by=self.user, company_name=f"Lead {i}", contact_name="Contact",
+                email=f"lead{i}@example.com", declared_at=now - timedelta(days=min(i, 3)),
+            )
+        leads = Lead.objects.filter(created_by=self.user)
+        for ordering, expected in (
+            (None, leads.order_by("-declared_at", "-id")),
+            ("declared_at", leads.order_by("declared_at", "id")),
+            ("-created_at", leads.order_by("-created_at", "-id")),
+            ("created_at", leads.order_by("created_at", "id")),
+        ):
+            with self.subTest(ordering=ordering):
+                params = {"page_size": 2, **({"ordering": ordering} if ordering else {})}
+                response = self.client.get(reverse("lead-list"), params)
+                seen = []
+                while True:
+                    data = response.json()
+                    seen.extend(row["id"] for row in data["results"])
+                    if not data["next"]:
+                        break
+                    response = self.client.get(data["next"])
+                self.assertEqual(seen, list(expected.values_list("id", flat=True)))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("action-list") + "?cursor=garbage")
+        self.assertEqual(response.status_code, 404)
+
+    def test_ordering_without_keyset_index_is_rejected(self):
+        for url_name, ordering in (
+            ("deal-list", "montant"), ("deal-list", "-stage"), ("lead-list", "company_name"), ("action-list", "priorite"),
+        ):
+            with self.subTest(url_name=url_name, ordering=ordering):
+                response = self.client.get(reverse(url_name), {"ordering": ordering})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("ordering", response.json())
+        self.assertEqual(self.client.get(reverse("deal-list"), {"ordering": "-nom_entreprise"}).status_code, 200)
+
+    def test_ordering_on_keyset_column(self):
+        expected = list(Action.objects.order_by("-date_echeance", "-id").values_list("id", flat=True))
+        url, seen = reverse("action-list") + "?ordering=-date_echeance&page_size=3", []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row["id"] for row in response.json()["results"])
+            url = response.json()["next"]
+        self.assertEqual(seen, expected)
+        for url_name, ordering in (
+            ("action-list", "date_echeance"), ("facture-list", "date_facture"),
+            ("offre-list", "-created_at"), ("relation-list", "created_at"),
+        ):
+            with self.subTest(url_name=url_name):
+                self.assertEqual(self.client.get(reverse(url_name), {"ordering": ordering}).status_code, 200)
+
+
+class ActionStatistiquesTests(TestCase):
+    def setUp(self):
+        self.user = create_commercial()
+        lead = Lead.objects.create(
+            created_by=self.user,
+            company_name="Société",
+            contact_name="Contact",
+            email="contact@example.com",
+        )
+        now = timezone.now()
+        rows = [
+            ("call", "high", "terminee", now - timedelta(days=2)),
+            ("call", "medium", "en_attente", now - timedelta(days=1)),
+            ("email", "low", "en_attente", now + timedelta(days=1)),
+            ("meeting", "medium", "annulee", now + timedelta(days=10)),
+        ]
+        for action_type, priorite, statut, echeance in rows:
+            Action.objects.create(
+                lead=lead,
+                commercial=self.user,
+                action_type=action_type,
+                priorite=priorite,
+                statut=statut,
+                date_echeance=echeance,
+                titre=action_type,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("action-statistiques"))
+        data = response.json()
+        self.assertEqual(data["total"], 4)
+        self.assertEqual(data["terminees"], 1)
+        self.assertEqual(data["en_attente"], 2)
+        self.assertEqual(data["annulees"], 1)
+        self.assertEqual(data["en_retard"], 1)
+        self.assertEqual(data["taux_accomplissement"], 25)
+        self.assertEqual(data["par_type"], {"call": 2, "email": 1, "meeting": 1, "other": 0})
+        self.assertEqual(data["par_priorite"], {"low": 1, "medium": 2, "high": 1})
+
+    def test_date_range(self):
+        today = timezone.now().date()
+        response = self.client.get(
+            reverse("action-statistiques"),
+            {"date_debut": (today - timedelta(days=1)).isoformat(), "date_fin": (today + timedelta(days=1)).isoformat()},
+        )
+        self.assertEqual(response.json()["total"], 2)
+
+    def test_date_range_bounds_compare_column_directly(self):
+        day = timezone.localdate() + timedelta(days=30)
+        debut = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        for echeance in (debut, debut + timedelta(hours=23, minutes=59), debut + timedelta(days=1)):
+            Action.objects.create(
+                lead=Lead.objects.get(), commercial=self.user, action_type="call", priorite="low",
+                statut="en_attente", date_echeance=echeance, titre="borne",
+            )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("action-statistiques"), {"date_debut": day.isoformat(), "date_fin": day.isoformat()}
+            )
+        self.assertEqual(response.json()["total"], 2)
+        # Pas de conversion de la colonne en date (CAST / django_datetime_cast_date)
+        self.assertNotIn("cast", queries[0]["sql"].lower())
+
+    def test_invalid_date(self):
+        response = self.client.get(reverse("action-statistiques"), {"date_debut": "hier"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("action-statistiques"), {"date_fin": "2025-02-31"})
+        self.assertEqual(response.status_code, 400)
+
+
+class CommercialStatsTests(CommercialTestCase):
+    """Les compteurs maintenus par signaux restent égaux au recalcul complet"""
+
+    def _lead_with_relation(self, i):
+        lead = Lead.objects.create(
+            created_by=self.user,
+            company_name=f"Société {i}",
+            contact_name="Contact",
+            email=f"contact{i}@example.com",
+        )
+        return Relation.objects.create(lead=lead, commercial=self.user, offre=self.offre)
+
+    def assertCountersConsistent(self):
+        stored = CommercialStats.objects.get(pk=self.user.pk)
+        expected = compute_commercial_stats(self.user.pk)
+        for field, value in expected.items():
+            self.assertEqual(getattr(stored, field), value, field)
+
+    def test_signals_track_writes(self):
+        relation = self._lead_with_relation(1)
+        other = self._lead_with_relation(2)
+        deal = Deal.objects.create(relation=relation, nom_deal="D1", stage="prospection", montant=1000, taux_commission=10)
+        Deal.objects.create(relation=other, nom_deal="D2", stage="negociation", montant=500, taux_commission=20)
+        self.assertCountersConsistent()
+
+        deal.stage = "gagne"
+        deal.save()
+        relation.lead.status = "converti"
+        relation.lead.save()
+        stats = CommercialStats.objects.get(pk=self.user.pk)
+        self.assertEqual(stats.deals_gagne, 1)
+        self.assertEqual(stats.montant_gagne, 1000)
+        self.assertEqual(stats.commission_en_attente, Decimal("100.00"))
+        self.assertCountersConsistent()
+
+        other.delete()
+        self.assertCountersConsistent()
+
+    def test_relation_reassignment_and_offre_rate_refresh_counters(self):
+        other_user = create_commercial("autre")
+        relation = self._lead_with_relation(1)
+        Deal.objects.create(relation=relation, nom_deal="D1", stage="gagne", montant=1000)
+        self.assertEqual(CommercialStats.objects.get(pk=self.user.pk).commission_en_attente, Decimal("100.00"))
+
+        # Taux de l'offre : repli des deals sans taux propre
+        self.offre.taux_commission = "20.00"
+        self.offre.save()
+        self.assertEqual(CommercialStats.objects.get(pk=self.user.pk).commission_en_attente, Decimal("200.00"))
+        self.assertCountersConsistent()
+
+        # Autre offre sur la relation
+        offre_b = create_offre("Offre B", "5.00")
+        relation.offre = offre_b
+        relation.save()
+        self.assertEqual(CommercialStats.objects.get(pk=self.user.pk).commission_en_attente, Decimal("50.00"))
+
+        # Relation réattribuée : deals déplacés d'un commercial à l'autre
+        relation.commercial = other_user
+        relation.save()
+        self.assertCountersConsistent()
+        self.assertEqual(CommercialStats.objects.get(pk=self.user.pk).deals_gagne, 0)
+        moved = CommercialStats.objects.get(pk=other_user.pk)
+        self.assertEqual((moved.deals_gagne, moved.montant_gagne), (1, 1000))
+        self.assertEqual(compute_commercial_stats(other_user.pk)["commission_en_attente"], moved.commission_en_attente)
+
+    def test_facture_delete_restores_pending_commission(self):
+        relation = self._lead_with_relation(1)
+        Deal.objects.create(relation=relation, nom_deal="D1", stage="gagne", montant=1000)
+        factures, _nb_deals = generer_factures_en_masse(commercial_ids=[self.user.pk])
+        self.assertEqual(CommercialStats.objects.get(pk=self.user.pk).commission_en_attente, 0)
+
+        factures[0].delete()
+        self.assertEqual(CommercialStats.objects.get(pk=self.user.pk).commission_en_attente, Decimal("100.00"))
+        self.assertCountersConsistent()
+
+        # Commercial supprimé : ses factures partent en cascade sans recréer de compteurs
+        generer_factures_en_masse(commercial_ids=[self.user.pk])
+        self.user.delete()
+        self.assertFalse(CommercialStats.objects.exists())
+
+    def test_dashboard_is_single_read(self):
+        relation = self._lead_with_relation(1)
+        Deal.objects.create(relation=relation, nom_deal="D1", stage="negociation", montant=100)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("dashboard_stats"))
+        data = response.json()
+        self.assertEqual(data["totalLeads"], 1)
+        self.assertEqual(data["activeDeals"], 1)
+        self.assertEqual(data["wonDeals"], 0)
+
+    def test_rebuild_command(self):
+        relation = self._lead_with_relation(1)
+        Deal.objects.create(relation=relation, nom_deal="D1", stage="gagne", montant=300, taux_commission=10)
+        # Écriture hors signaux : les compteurs divergent
+        Deal.objects.update(montant=600)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_commercial_stats", "--verify", stdout=StringIO())
+        call_command("rebuild_commercial_stats", stdout=StringIO())
+        call_command("rebuild_commercial_stats", "--verify", stdout=StringIO())
+        self.assertEqual(CommercialStats.objects.get(pk=self.user.pk).montant_gagne, 600)
+
+
+class NumeroFactureConcurrencyTests(TransactionTestCase):
+    """Créations de factures en parallèle : aucun numéro en double, aucun trou"""
+
+    workers = 8
+
+    def setUp(self):
+        self.user = create_commercial()
+        offre = create_offre()
+        self.deal_ids = []
+        for i in range(self.workers):
+            lead = Lead.objects.create(
+                created_by=self.user,
+                company_name=f"Société {i}",
+                contact_name="Contact",
+                email=f"contact{i}@example.com",
+            )
+            relation = Relation.objects.create(lead=lead, commercial=self.user, offre=offre)
+            deal = Deal.objects.create(relation=relation, nom_deal=f"D{i}", stage="gagne", montant=100)
+            self.deal_ids.append(deal.id)
+
+    def test_parallel_invoice_creation(self):
+        barrier = threading.Barrier(self.workers)
+        statuses = []
+
+        def create_facture(deal_id):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            barrier.wait()
+            try:
+                response = client.post(
+                    reverse("deal-create-facture-from-deals"), {"deal_ids": [deal_id]}, format="json"
+                )
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=create_facture, args=(deal_id,)) for deal_id in self.deal_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(statuses, [201] * self.workers)
+        numeros = sorted(Facture.objects.values_list("numero_facture", flat=True))
+        self.assertEqual(len(set(numeros)), self.workers)
+        self.assertEqual([int(n.rsplit("-", 1)[1]) for n in numeros], list(range(1, self.workers + 1)))
+
+
+class SequenceFactureAmorceTests(TestCase):
+    """Factures numérotées avant SequenceFacture : le compteur repart après le plus grand numéro"""
+
+    def setUp(self):
+        self.user = create_commercial()
+        self.day = timezone.localdate()
+        self.prefixe = facture_prefix(self.day)
+        for numero in (f"{self.prefixe}-0003", f"{self.prefixe}-0012", "FACT-20200101-0040", "SEED-1-00001"):
+            Facture.objects.create(
+                commercial=self.user, numero_facture=numero, montant_ht=0, montant_ttc=0,
+                date_facture=self.day, date_echeance=self.day, statut_paiement="pending",
+            )
+
+    def test_first_allocation_seeds_from_existing_numbers(self):
+        self.assertEqual(
+            allocate_numeros_facture(2, self.day), [f"{self.prefixe}-0013", f"{self.prefixe}-0014"]
+        )
+        self.assertEqual(allocate_numeros_facture(1, self.day), [f"{self.prefixe}-0015"])
+
+    def test_migration_backfills_sequences(self):
+        SequenceFacture.objects.create(prefixe=self.prefixe, dernier_numero=2)
+        SequenceFacture.objects.create(prefixe="FACT-20190101", dernier_numero=9)
+        migration = importlib.import_module("myapp.migrations.0018_sequencefacture_backfill")
+        migration.amorcer_sequences(apps, None)
+        self.assertEqual(
+            dict(SequenceFacture.objects.values_list("prefixe", "dernier_numero")),
+            {self.prefixe: 12, "FACT-20200101": 40, "FACT-20190101": 9},
+        )
+        self.assertEqual(allocate_numeros_facture(1, self.day), [f"{self.prefixe}-0013"])
+
+
+class FacturationEnMasseTests(TestCase):
+    def setUp(self):
+        self.offre = create_offre()
+        self.users = [create_commercial(f"commercial{i}") for i in range(3)]
+        self.admin = create_commercial("admin", is_staff=True)
+        n = 0
+        for user in self.users:
+            for stage in ["gagne", "gagne", "gagne", "perdu"]:
+                n += 1
+                lead = Lead.objects.create(
+                    created_by=user,
+                    company_name=f"Société {n}",
+                    contact_name="Contact",
+                    email=f"contact{n}@example.com",
+                )
+                relation = Relation.objects.create(lead=lead, commercial=user, offre=self.offre)
+                Deal.objects.create(relation=relation, nom_deal=f"D{n}", stage=stage, montant=100 * n, taux_commission=10)
+
+    def test_one_facture_per_commercial(self):
+        factures, nb_deals = generer_factures_en_masse()
+        self.assertEqual(len(factures), 3)
+        self.assertEqual(nb_deals, 9)
+        self.assertFalse(Deal.objects.filter(stage="gagne", facture__isnull=True).exists())
+        for facture in Facture.objects.all():
+            deals = Deal.objects.filter(facture=facture)
+            self.assertTrue(all(d.relation.commercial_id == facture.commercial_id for d in deals))
+            total = sum(d.montant for d in deals)
+            self.assertEqual(facture.montant_ht, Decimal(total))
+            self.assertEqual(facture.montant_ttc, (Decimal(total) * Decimal("1.2")).quantize(Decimal("0.01")))
+        numeros = sorted(Facture.objects.values_list("numero_facture", flat=True))
+        self.assertEqual([int(n.rsplit("-", 1)[1]) for n in numeros], [1, 2, 3])
+        for user in self.users:
+            self.assertEqual(CommercialStats.objects.get(pk=user.pk).commission_en_attente, 0)
+        # Plus rien à facturer
+        self.assertEqual(generer_factures_en_masse(), ([], 0))
+
+    def test_query_count_independent_of_deal_count(self):
+        relation = Relation.objects.filter(commercial=self.users[2]).first()
+        for i in range(10):
+            Deal.objects.create(relation=relation, nom_deal=f"X{i}", stage="gagne", montant=10)
+        # Premier appel : création de la séquence du jour
+        generer_factures_en_masse(commercial_ids=[self.users[0].pk])
+        with CaptureQueriesContext(connection) as small:
+            generer_factures_en_masse(commercial_ids=[self.users[1].pk])
+        with CaptureQueriesContext(connection) as large:
+            generer_factures_en_masse(commercial_ids=[self.users[2].pk])
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_api_requires_admin(self):
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        url = reverse("deal-bulk-create-factures")
+        self.assertEqual(client.post(url, {}, format="json").status_code, 403)
+        client.force_authenticate(self.admin)
+        response = client.post(url, {"commercial_ids": [self.users[1].pk]}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["factures"], 1)
+        self.assertEqual(response.json()["deals"], 3)
+
+    def test_api_rejects_invalid_commercial_ids(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        url = reverse("deal-bulk-create-factures")
+        for commercial_ids in ([], "12", 5, [str(self.users[1].pk)], [True], None):
+            with self.subTest(commercial_ids=commercial_ids):
+                response = client.post(url, {"commercial_ids": commercial_ids}, format="json")
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Facture.objects.exists())
+        # Formulaire : valeurs répétées
+        response = client.post(url, {"commercial_ids": [str(self.users[1].pk)]})
+        self.assertEqual((response.status_code, response.json()["factures"]), (201, 1))
+        self.assertEqual(client.post(url, {"commercial_ids": "1,2"}).status_code, 400)
+
+    def test_rejects_impossible_date(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        for date in ("fin du mois", "2025-02-31"):
+            with self.subTest(date=date):
+                response = client.post(reverse("deal-bulk-create-factures"), {"date": date}, format="json")
+                self.assertEqual(response.status_code, 400)
+                with self.assertRaises(CommandError):
+                    call_command("generate_factures", date=date, stdout=StringIO())
+        self.assertFalse(Facture.objects.exists())
+
+
+class TaxesTests(TestCase):
+    """Les totaux calculés en SQL correspondent au calcul Decimal deal par deal, au centime près"""
+
+    def setUp(self):
+        self.user = create_commercial()
+        self.offres = [create_offre(f"Offre {taux}", taux) for taux in ["12.35", "7.50", "14.35", "0.01"]]
+        montants = [0, 1, 3, 7, 99, 101, 333, 1001, 12345, 99999, None]
+        taux_deal = [None, 0, 5, 12, 33]
+        i = 0
+        for offre in self.offres:
+            lead = Lead.objects.create(
+                created_by=self.user,
+                company_name=f"Société {offre.pk}",
+                contact_name="Contact",
+                email=f"contact{offre.pk}@example.com",
+            )
+            relation = Relation.objects.create(lead=lead, commercial=self.user, offre=offre)
+            for montant in montants:
+                i += 1
+                Deal.objects.create(
+                    relation=relation,
+                    nom_deal=f"D{i}",
+                    stage="gagne",
+                    montant=montant,
+                    taux_commission=taux_deal[i % len(taux_deal)],
+                )
+
+    def _python_totals(self, deals):
+        montant_ht = sum((Decimal(d.montant or 0) for d in deals), Decimal("0"))
+        total_commission = sum(
+            (
+                taxes.commission(d.montant, taxes.taux_commission_effectif(d.taux_commission, d.relation.offre.taux_commission))
+                for d in deals
+            ),
+            Decimal("0"),
+        )
+        return montant_ht, total_commission
+
+    def test_rounding_half_up(self):
+        self.assertEqual(taxes.commission(1, Decimal("12.5")), Decimal("0.13"))
+        self.assertEqual(taxes.commission(3, Decimal("14.35")), Decimal("0.43"))
+        self.assertEqual(taxes.montant_ttc(Decimal("10.05"), Decimal("5.5")), Decimal("10.60"))
+
+    def test_aggregate_matches_python(self):
+        deals = list(Deal.objects.select_related("relation__offre"))
+        montant_ht, total_commission = self._python_totals(deals)
+        totaux = taxes.totaux_deals(Deal.objects.all())
+        self.assertEqual(totaux["montant_ht"], montant_ht)
+        self.assertEqual(totaux["commission"], total_commission)
+        self.assertEqual(totaux["tva"], (montant_ht * Decimal("0.20")).quantize(Decimal("0.01")))
+        self.assertEqual(totaux["montant_ttc"], totaux["montant_ht"] + totaux["tva"])
+
+    def test_grouped_annotation_matches_python(self):
+        rows = taxes.annoter_totaux(Deal.objects.order_by().values("relation__offre"), taux=Decimal("5.5"))
+        self.assertEqual(len(rows), len(self.offres))
+        for row in rows:
+            deals = list(Deal.objects.filter(relation__offre=row["relation__offre"]).select_related("relation__offre"))
+            montant_ht, total_commission = self._python_totals(deals)
+            self.assertEqual(row["montant_ht"], montant_ht)
+            self.assertEqual(taxes.centimes(row["commission_centimes"]), total_commission)
+            self.assertEqual(taxes.centimes(row["tva_centimes"]), taxes.tva(montant_ht, Decimal("5.5")))
+
+    @override_settings(TAUX_TVA=Decimal("10.00"))
+    def test_configurable_vat(self):
+        self.assertEqual(taxes.montant_ttc(100), Decimal("110.00"))
+
+
+class CommissionLedgerTests(TestCase):
+    def setUp(self):
+        self.user = create_commercial()
+        one_shot = create_offre("One", "12.50")
+        durable = create_offre("Durable", "5.00", plan_commission="durable")
+        for i, (offre, montant, taux, stage) in enumerate([
+            (one_shot, 1000, None, "gagne"),
+            (one_shot, 333, 10, "gagne"),
+            (durable, 200, None, "gagne"),
+            (durable, 999, None, "perdu"),
+        ]):
+            lead = Lead.objects.create(
+                created_by=self.user, company_name=f"Société {i}", contact_name="C", email=f"c{i}@example.com"
+            )
+            relation = Relation.objects.create(lead=lead, commercial=self.user, offre=offre)
+            Deal.objects.create(
+                relation=relation, nom_deal=f"D{i}", stage=stage, montant=montant,
+                taux_commission=taux, remporte_le=timezone.now(),
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_totals_groups_and_rows(self):
+        data = self.client.get(reverse("deal-commission-ledger")).json()
+        # 1000 * 12.5 % + 333 * 10 % + 200 * 5 %
+        self.assertEqual(data["totaux"], {"nb_deals": 3, "montant": 1533, "commission": "168.30"})
+        self.assertEqual(data["par_plan"]["one_shot"]["commission"], "158.30")
+        self.assertEqual(data["par_plan"]["durable"]["nb_deals"], 1)
+        self.assertEqual(len(data["groupes"]), 2)
+        rows = {row["nom_deal"]: row for row in data["results"]}
+        self.assertEqual(rows["D0"]["commission"], "125.00")
+        self.assertEqual(rows["D0"]["taux_commission"], "12.50")
+        self.assertEqual(rows["D1"]["nom_entreprise"], "Société 1")
+
+    def test_rows_are_paginated(self):
+        first = self.client.get(reverse("deal-commission-ledger"), {"page_size": 2}).json()
+        self.assertEqual(len(first["results"]), 2)
+        second = self.client.get(first["next"]).json()
+        self.assertEqual(len(second["results"]), 1)
+        self.assertEqual(first["totaux"]["nb_deals"], 3)
+        # Agrégats calculés une seule fois, avec la première page
+        self.assertNotIn("totaux", second)
+        self.assertNotIn("groupes", second)
+
+    def test_next_page_skips_aggregate_queries(self):
+        first = self.client.get(reverse("deal-commission-ledger"), {"page_size": 2}).json()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first["next"])
+        self.assertEqual(len(queries), 1)
+
+
+class LoggingTests(TestCase):
+    """Journalisation : pas de print() sur les chemins chauds, logs structurés et échantillonnés"""
+
+    def test_deal_creation_does_not_write_to_stdout(self):
+        user = User.objects.create_user(username="logger", password="x")
+        lead = Lead.objects.create(created_by=user, company_name="ACME", contact_name="C", email="c@example.com")
+        offre = Offre.objects.create(nom_offre="Offre", taux_commission=Decimal("10.00"))
+        relation = Relation.objects.create(lead=lead, commercial=user, offre=offre)
+        client = APIClient()
+        client.force_authenticate(user)
+        with mock.patch("sys.stdout", new_callable=StringIO) as stdout:
+            response = client.post(reverse("deal-list"), {"relation": relation.id, "nom_deal": "D"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(stdout.getvalue(), "")
+
+    def test_logger_names_and_key_value_fields(self):
+        self.assertEqual(get_logger("views.deal").name, "myapp.views.deal")
+        self.assertEqual(get_logger("myapp.views.deal").name, "myapp.views.deal")
+        record = logging.LogRecord("myapp.x", logging.INFO, "", 0, "Deal %s", (3,), None)
+        record.user_id = 7
+        self.assertEqual(KeyValueFormatter("%(message)s").format(record), "Deal 3 user_id=7")
+
+    def test_info_logs_quiet_during_tests_but_assertable(self):
+        self.assertGreaterEqual(logging.getLogger("myapp").getEffectiveLevel(), logging.WARNING)
+        user = User.objects.create_user(username="logger", password="x")
+        client = APIClient()
+        client.force_authenticate(user)
+        with self.assertLogs("myapp.exports", level="INFO") as logs:
+            b"".join(client.get(reverse("lead-export", kwargs={"export_format": "csv"})).streaming_content)
+        self.assertEqual(logs.records[0].getMessage(), "Export lead (csv)")
+
+    def test_sampling_keeps_warnings(self):
+        sampler = SamplingFilter(rate=0)
+        debug = logging.LogRecord("myapp.x", logging.DEBUG, "", 0, "d", (), None)
+        warning = logging.LogRecord("myapp.x", logging.WARNING, "", 0, "w", (), None)
+        self.assertFalse(sampler.filter(debug))
+        self.assertTrue(sampler.filter(warning))
+
+
+class RequestMetricsTests(TestCase):
+    """Middleware d'instrumentation : Server-Timing, histogramme par vue, budget de requêtes"""
+
+    def setUp(self):
+        registry.reset()
+        self.user = User.objects.create_user(username="mesure", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_and_histogram(self):
+        response = self.client.get(reverse("dashboard_stats"))
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+$')
+        self.client.get(reverse("dashboard_stats"))
+
+        stats = registry.snapshot()["dashboard_stats"]
+        self.assertEqual(stats["count"], 2)
+        self.assertEqual(sum(stats["latency_ms"].values()), 2)
+        self.assertEqual(stats["over_budget"], 0)
+
+    @override_settings(QUERY_BUDGETS={"lead-list": 0})
+    def test_over_budget_is_flagged(self):
+        with self.assertLogs("myapp.metrics", level="WARNING") as logs:
+            self.client.get(reverse("lead-list"))
+        self.assertIn("lead-list", logs.output[0])
+        self.assertEqual(registry.snapshot()["lead-list"]["over_budget"], 1)
+
+    def test_metrics_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get(reverse("request_metrics")).status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        data = self.client.get(reverse("request_metrics")).json()
+        self.assertIn("request_metrics", data["views"])
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Budget de requêtes SQL et de taille de réponse pour chaque route GET de myapp.
+    Les mesures sont faites sur un petit puis un gros jeu de données : le nombre de
+    requêtes ne doit pas dépendre du volume (pas de N+1) et la taille des réponses
+    reste bornée (pagination). Un budget dépassé signale une régression.
+    """
+
+    # nom de route -> (objet pour le pk ou None, requêtes max, taille max en Ko)
+    # Listes et détails des viewsets à ConditionalGetMixin : +1 requête (validateur ETag)
+    BUDGETS = {
+        "lead-list": (None, 3, 24),
+        "lead-detail": ("lead", 3, 1),
+        # Catalogue des offres en cache (myapp/offres.py)
+        "lead-available-offres": (None, 0, 1),
+        "action-list": (None, 2, 24),
+        "action-detail": ("action", 2, 1),
+        "action-actions-du-jour": (None, 1, 24),
+        "action-actions-en-retard": (None, 1, 24),
+        "action-actions-a-venir": (None, 1, 24),
+        "action-statistiques": (None, 1, 1),
+        "offre-list": (None, 2, 1),
+        "offre-detail": ("offre", 2, 1),
+        "relation-list": (None, 1, 12),
+        "relation-detail": ("relation", 1, 1),
+        "facture-list": (None, 3, 24),
+        "facture-detail": ("facture", 3, 2),
+        "deal-list": (None, 2, 30),
+        "deal-detail": ("deal", 2, 1),
+        "deal-commissions": (None, 1, 20),
+        "deal-commission-ledger": (None, 3, 16),
+        # Liste complète pour le sélecteur du formulaire de deal (Deals.tsx) : ~180 octets par relation active
+        "deal-available-relations": (None, 1, 14),
+        "current-user-list": (None, 0, 1),
+        "current-user-detail": ("user", 2, 1),
+        "dashboard_stats": (None, 1, 1),
+        "profile": (None, 1, 1),
+        # Une entrée par vue appelée dans le processus
+        "request_metrics": (None, 0, 16),
+        "api-root": (None, 0, 1),
+    }
+    # Routes d'écriture (POST uniquement), couvertes par leurs propres tests
+    WRITE_ONLY = {
+        "signup", "token_obtain_pair", "token_refresh",
+        "action-marquer-annulee", "action-marquer-terminee", "facture-upload-file",
+        "deal-bulk-create-factures", "deal-create-facture-from-deals", "lead-import-leads",
+        "action-marquer-terminees", "action-marquer-annulees", "deal-changer-stage",
+    }
+    # Exports en flux : une requête SQL, taille proportionnelle au volume (ExportTests)
+    STREAMING = {"lead-export", "action-export", "facture-export", "deal-export"}
+    SMALL, LARGE = 3, 60
+
+    def setUp(self):
+        self.user = create_commercial(is_staff=True)
+        self.other = create_commercial("autre")
+        Profil.objects.create(user=self.user, entreprise="ACME")
+        self.offres = [create_offre(f"Offre {plan}", plan_commission=plan) for plan in ("one_shot", "durable")]
+        self.created = 0
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _seed(self, count):
+        """count leads par commercial, chacun avec relation, deals, actions ; une facture tous les 5 leads"""
+        maintenant = timezone.now()
+        for user in (self.user, self.other):
+            facture = None
+            for i in range(self.created, self.created + count):
+                lead = Lead.objects.create(
+                    created_by=user, company_name=f"Société {i}", contact_name=f"Contact {i}",
+                    email=f"contact{user.pk}-{i}@example.com", status="en_cours",
+                )
+                relation = Relation.objects.create(lead=lead, commercial=user, offre=self.offres[i % 2])
+                if i % 5 == 0:
+                    facture = Facture.objects.create(
+                        commercial=user, numero_facture=f"F-{user.pk}-{i}", montant_ht=0, montant_ttc=0,
+                        date_facture=maintenant.date(),
+                    )
+                Deal.objects.create(
+                    relation=relation, nom_deal=f"Deal {i}", stage="gagne", montant=100 * i,
+                    remporte_le=maintenant, facture=facture if i % 2 else None,
+                )
+                Deal.objects.create(relation=relation, nom_deal=f"Deal {i} bis", stage="negociation", montant=50)
+                for jours in (-1, 0, 2):
+                    Action.objects.create(
+                        lead=lead, commercial=user, action_type="call", titre=f"Action {i}",
+                        date_echeance=maintenant + timedelta(days=jours),
+                    )
+        self.created += count
+
+    def _url(self, name, objet):
+        if objet is None:
+            return reverse(name)
+        instance = {
+            "lead": Lead.objects.filter(created_by=self.user).first,
+            "action": Action.objects.filter(commercial=self.user).first,
+            "offre": Offre.objects.first,
+            "relation": Relation.objects.filter(commercial=self.user).first,
+            "facture": Facture.objects.filter(commercial=self.user).first,
+            "deal": Deal.objects.filter(relation__commercial=self.user).first,
+            "user": lambda: self.user,
+        }[objet]()
+        return reverse(name, kwargs={"pk": instance.pk})
+
+    def _measure(self):
+        mesures = {}
+        # Régime permanent : catalogue des offres déjà en cache dans le processus
+        offres_actives()
+        for name, (objet, _max_queries, _max_kb) in self.BUDGETS.items():
+            url = self._url(name, objet)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, name)
+            mesures[name] = (len(queries), len(response.content))
+        return mesures
+
+    def _route_names(self, resolver):
+        for pattern in resolver.url_patterns:
+            if hasattr(pattern, "url_patterns"):
+                yield from self._route_names(pattern)
+            elif pattern.name:
+                yield pattern.name
+
+    def test_every_get_route_has_a_budget(self):
+        myapp_routes = set(self._route_names(get_resolver("myapp.urls")))
+        self.assertEqual(myapp_routes - self.WRITE_ONLY - self.STREAMING - set(self.BUDGETS), set())
+
+    def test_query_and_size_budgets_do_not_depend_on_volume(self):
+        self._seed(self.SMALL)
+        small = self._measure()
+        self._seed(self.LARGE - self.SMALL)
+        large = self._measure()
+        for name, (_objet, max_queries, max_kb) in self.BUDGETS.items():
+            with self.subTest(route=name):
+                queries, size = large[name]
+                self.assertEqual(queries, small[name][0], "le nombre de requêtes dépend du volume")
+                self.assertLessEqual(queries, max_queries)
+                self.assertLessEqual(size, max_kb * 1024)
+
+
+class SeedCrmTests(TestCase):
+    """manage.py seed_crm : volumes cohérents, contraintes respectées, reproductible"""
+
+    def _seed(self, prefix, seed=7):
+        call_command(
+            "seed_crm", commercials=2, leads=10, deals=2, actions=1, offres=3,
+            seed=seed, prefix=prefix, batch_size=7, stdout=StringIO(),
+        )
+        return list(
+            Deal.objects.filter(relation__commercial__username__startswith=f"{prefix}-")
+            .order_by("id").values_list("stage", "montant", "taux_commission", "relation__lead__status")
+        )
+
+    def test_generates_consistent_data(self):
+        deals = self._seed("a")
+        self.assertTrue(deals)
+        self.assertEqual(Relation.objects.count(), Lead.objects.count())
+        self.assertFalse(Deal.objects.filter(facture__isnull=False).exclude(stage="gagne").exists())
+        # Compteurs recalculés malgré bulk_create (pas de signaux)
+        call_command("rebuild_commercial_stats", verify=True, stdout=StringIO())
+
+    def test_same_seed_same_data_and_prefix_is_unique(self):
+        self.assertEqual(self._seed("a"), self._seed("b"))
+        with self.assertRaises(CommandError):
+            self._seed("a")
+
+    def test_invalid_stage_weights(self):
+        with self.assertRaises(CommandError):
+            call_command("seed_crm", stages="gagne=1,signe=2", stdout=StringIO())
+
+
+class LoadtestApiTests(TestCase):
+    """Calculs du rapport de manage.py loadtest_api (le banc lui-même tourne contre un serveur lancé)"""
+
+    def test_percentiles_and_summary(self):
+        from .management.commands.loadtest_api import Command, percentile
+
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertIsNone(percentile([], 95))
+
+        samples = [(10.0, 200, 'db;dur=1.0;desc="4 queries", app;dur=9.0'), (30.0, 500, None)]
+        summary = Command().summarize(samples, duration=2)
+        self.assertEqual(summary["requests"], 2)
+        self.assertEqual(summary["errors"], 1)
+        self.assertEqual(summary["throughput_rps"], 1.0)
+        self.assertEqual(summary["p50_ms"], 10.0)
+        self.assertEqual(summary["queries_avg"], 4)
+
+    def test_only_get_is_retried_and_http_errors_are_counted(self):
+        from .management.commands.loadtest_api import ApiClient, Command
+
+        runner = Command()
+        runner.base_url, runner.timeout, runner.access_token = "http://testserver/api", 1, "jeton"
+        runner.lock, runner.samples, runner.measure_from = threading.Lock(), {}, 0
+        client = ApiClient(runner.base_url, runner)
+        connection = mock.Mock()
+        connection.getresponse.side_effect = http.client.RemoteDisconnected("fermée")
+        with mock.patch.object(ApiClient, "_connect", lambda self: setattr(self, "connection", connection)):
+            with self.assertRaises(http.client.RemoteDisconnected):
+                client.request("POST", "/leads/", payload={})
+            self.assertEqual(connection.request.call_count, 1)
+            with self.assertRaises(http.client.RemoteDisconnected):
+                client.request("GET", "/leads/")
+            self.assertEqual(connection.request.call_count, 3)
+
+            # Le worker survit à l'exception et la compte en erreur
+            stop_at = time.perf_counter() + 0.05
+            runner.worker(random.Random(1), ["lead-list"], [1], stop_at)
+        samples = runner.samples["lead-list"]
+        self.assertTrue(samples)
+        self.assertEqual(runner.summarize(samples, duration=1)["errors"], len(samples))
+
+
+class SqliteBackendTests(TransactionTestCase):
+    """Backend myproject.sqlite3 : WAL à la connexion, BEGIN IMMEDIATE pour atomic_write()"""
+
+    def test_pragmas_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_atomic_write_begins_immediate(self):
+        with CaptureQueriesContext(connection) as queries:
+            with atomic_write():
+                with atomic_write():
+                    Offre.objects.create(nom_offre="O", plan_commission="one_shot", taux_commission=10)
+            with transaction.atomic():
+                Offre.objects.count()
+        begins = [query["sql"] for query in queries.captured_queries if query["sql"].startswith("BEGIN")]
+        self.assertEqual(begins, ["BEGIN IMMEDIATE", "BEGIN"])
+
+    def test_bench_reports_no_lock_error_with_wal_immediate(self):
+        out = StringIO()
+        call_command("bench_sqlite_locks", configs=["wal-immediate"], duration=0.5, writers=4, readers=2, stdout=out)
+        columns = out.getvalue().splitlines()[-1].split()
+        self.assertEqual(columns[0], "wal-immediate")
+        self.assertEqual(columns[3], "0")
+
+
+class LeadSearchTests(TestCase):
+    """?search= sur les leads : index plein texte, accents ignorés, préfixes, classement"""
+
+    def setUp(self):
+        self.user = create_commercial()
+        other = create_commercial("autre")
+        for company, contact, email in [
+            ("Société Générale", "Élodie Martin", "elodie@sg.example.com"),
+            ("Générale Optique", "Paul Durand", "paul@go.example.com"),
+            ("Boulangerie Dupont", "Jean Générale", "jean@dupont.example.com"),
+            ("Acme", "Zoé Leroy", "zoe@acme.example.com"),
+        ]:
+            Lead.objects.create(created_by=self.user, company_name=company, contact_name=contact, email=email)
+        Lead.objects.create(created_by=other, company_name="Générale Autre", contact_name="X", email="x@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _search(self, term, **params):
+        response = self.client.get(reverse("lead-list"), {"search": term, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def _companies(self, term):
+        return [lead["company_name"] for lead in self._search(term)["results"]]
+
+    def test_accent_insensitive_prefix_search(self):
+        self.assertEqual(self._companies("societe gen"), ["Société Générale"])
+        self.assertEqual(self._companies("ELOD"), ["Société Générale"])
+        self.assertEqual(self._companies("dupont.example"), ["Boulangerie Dupont"])
+        self.assertEqual(self._companies("zzz"), [])
+
+    def test_ranked_by_column_weight(self):
+        companies = self._companies("generale")
+        # Le nom de société pèse plus que le nom du contact ; leads des autres commerciaux exclus
+        self.assertEqual(set(companies[:2]), {"Société Générale", "Générale Optique"})
+        self.assertEqual(companies[2:], ["Boulangerie Dupont"])
+
+    def test_ranked_results_paginate(self):
+        first = self._search("generale", page_size=2)
+        second = self.client.get(first["next"]).json()
+        names = [lead["company_name"] for lead in first["results"] + second["results"]]
+        self.assertEqual(names, self._companies("generale"))
+
+    def test_index_follows_writes(self):
+        lead = Lead.objects.get(company_name="Générale Optique")
+        lead.company_name = "Crème & Co"
+        lead.save()
+        self.assertEqual(self._companies("creme"), ["Crème & Co"])
+        self.assertEqual(self._companies("optique"), [])
+        Lead.objects.filter(pk=lead.pk).update(company_name="Zèbre")
+        self.assertEqual(self._companies("zebre"), ["Zèbre"])
+        lead.delete()
+        self.assertEqual(self._companies("zebre"), [])
+
+
+class DealNomEntrepriseTests(CommercialTestCase):
+    """Deal.nom_entreprise suit le lead de la relation ; recherche et tri sans jointure"""
+
+    def setUp(self):
+        super().setUp()
+        self.relations = {}
+        for company in ["Zèbre", "Acme", "Mistral"]:
+            lead = Lead.objects.create(
+                created_by=self.user, company_name=company, contact_name="Contact",
+                email=f"{company.lower()}@example.com",
+            )
+            self.relations[company] = Relation.objects.create(lead=lead, commercial=self.user, offre=self.offre)
+            Deal.objects.create(relation=self.relations[company], nom_deal=f"Deal {company}", montant=100)
+
+    def _names(self, **params):
+        response = self.client.get(reverse("deal-list"), params)
+        self.assertEqual(response.status_code, 200)
+        return [deal["nom_entreprise"] for deal in response.json()["results"]]
+
+    def test_follows_lead_and_relation_changes(self):
+        self.assertEqual(Deal.objects.get(nom_deal="Deal Acme").nom_entreprise, "Acme")
+        lead = self.relations["Acme"].lead
+        lead.company_name = "Acme Industries"
+        lead.save()
+        self.assertEqual(Deal.objects.get(nom_deal="Deal Acme").nom_entreprise, "Acme Industries")
+
+        relation = self.relations["Zèbre"]
+        okapi = Lead.objects.create(
+            created_by=self.user, company_name="Okapi", contact_name="Contact", email="okapi@example.com"
+        )
+        relation.lead = okapi
+        relation.save()
+        self.assertEqual(Deal.objects.get(nom_deal="Deal Zèbre").nom_entreprise, "Okapi")
+        relation.lead = None
+        relation.save(update_fields=["lead"])
+        self.assertEqual(Deal.objects.get(nom_deal="Deal Zèbre").nom_entreprise, "")
+        # Rattachée de nouveau : une seule relation sans lead par couple (offre, commercial)
+        relation.lead = okapi
+        relation.save(update_fields=["lead"])
+        self.assertEqual(Deal.objects.get(nom_deal="Deal Zèbre").nom_entreprise, "Okapi")
+
+        lead.delete()
+        self.assertEqual(Deal.objects.get(nom_deal="Deal Acme").nom_entreprise, "")
+        call_command("sync_deal_nom_entreprise", verify=True, stdout=StringIO())
+
+    def test_deal_save_reads_company_name_only_on_change(self):
+        def company_queries(callback):
+            with CaptureQueriesContext(connection) as queries:
+                callback()
+            return [q["sql"] for q in queries.captured_queries if "company_name" in q["sql"]]
+
+        deal = Deal.objects.get(nom_deal="Deal Acme")
+        deal.stage = "negociation"
+        self.assertEqual(company_queries(lambda: deal.save(update_fields=["stage", "updated_at"])), [])
+        self.assertEqual(company_queries(deal.save), [])
+        deal = Deal.objects.select_related("relation").get(nom_deal="Deal Acme")
+        self.assertEqual(company_queries(deal.save), [])
+
+        # Autre relation : nom relu, un seul SELECT
+        deal.relation = Relation.objects.get(pk=self.relations["Mistral"].pk)
+        self.assertEqual(len(company_queries(deal.save)), 1)
+        self.assertEqual(Deal.objects.get(pk=deal.pk).nom_entreprise, "Mistral")
+        # Lead de la relation chargée changé en mémoire : nom du nouveau lead
+        deal.relation.lead_id = self.relations["Zèbre"].lead_id
+        self.assertEqual(len(company_queries(deal.save)), 1)
+        self.assertEqual(deal.nom_entreprise, "Zèbre")
+
+    def test_relation_save_without_lead_change(self):
+        relation = Relation.objects.get(pk=self.relations["Mistral"].pk)
+        # Lead inchangé : seulement la lecture de l'état précédent et l'UPDATE de la relation
+        with CaptureQueriesContext(connection) as queries:
+            relation.save()
+        sql = [q["sql"] for q in queries.captured_queries]
+        self.assertFalse([q for q in sql if "myapp_lead" in q or q.startswith('UPDATE "myapp_deal"')], sql)
+        with self.assertNumQueries(1):
+            relation.save(update_fields=["statut"])
+
+    def test_search_and_ordering_without_lead_join(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self._names(search="zeb"), [])  # icontains : accents conservés
+            self.assertEqual(self._names(search="zèb"), ["Zèbre"])
+        # Le lead reste joint pour lead_info, mais le filtre ne porte que sur myapp_deal
+        where = queries.captured_queries[0]["sql"].split(" WHERE ", 1)[1]
+        self.assertIn('"myapp_deal"."nom_entreprise"', where)
+        self.assertNotIn("myapp_lead", where)
+        self.assertEqual(self._names(ordering="nom_entreprise"), ["Acme", "Mistral", "Zèbre"])
+        first = self.client.get(reverse("deal-list"), {"ordering": "-nom_entreprise", "page_size": 2}).json()
+        second = self.client.get(first["next"]).json()
+        names = [deal["nom_entreprise"] for deal in first["results"] + second["results"]]
+        self.assertEqual(names, ["Zèbre", "Mistral", "Acme"])
+
+    def test_sync_command(self):
+        Deal.objects.update(nom_entreprise="obsolète")
+        with self.assertRaises(CommandError):
+            call_command("sync_deal_nom_entreprise", verify=True, stdout=StringIO())
+        call_command("sync_deal_nom_entreprise", batch_size=1, stdout=StringIO())
+        call_command("sync_deal_nom_entreprise", verify=True, stdout=StringIO())
+        self.assertEqual(sorted(Deal.objects.values_list("nom_entreprise", flat=True)), ["Acme", "Mistral", "Zèbre"])
+
+
+class ConditionalGetTests(TestCase):
+    """ETag / Last-Modified : 304 sans sérialisation tant que rien ne change"""
+
+    def setUp(self):
+        self.user = create_commercial()
+        self.lead = Lead.objects.create(
+            created_by=self.user, company_name="Acme", contact_name="Contact", email="acme@example.com"
+        )
+        Action.objects.create(lead=self.lead, commercial=self.user, titre="Relance", date_echeance=timezone.now())
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _revalidate(self, url, **params):
+        first = self.client.get(url, params)
+        self.assertEqual(first.status_code, 200)
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=first["ETag"])
+
+    def test_not_modified_in_one_query(self):
+        for url in [reverse("lead-list"), reverse("action-list"), reverse("lead-detail", args=[self.lead.pk])]:
+            first = self.client.get(url)
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response["ETag"], first["ETag"])
+            self.assertEqual(response.content, b"")
+        detail = self.client.get(reverse("lead-detail", args=[self.lead.pk]))
+        response = self.client.get(
+            reverse("lead-detail", args=[self.lead.pk]), HTTP_IF_MODIFIED_SINCE=detail["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate(self):
+        url = reverse("action-list")
+        etag = self.client.get(url)["ETag"]
+        # Lead renommé : lead_company affiché par la liste des actions
+        self.lead.company_name = "Acme Industries"
+        self.lead.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["lead_company"], "Acme Industries")
+
+        etag = self.client.get(reverse("lead-list"))["ETag"]
+        self.lead.delete()
+        self.assertEqual(self.client.get(reverse("lead-list"), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self._revalidate(reverse("lead-list")).status_code, 304)
+
+    def test_deleted_relation_invalidates(self):
+        offre = create_offre()
+        ancienne = Relation.objects.create(lead=self.lead, commercial=self.user, offre=offre)
+        offre_b = create_offre("Offre B", "5.00")
+        Relation.objects.create(lead=self.lead, commercial=self.user, offre=offre_b)
+        etag = self.client.get(reverse("lead-list"))["ETag"]
+        # max(updated_at) inchangé (la relation la plus récente reste) : seul le nombre de relations change
+        ancienne.delete()
+        self.assertEqual(self.client.get(reverse("lead-list"), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_validators_read_only_the_page(self):
+        for i in range(3):
+            Lead.objects.create(
+                created_by=self.user, company_name=f"Lead {i}", contact_name="Contact", email=f"lead{i}@example.com",
+                declared_at=timezone.now() - timedelta(days=10 + i),
+            )
+        url = reverse("lead-list")
+        first = self.client.get(url, {"page_size": 2})
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url, {"page_size": 2}, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+        self.assertIn("LIMIT 3", queries[0]["sql"])
+        # Une ligne hors de la page ne change pas son ETag
+        Lead.objects.filter(company_name="Lead 2").update(notes="vu", updated_at=timezone.now())
+        self.assertEqual(self.client.get(url, {"page_size": 2}, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+        # Ligne de la page supprimée : la suivante y entre, sans updated_at plus récent
+        Lead.objects.filter(company_name="Lead 0").delete()
+        self.assertEqual(self.client.get(url, {"page_size": 2}, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 200)
+
+    def test_etag_depends_on_query_and_user(self):
+        url = reverse("lead-list")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, {"search": "acme"}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        other = APIClient()
+        other.force_authenticate(create_commercial("autre"))
+        self.assertEqual(other.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get(reverse("lead-detail", args=[999999])).status_code, 404)
+
+
+class OffreCatalogueCacheTests(CommercialTestCase):
+    """Catalogue des offres actives : lu sans requête, invalidé par toute écriture sur Offre"""
+
+    def _noms(self):
+        return [offre["nom_offre"] for offre in self.client.get(reverse("lead-available-offres")).json()]
+
+    def test_lead_creation_and_form_without_offre_queries(self):
+        offres_actives()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self._noms(), ["Offre A"])
+            response = self.client.post(reverse("lead-list"), {
+                "company_name": "Acme", "contact_name": "Contact", "email": "acme@example.com",
+                "offre_id": self.offre.pk,
+            }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse([q for q in queries.captured_queries if 'FROM "myapp_offre"' in q["sql"]])
+        self.assertTrue(Relation.objects.filter(lead__email="acme@example.com", offre=self.offre).exists())
+
+    def test_writes_invalidate(self):
+        self.assertEqual(self._noms(), ["Offre A"])
+        autre = create_offre("Offre B", "5.00", plan_commission="durable")
+        self.assertEqual(self._noms(), ["Offre A", "Offre B"])
+        self.offre.actif = False
+        self.offre.save()
+        self.assertEqual(self._noms(), ["Offre B"])
+        response = self.client.post(reverse("lead-list"), {
+            "company_name": "Acme", "contact_name": "Contact", "email": "acme@example.com",
+            "offre_id": self.offre.pk,
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        autre.delete()
+        self.assertEqual(self._noms(), [])
+
+    def test_version_shared_between_workers(self):
+        self.assertEqual(self._noms(), ["Offre A"])
+        # Écriture faite par un autre worker : ni signal ni cache local ici, seule la version change
+        Offre.objects.filter(pk=self.offre.pk).update(nom_offre="Offre A2")
+        self.assertEqual(self._noms(), ["Offre A"])
+        cache.set(VERSION_KEY, "autre-worker", None)
+        self.assertEqual(self._noms(), ["Offre A2"])
+
+    def test_tests_use_a_process_local_cache(self):
+        # Lanceur du projet (myapp/test_runner.py) : rien de partagé avec le serveur de dev
+        self.assertEqual(settings.CACHES["default"]["BACKEND"], "django.core.cache.backends.locmem.LocMemCache")
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    """Utilisateur reconstruit depuis les champs signés du jeton ; révocation : la base fait foi"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_commercial(email="c@example.com", first_name="Ana", last_name="Lima")
+        Profil.objects.create(user=self.user, entreprise="ACME")
+        self.offre = create_offre()
+        self.client = APIClient()
+
+    def _login(self):
+        response = self.client.post(reverse("token_obtain_pair"), {"username": "commercial", "password": "secret"})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def _get(self, access, name="profile"):
+        return self.client.get(reverse(name), HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_no_user_query_per_request(self):
+        access = self._login()["access"]
+        self._get(access)  # état actif mis en cache
+        with self.assertNumQueries(0):
+            response = self._get(access)
+        self.assertEqual(response.json(), {
+            "email": "c@example.com", "username": "commercial", "full_name": "Ana Lima", "company": "ACME",
+        })
+        # L'utilisateur du jeton sert de clé étrangère
+        response = self.client.post(reverse("lead-list"), {
+            "company_name": "Acme", "contact_name": "Contact", "email": "acme@example.com",
+        }, format="json", HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Lead.objects.get(email="acme@example.com").created_by, self.user)
+
+    def test_changes_and_deactivation_revoke_claims(self):
+        tokens = self._login()
+        self.user.profil.entreprise = "Nouvelle"
+        self.user.profil.save()
+        # Jeton antérieur à la modification : relu en base
+        self.assertEqual(self._get(tokens["access"]).json()["company"], "Nouvelle")
+        refreshed = self.client.post(reverse("token_refresh"), {"refresh": tokens["refresh"]}).json()["access"]
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self._get(tokens["access"]).status_code, 401)
+        self.assertEqual(self._get(refreshed).status_code, 401)
+        cache.clear()  # état actif expiré : relu en base
+        self.assertEqual(self._get(refreshed).status_code, 401)
+
+    def test_revocation_survives_cache_clear(self):
+        access = self._login()["access"]
+        self._get(access)  # état en cache
+        # Écritures sans signal (update()) puis cache vidé : seule la base fait foi
+        User.objects.filter(pk=self.user.pk).update(is_staff=True, first_name="Anna")
+        cache.clear()
+        self.assertEqual(self._get(access).json()["full_name"], "Anna Lima")
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        cache.clear()
+        self.assertEqual(self._get(access).status_code, 401)
+        # Refus jamais mis en cache : relu en base à chaque requête
+        with self.assertNumQueries(1):
+            self.assertEqual(self._get(access).status_code, 401)
+
+    def test_refresh_carries_fresh_claims(self):
+        tokens = self._login()
+        self.user.first_name = "Anna"
+        self.user.save()
+        self.assertEqual(self._get(tokens["access"]).json()["full_name"], "Anna Lima")
+        refreshed = self.client.post(reverse("token_refresh"), {"refresh": tokens["refresh"]}).json()["access"]
+        self._get(refreshed)  # état en cache
+        # Champs du nouveau jeton identiques à la base : plus de lecture
+        with self.assertNumQueries(0):
+            self.assertEqual(self._get(refreshed).json()["full_name"], "Anna Lima")
+
+
+class LeadImportTests(CommercialTestCase):
+    """Import CSV / XLSX : validation par ligne, dédoublonnage par email, écriture par lots"""
+
+    CSV = (
+        "Société;Contact;Email;Téléphone;SIRET;Statut\n"
+        "Acme;Zoé;zoe@acme.example.com;+33612345678;123456789;nouveau\n"
+        "Sans email;Paul;;;;\n"
+        "Mauvais SIRET;Jean;jean@example.com;;12AB;\n"
+        "Doublon;Zoé;zoe@acme.example.com;;;\n"
+        "Existant;Eve;eve@example.com;;;en_cours\n"
+        "Autre commercial;Max;max@example.com;;;\n"
+        ";;;;;\n"
+        "Bêta;Léa;lea@beta.example.com;0612345678;;converti\n"
+    )
+
+    def setUp(self):
+        super().setUp()
+        other = create_commercial("autre")
+        self.eve = Lead.objects.create(created_by=self.user, company_name="Eve SA", contact_name="Eve", email="eve@example.com")
+        Lead.objects.create(created_by=other, company_name="Max", contact_name="Max", email="max@example.com")
+
+    def _upload(self, content, name="leads.csv", **data):
+        fichier = BytesIO(content)
+        fichier.name = name
+        return self.client.post(reverse("lead-import-leads"), {"fichier": fichier, **data}, format="multipart")
+
+    def test_csv_import_reports_errors_per_row(self):
+        response = self._upload(self.CSV.encode("utf-8"))
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual((report["lignes"], report["crees"], report["mis_a_jour"]), (7, 2, 0))
+        self.assertEqual(
+            [(error["ligne"], sorted(error["erreurs"])) for error in report["erreurs"]],
+            [(3, ["email"]), (4, ["siret"]), (5, ["email"]), (6, ["email"]), (7, ["email"])],
+        )
+        self.assertIn("lignes_par_seconde", report)
+        lea = Lead.objects.get(email="lea@beta.example.com")
+        self.assertEqual((lea.created_by, lea.status, lea.phone), (self.user, "converti", "0612345678"))
+        self.assertTrue(Relation.objects.filter(lead=lea, commercial=self.user, offre=self.offre).exists())
+        # bulk_create : compteurs recalculés, index de recherche à jour
+        self.assertEqual(CommercialStats.objects.get(pk=self.user.pk).leads_converti, 1)
+        results = self.client.get(reverse("lead-list"), {"search": "beta"}).json()["results"]
+        self.assertEqual([lead["email"] for lead in results], ["lea@beta.example.com"])
+
+    def test_update_existing_and_batches(self):
+        relation = Relation.objects.create(lead=self.eve, commercial=self.user, offre=self.offre)
+        deal = Deal.objects.create(relation=relation, nom_deal="D1", montant=100)
+        with CaptureQueriesContext(connection) as queries:
+            report = self._upload(self.CSV.encode("utf-8"), mise_a_jour="true", batch_size=2).json()
+        self.assertEqual((report["crees"], report["mis_a_jour"], report["nb_erreurs"]), (2, 1, 4))
+        self.eve.refresh_from_db()
+        self.assertEqual((self.eve.company_name, self.eve.status), ("Existant", "en_cours"))
+        deal.refresh_from_db()
+        self.assertEqual(deal.nom_entreprise, "Existant")
+        lookups = [q for q in queries.captured_queries if 'WHERE "myapp_lead"."email" IN' in q["sql"]]
+        self.assertEqual(len(lookups), 2)  # un SELECT par lot de 2 lignes valides
+
+    def test_command_cp1252_and_bad_files(self):
+        with tempfile.NamedTemporaryFile(suffix=".csv") as fichier:
+            fichier.write(self.CSV.encode("cp1252"))
+            fichier.flush()
+            out = StringIO()
+            call_command("import_leads", fichier.name, user="commercial", stdout=out)
+        self.assertIn("2 créé(s)", out.getvalue())
+        self.assertEqual(Lead.objects.get(email="lea@beta.example.com").company_name, "Bêta")
+        self.assertEqual(self._upload(b"nom;email\nx;y@example.com\n").status_code, 400)
+        self.assertEqual(self._upload(b"x", name="leads.txt").status_code, 400)
+        self.assertEqual(self._upload(b"not a zip", name="leads.xlsx").status_code, 400)
+
+    def test_concurrent_insert_between_lookup_and_insert(self):
+        # Premier lot : la recherche ne voit pas encore eve@example.com (insérée par une autre écriture)
+        real_filter = Lead.objects.filter
+        calls = []
+
+        def filter_once_stale(*args, **kwargs):
+            calls.append(kwargs)
+            return Lead.objects.none() if len(calls) == 1 else real_filter(*args, **kwargs)
+
+        content = "company_name;contact_name;email\nEve SA;Eve;eve@example.com\nNeuf;Léa;neuf@example.com\n"
+        with mock.patch.object(Lead.objects, "filter", side_effect=filter_once_stale):
+            response = self._upload(content.encode("utf-8"))
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual((report["crees"], report["erreurs"]), (1, [{"ligne": 2, "erreurs": {"email": ["Un lead avec cet email existe déjà"]}}]))
+        self.assertTrue(Relation.objects.filter(lead__email="neuf@example.com").exists())
+
+    def test_non_utf8_row_past_encoding_sample(self):
+        # Début du fichier en ASCII (estimé utf-8), ligne cp1252 au-delà des 64 Ko analysés
+        rows = "".join(f"Société {i};Contact;ascii{i}@example.com\n" for i in range(3000)).encode("ascii", "replace")
+        content = b"company_name;contact_name;email\n" + rows + "Bêta;Léa;lea@beta.example.com\n".encode("cp1252")
+        self.assertGreater(len(content) - len(b"B\xeata;L\xe9a;lea@beta.example.com\n"), 65536)
+        response = self._upload(content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["crees"], response.json()["nb_erreurs"]), (3001, 0))
+        self.assertEqual(Lead.objects.get(email="lea@beta.example.com").contact_name, "Léa")
+
+    def test_xlsx_import(self):
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(["company_name", "contact_name", "email", "siret"])
+        sheet.append(["Gamma", "Ana", "ana@gamma.example.com", 123456789])
+        content = BytesIO()
+        workbook.save(content)
+        report = self._upload(content.getvalue(), name="leads.xlsx").json()
+        self.assertEqual((report["crees"], report["nb_erreurs"]), (1, 0))
+        self.assertEqual(Lead.objects.get(email="ana@gamma.example.com").siret, "123456789")
+
+
+class ExportTests(CommercialTestCase):
+    """Exports CSV / NDJSON en flux : filtres de la liste, une requête SQL, périmètre du commercial"""
+
+    def setUp(self):
+        super().setUp()
+        other = create_commercial("autre")
+        for owner, prefix in ((self.user, "mine"), (other, "other")):
+            for i in range(5):
+                lead = Lead.objects.create(
+                    created_by=owner, company_name=f"Société {prefix} {i}", contact_name="Zoé",
+                    email=f"{prefix}{i}@example.com",
+                )
+                relation = Relation.objects.create(lead=lead, commercial=owner, offre=self.offre)
+                Deal.objects.create(
+                    relation=relation, nom_deal=f"Deal {prefix} {i}", montant=100 * i,
+                    stage="gagne" if i % 2 else "prospection",
+                )
+        Facture.objects.create(
+            commercial=self.user, numero_facture="F-1", montant_ht="100.00", montant_ttc="120.00",
+            date_facture=timezone.now().date(),
+        )
+
+    def _export(self, name, export_format, params=None):
+        url = reverse(name, kwargs={"export_format": export_format})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+            self.assertTrue(response.streaming)
+            content = b"".join(response.streaming_content).decode("utf-8")
+        return response, content, len(queries)
+
+    def test_deal_csv_uses_list_filters_and_one_query(self):
+        with mock.patch("myapp.exports.EXPORT_CHUNK_SIZE", 1):
+            response, content, nb_queries = self._export("deal-export", "csv", {"stage": "gagne", "ordering": "montant"})
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn("attachment;", response["Content-Disposition"])
+        self.assertTrue(content.startswith("\ufeffid,nom_deal,nom_entreprise,contact,email,offre,"))
+        rows = list(csv.reader(StringIO(content.lstrip("\ufeff"))))
+        self.assertEqual([row[1] for row in rows[1:]], ["Deal mine 1", "Deal mine 3"])
+        self.assertEqual(rows[1][2:6], ["Société mine 1", "Zoé", "mine1@example.com", "Offre A"])
+        self.assertEqual(nb_queries, 1)
+
+    def test_lead_ndjson_with_search(self):
+        response, content, nb_queries = self._export("lead-export", "ndjson", {"search": "mine 2"})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson; charset=utf-8")
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([record["email"] for record in records], ["mine2@example.com"])
+        self.assertIsNone(records[0]["phone"])
+        self.assertEqual(nb_queries, 1)
+
+    def test_facture_and_action_exports(self):
+        _response, content, _nb = self._export("facture-export", "ndjson")
+        [facture] = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual((facture["numero_facture"], facture["montant_ttc"]), ("F-1", "120.00"))
+        _response, content, _nb = self._export("action-export", "csv")
+        self.assertEqual(content.splitlines()[1:], [])
+        self.assertEqual(self.client.get("/api/deals/export/xml/").status_code, 404)
+
+
+class ExportSnapshotTests(CommercialTestCase):
+    """manage.py export_snapshot : Parquet partitionné par mois, typé, incrémental par filigrane"""
+
+    taux_commission = "12.50"
+
+    def setUp(self):
+        super().setUp()
+        self.deals = []
+        months = (datetime(2026, 8, 3, tzinfo=dt_timezone.utc), datetime(2026, 9, 1, tzinfo=dt_timezone.utc))
+        for i, created_at in enumerate(months):
+            lead = Lead.objects.create(
+                created_by=self.user, company_name=f"Société {i}", contact_name="Zoé", email=f"s{i}@example.com",
+            )
+            relation = Relation.objects.create(lead=lead, commercial=self.user, offre=self.offre)
+            deal = Deal.objects.create(relation=relation, nom_deal=f"Deal {i}", montant=100, stage="gagne")
+            Deal.objects.filter(pk=deal.pk).update(created_at=created_at)
+            self.deals.append(deal)
+        self.destination = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.destination, ignore_errors=True)
+
+    def _snapshot(self, *args):
+        call_command("export_snapshot", self.destination, "--lag", "0", *args, stdout=StringIO())
+
+    def _read(self, table):
+        return pyarrow_dataset.dataset(
+            os.path.join(self.destination, table), partitioning="hive"
+        ).to_table().to_pylist()
+
+    def test_full_snapshot_is_typed_and_partitioned(self):
+        self._snapshot()
+        self.assertEqual(sorted(os.listdir(os.path.join(self.destination, "deal"))), ["mois=2026-08", "mois=2026-09"])
+        deals = sorted(self._read("deal"), key=lambda row: row["id"])
+        self.assertEqual([(row["nom_deal"], row["mois"]) for row in deals], [("Deal 0", "2026-08"), ("Deal 1", "2026-09")])
+        self.assertEqual(deals[0]["created_at"], datetime(2026, 8, 3, tzinfo=dt_timezone.utc))
+        [offre] = self._read("offre")
+        self.assertEqual(offre["taux_commission"], Decimal("12.50"))
+        self.assertEqual(len(self._read("lead")), 2)
+
+    def test_incremental_appends_changed_rows_only(self):
+        self._snapshot()
+        with open(os.path.join(self.destination, "_snapshot.json"), encoding="utf-8") as state_file:
+            watermark = json.load(state_file)["tables"]["deal"]["watermark"]
+        self.deals[0].nom_deal = "Deal 0 renommé"
+        self.deals[0].save()
+        with CaptureQueriesContext(connection) as queries:
+            self._snapshot("--incremental", "--table", "deal")
+        self.assertEqual(len(queries), 1)
+        versions = [row["nom_deal"] for row in self._read("deal") if row["id"] == self.deals[0].pk]
+        self.assertEqual(sorted(versions), ["Deal 0", "Deal 0 renommé"])
+        with open(os.path.join(self.destination, "_snapshot.json"), encoding="utf-8") as state_file:
+            state = json.load(state_file)["tables"]
+        self.assertEqual((state["deal"]["mode"], state["deal"]["lignes"]), ("incremental", 1))
+        self.assertGreater(state["deal"]["watermark"], watermark)
+        self.assertEqual(state["lead"]["watermark"], watermark)
+        # Export complet : une seule version par ligne
+        self._snapshot("--table", "deal")
+        self.assertEqual(len(self._read("deal")), 2)
+
+
+class ActionBulkStatusTests(TestCase):
+    """marquer_terminees / marquer_annulees : un UPDATE limité au commercial, lignes modifiées renvoyées"""
+
+    def setUp(self):
+        self.user = create_commercial()
+        other = create_commercial("autre")
+        lead = Lead.objects.create(created_by=self.user, company_name="Acme", contact_name="Zoé", email="zoe@example.com")
+        echeance = timezone.now() + timedelta(days=1)
+        self.actions = [
+            Action.objects.create(lead=lead, commercial=self.user, action_type="call", titre=f"Action {i}", date_echeance=echeance)
+            for i in range(4)
+        ]
+        self.other_action = Action.objects.create(
+            lead=lead, commercial=other, action_type="call", titre="Autre", date_echeance=echeance,
+        )
+        Action.objects.filter(pk=self.actions[3].pk).update(statut="terminee")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_transition_is_scoped_and_constant(self):
+        ids = [action.pk for action in self.actions] + [self.other_action.pk, 999999]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("action-marquer-terminees"), {"ids": ids}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 2)  # UPDATE + relecture des lignes modifiées
+        data = response.json()
+        self.assertEqual(data["modifiees"], 3)
+        self.assertEqual(sorted(action["id"] for action in data["actions"]), ids[:3])
+        self.assertEqual(data["ignorees"], sorted([self.actions[3].pk, self.other_action.pk, 999999]))
+        self.assertTrue(all(action["realise_le"] for action in data["actions"]))
+        self.other_action.refresh_from_db()
+        self.assertEqual((self.other_action.statut, self.other_action.realise_le), ("en_attente", None))
+
+        data = self.client.post(reverse("action-marquer-annulees"), {"ids": ids[:2]}, format="json").json()
+        self.assertEqual([action["statut"] for action in data["actions"]], ["annulee", "annulee"])
+        self.assertEqual(Action.objects.filter(commercial=self.user, statut="terminee").count(), 2)
+
+    def test_invalid_ids(self):
+        url = reverse("action-marquer-terminees")
+        for payload in ({}, {"ids": []}, {"ids": "1,2"}, {"ids": ["abc"]}, {"ids": list(range(501))}):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.client.post(url, payload, format="json").status_code, 400)
+        self.assertFalse(Action.objects.filter(statut="terminee").exclude(pk=self.actions[3].pk).exists())
+
+
+class DealStageTransitionTests(CommercialTestCase):
+    """changer_stage en masse et PATCH de stage : remporte_le, statut du lead, dernière action, compteurs"""
+
+    def setUp(self):
+        super().setUp()
+        other = create_commercial("autre")
+        self.other_deal = self._deals(other, 1)[0]
+
+    def _deals(self, user, count):
+        deals = []
+        for i in range(count):
+            lead = Lead.objects.create(
+                created_by=user, company_name=f"Société {user.pk}-{Lead.objects.count()}", contact_name="Zoé",
+                email=f"lead{user.pk}-{Lead.objects.count()}@example.com", status="en_cours",
+            )
+            relation = Relation.objects.create(lead=lead, commercial=user, offre=self.offre)
+            deals.append(Deal.objects.create(relation=relation, nom_deal=f"Deal {i}", montant=1000, stage="negociation"))
+        return deals
+
+    def _move(self, ids, stage):
+        return self.client.post(reverse("deal-changer-stage"), {"ids": ids, "stage": stage}, format="json")
+
+    def _assert_stats_consistent(self):
+        stats = CommercialStats.objects.get(pk=self.user.pk)
+        for field, value in compute_commercial_stats(self.user.pk).items():
+            self.assertEqual(getattr(stats, field), value, field)
+
+    def test_bulk_move_applies_side_effects_with_constant_queries(self):
+        counts = []
+        for size in (2, 8):
+            deals = self._deals(self.user, size)
+            with CaptureQueriesContext(connection) as queries:
+                response = self._move([deal.pk for deal in deals] + [self.other_deal.pk], "gagne")
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+            data = response.json()
+            self.assertEqual((data["modifies"], data["ignores"]), (size, [self.other_deal.pk]))
+            self.assertTrue(all(deal["stage"] == "gagne" and deal["remporte_le"] for deal in data["deals"]))
+        self.assertEqual(counts[0], counts[1])
+
+        self.assertFalse(Lead.objects.filter(created_by=self.user).exclude(status="converti").exists())
+        self.assertFalse(Relation.objects.filter(commercial=self.user, derniere_action__isnull=True).exists())
+        self.assertEqual(CommercialStats.objects.get(pk=self.user.pk).deals_gagne, 10)
+        self._assert_stats_consistent()
+        self.other_deal.refresh_from_db()
+        self.assertEqual((self.other_deal.stage, self.other_deal.relation.lead.status), ("negociation", "en_cours"))
+
+        # Déjà à l'étape : ignorés
+        data = self._move([deal.pk for deal in deals], "gagne").json()
+        self.assertEqual(data["modifies"], 0)
+
+    def test_patch_stage_applies_side_effects(self):
+        deal = self._deals(self.user, 1)[0]
+        response = self.client.patch(reverse("deal-detail", kwargs={"pk": deal.pk}), {"stage": "perdu"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        deal.refresh_from_db()
+        self.assertEqual(deal.relation.lead.status, "perdu")
+        self.assertIsNotNone(deal.relation.derniere_action)
+        self._assert_stats_consistent()
+
+        self.client.patch(reverse("deal-detail", kwargs={"pk": deal.pk}), {"stage": "gagne"}, format="json")
+        deal.refresh_from_db()
+        self.assertIsNotNone(deal.remporte_le)
+        self.assertEqual(deal.relation.lead.status, "converti")
+        self._assert_stats_consistent()
+
+    def test_lead_counters_of_several_creators_refreshed_set_wise(self):
+        counts = []
+        for nb_createurs in (2, 5):
+            createurs = [create_commercial(f"createur{nb_createurs}-{i}") for i in range(nb_createurs)]
+            deals = self._deals(self.user, nb_createurs)
+            # Leads créés par d'autres, suivis par self.user
+            for deal, createur in zip(deals, createurs):
+                Lead.objects.filter(relations__deals=deal).update(created_by=createur)
+                refresh_commercial_stats(createur.pk)
+            refresh_commercial_stats(self.user.pk)
+            with CaptureQueriesContext(connection) as queries:
+                self._move([deal.pk for deal in deals], "perdu")
+            counts.append(len(queries))
+            for createur in createurs:
+                stats = CommercialStats.objects.get(pk=createur.pk)
+                self.assertEqual((stats.leads_perdu, stats.leads_en_cours), (1, 0))
+                self.assertEqual(
+                    {field: getattr(stats, field) for field in COUNTER_FIELDS}, compute_commercial_stats(createur.pk)
+                )
+            self._assert_stats_consistent()
+        self.assertEqual(counts[0], counts[1])
+
+    def test_leaving_gagne_clears_remporte_le(self):
+        deals = self._deals(self.user, 2)
+        self._move([deal.pk for deal in deals], "gagne")
+        self._move([deals[0].pk], "negociation")
+        self.client.patch(reverse("deal-detail", kwargs={"pk": deals[1].pk}), {"stage": "perdu"}, format="json")
+        for deal in deals:
+            deal.refresh_from_db()
+            self.assertIsNone(deal.remporte_le)
+        self._assert_stats_consistent()
+
+    def test_invalid_payloads(self):
+        for payload in ({"ids": [self.other_deal.pk]}, {"ids": [1], "stage": "contrat"}, {"ids": [], "stage": "gagne"},
+                        {"ids": ["x"], "stage": "gagne"}):
+            with self.subTest(payload=payload):
+                response = self.client.post(reverse("deal-changer-stage"), payload, format="json")
+                self.assertEqual(response.status_code, 400)
@@ -0,0 +1,30 @@
+"""
+Transactions d'écriture.
+
+atomic_write() s'utilise comme transaction.atomic() pour les blocs qui écrivent
+(facturation, numérotation). Sous SQLite (backend myproject.sqlite3), la
+transaction la plus externe démarre en BEGIN IMMEDIATE : le verrou d'écriture
+est acquis d'entrée, les écrivains concurrents attendent leur tour au lieu
+d'échouer en "database is locked". Sur les autres moteurs, ou à l'intérieur
+d'une transaction déjà ouverte, c'est un transaction.atomic() ordinaire.
+"""
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+@contextmanager
+def atomic_write(using=None, savepoint=True):
+    connection = transaction.get_connection(using)
+    immediate = hasattr(connection, 'begin_mode') and not connection.in_atomic_block
+    if immediate:
+        connection.begin_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using, savepoint=savepoint):
+            if immediate:
+                # Le BEGIN est émis à l'entrée du bloc : les transactions suivantes restent en DEFERRED
+                connection.begin_mode = None
+            yield
+    finally:
+        if immediate:
+            connection.begin_mode = None
@@ -12,6 +12,7 @@ from .views import (
     auth,
     stats,
     users,
+    metrics,
     profile as profile_view,
 )
 
@@ -30,6 +31,7 @@ urlpatterns = [
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("profile/", profile_view.profile, name="profile"),
     path("dashboard-stats/", stats.dashboard_stats, name="dashboard_stats"),
+    path("metrics/requests/", metrics.request_metrics, name="request_metrics"),
     # path("users/emails/", users.users_emails, name="users-emails"),
     # path("users/", users.all_users, name="all_users"),
     # path("leads/", lead.user_leads, name="leads"),
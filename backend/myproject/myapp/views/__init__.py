@@ -10,3 +10,4 @@ from . import auth
 from . import stats
 from . import users
 from . import profile
+from . import metrics
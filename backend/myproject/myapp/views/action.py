@@ -1,3 +1,5 @@
+from datetime import datetime, time, timedelta
+
 from rest_framework import viewsets, permissions, filters, status
 from ..models import Action
 from ..serializers import ActionSerializer
@@ -5,16 +7,31 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.db.models import Count, Q
+from ..conditional import ConditionalGetMixin
+from ..exports import ExportMixin
+
+# Actions modifiées par requête par les endpoints en masse
+MAX_IDS_EN_MASSE = 500
 
 
-class ActionViewSet(viewsets.ModelViewSet):
+class ActionViewSet(ConditionalGetMixin, ExportMixin, viewsets.ModelViewSet):
     serializer_class = ActionSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['action_type', 'statut', 'priorite', 'lead']
-    ordering_fields = ['date_echeance', 'priorite', 'created_at']
-    ordering = ['date_echeance']
     search_fields = ['titre', 'notes', 'lead__company_name']
+    keyset_ordering = 'date_echeance'
+    keyset_ordering_fields = ['date_echeance']
+    # lead_company / lead_contact affichés par ActionSerializer
+    etag_timestamp_fields = ['updated_at', 'lead__updated_at']
+    export_fields = [
+        ('id', 'id'), ('titre', 'titre'), ('action_type', 'action_type'), ('statut', 'statut'),
+        ('priorite', 'priorite'), ('date_echeance', 'date_echeance'), ('realise_le', 'realise_le'),
+        ('lead_company', 'lead__company_name'), ('lead_email', 'lead__email'), ('notes', 'notes'),
+        ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+    ]
     
     def get_queryset(self):
         """Retourne les actions du commercial connecté"""
@@ -67,6 +84,57 @@ class ActionViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(action)
         return Response(serializer.data)
 
+    def _changer_statut_en_masse(self, request, statut):
+        """
+        Passe les actions `ids` du commercial au statut donné en un seul UPDATE
+        (realise_le = maintenant), puis relit les lignes modifiées.
+        Ids inconnus, d'un autre commercial ou déjà dans ce statut : ignorés.
+        """
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids or len(ids) > MAX_IDS_EN_MASSE:
+            return Response(
+                {"error": f"ids : liste de 1 à {MAX_IDS_EN_MASSE} identifiants attendue."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            ids = {int(pk) for pk in ids}
+        except (TypeError, ValueError):
+            return Response({"error": "ids : identifiants entiers attendus."}, status=status.HTTP_400_BAD_REQUEST)
+
+        maintenant = timezone.now()
+        nb_modifiees = Action.objects.filter(commercial=request.user, pk__in=ids).exclude(statut=statut).update(
+            statut=statut, realise_le=maintenant, updated_at=maintenant
+        )
+        actions = []
+        if nb_modifiees:
+            # realise_le = maintenant : exactement les lignes de cet UPDATE
+            actions = self.get_queryset().filter(pk__in=ids, statut=statut, realise_le=maintenant).order_by('date_echeance', 'pk')
+        serializer = self.get_serializer(actions, many=True)
+        modifiees = {int(data['id']) for data in serializer.data}
+        return Response({
+            'modifiees': nb_modifiees,
+            'actions': serializer.data,
+            'ignorees': sorted(ids - modifiees),
+        })
+
+    @action(detail=False, methods=['post'])
+    def marquer_terminees(self, request):
+        """Marquer plusieurs actions comme terminées : {"ids": [...]}"""
+        return self._changer_statut_en_masse(request, 'terminee')
+
+    @action(detail=False, methods=['post'])
+    def marquer_annulees(self, request):
+        """Marquer plusieurs actions comme annulées : {"ids": [...]}"""
+        return self._changer_statut_en_masse(request, 'annulee')
+
+    def _paginated_response(self, queryset):
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
     @action(detail=False, methods=['get'])
     def actions_du_jour(self, request):
         """Récupérer les actions du jour"""
@@ -75,8 +143,7 @@ class ActionViewSet(viewsets.ModelViewSet):
             date_echeance__date=aujourd_hui,
             statut='en_attente'
         )
-        serializer = self.get_serializer(actions, many=True)
-        return Response(serializer.data)
+        return self._paginated_response(actions)
 
     @action(detail=False, methods=['get'])
     def actions_en_retard(self, request):
@@ -85,8 +152,7 @@ class ActionViewSet(viewsets.ModelViewSet):
             date_echeance__lt=timezone.now(),
             statut='en_attente'
         )
-        serializer = self.get_serializer(actions, many=True)
-        return Response(serializer.data)
+        return self._paginated_response(actions)
 
     @action(detail=False, methods=['get'])
     def actions_a_venir(self, request):
@@ -94,28 +160,61 @@ class ActionViewSet(viewsets.ModelViewSet):
         actions = self.get_queryset().filter(
             statut='en_attente'
         ).order_by('date_echeance')
-        serializer = self.get_serializer(actions, many=True)
-        return Response(serializer.data)
+        return self._paginated_response(actions)
 
     @action(detail=False, methods=['get'])
     def statistiques(self, request):
-        """Statistiques des actions"""
+        """
+        Statistiques des actions, calculées en une seule requête d'agrégation.
+        Paramètres optionnels : date_debut / date_fin (YYYY-MM-DD) sur la date d'échéance.
+        Bornes converties en instants (début du jour, début du lendemain) : comparaison
+        directe sur la colonne, l'index sur date_echeance reste utilisable.
+        """
         queryset = self.get_queryset()
-        
-        total = queryset.count()
-        terminees = queryset.filter(statut='terminee').count()
-        en_attente = queryset.filter(statut='en_attente').count()
-        annulees = queryset.filter(statut='annulee').count()
-        en_retard = queryset.filter(
-            date_echeance__lt=timezone.now(),
-            statut='en_attente'
-        ).count()
-        
+
+        for param, lookup, jours in (('date_debut', 'date_echeance__gte', 0), ('date_fin', 'date_echeance__lt', 1)):
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                parsed = parse_date(value)
+            except ValueError:
+                # Bien formée mais impossible (ex. 2025-02-31)
+                parsed = None
+            if parsed is None:
+                return Response(
+                    {"error": f"Paramètre {param} invalide (format attendu: YYYY-MM-DD)."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            debut_du_jour = timezone.make_aware(datetime.combine(parsed + timedelta(days=jours), time.min))
+            queryset = queryset.filter(**{lookup: debut_du_jour})
+
+        aggregates = {
+            'total': Count('id'),
+            'terminees': Count('id', filter=Q(statut='terminee')),
+            'en_attente': Count('id', filter=Q(statut='en_attente')),
+            'annulees': Count('id', filter=Q(statut='annulee')),
+            'en_retard': Count('id', filter=Q(date_echeance__lt=timezone.now(), statut='en_attente')),
+        }
+        for value, _label in Action.ACTION_TYPE_CHOICES:
+            aggregates[f'type_{value}'] = Count('id', filter=Q(action_type=value))
+        for value, _label in Action.PRIORITY_CHOICES:
+            aggregates[f'priorite_{value}'] = Count('id', filter=Q(priorite=value))
+
+        stats = queryset.order_by().aggregate(**aggregates)
+        total = stats['total']
+
         return Response({
             'total': total,
-            'terminees': terminees,
-            'en_attente': en_attente,
-            'annulees': annulees,
-            'en_retard': en_retard,
-            'taux_accomplissement': (terminees / total * 100) if total > 0 else 0
-        })
\ No newline at end of file
+            'terminees': stats['terminees'],
+            'en_attente': stats['en_attente'],
+            'annulees': stats['annulees'],
+            'en_retard': stats['en_retard'],
+            'taux_accomplissement': (stats['terminees'] / total * 100) if total > 0 else 0,
+            'par_type': {
+                value: stats[f'type_{value}'] for value, _label in Action.ACTION_TYPE_CHOICES
+            },
+            'par_priorite': {
+                value: stats[f'priorite_{value}'] for value, _label in Action.PRIORITY_CHOICES
+            },
+        })
@@ -3,15 +3,19 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.tokens import RefreshToken
+from ..authentication import CrmTokenObtainPairSerializer
 from django.views.decorators.http import require_POST
 from ..models import Profil
+from ..logging import get_logger
 
 User = get_user_model()
+logger = get_logger(__name__)
 
 def get_tokens_for_user(user):
-    refresh = RefreshToken.for_user(user)
-    print(refresh)
+    # Mêmes champs signés que /login/ (myapp/authentication.py)
+    refresh = CrmTokenObtainPairSerializer.get_token(user)
+    # Ne jamais journaliser les jetons eux-mêmes
+    logger.debug("Jetons émis", extra={'user_id': user.pk})
     return {
         "refresh": str(refresh),
         "access": str(refresh.access_token),
@@ -8,16 +8,51 @@ from rest_framework import status
 from rest_framework.decorators import action
 from datetime import timedelta
 from django.db import transaction
+from ..commercial_stats import refresh_commercial_stats
+from ..invoicing import allocate_numero_facture, generer_factures_en_masse
+from ..taxes import totaux_deals, centimes, commission_centimes_expression, taux_commission_expression
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from decimal import Decimal
+import time
+from ..logging import get_logger
+from ..transactions import atomic_write
+from ..conditional import ConditionalGetMixin
+from ..exports import ExportMixin
+from ..deal_stages import changer_stage_deals
 
+logger = get_logger(__name__)
 
-class DealViewSet(viewsets.ModelViewSet):
+# Deals déplacés par requête par DealViewSet.changer_stage
+MAX_IDS_EN_MASSE = 500
+
+
+class DealViewSet(ConditionalGetMixin, ExportMixin, viewsets.ModelViewSet):
     serializer_class = DealSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
     filterset_fields = ['stage', 'type_deal', 'relation']
-    ordering_fields = ['created_at', 'montant', 'stage']
+    # montant / stage : tri des exports seulement, refusé en 400 sur la liste paginée
+    ordering_fields = ['created_at', 'montant', 'stage', 'nom_entreprise']
     ordering = ['-created_at']
-    search_fields = ['nom_deal', 'relation__lead__company_name', 'notes']
+    # nom_entreprise : copie du nom du lead sur le deal, pas de jointure relation -> lead
+    search_fields = ['nom_deal', 'nom_entreprise', 'notes']
+    keyset_ordering = '-created_at'
+    # ?ordering= repris par la pagination keyset pour ces colonnes (index (col, id))
+    keyset_ordering_fields = ['created_at', 'nom_entreprise']
+    # lead_info (contact, email) affiché par DealSerializer
+    etag_timestamp_fields = ['updated_at', 'relation__lead__updated_at']
+    export_fields = [
+        ('id', 'id'), ('nom_deal', 'nom_deal'), ('nom_entreprise', 'nom_entreprise'),
+        ('contact', 'relation__lead__contact_name'), ('email', 'relation__lead__email'),
+        ('offre', 'relation__offre__nom_offre'), ('type_deal', 'type_deal'), ('stage', 'stage'),
+        ('montant', 'montant'), ('taux_commission', 'taux_commission'), ('remporte_le', 'remporte_le'),
+        ('numero_facture', 'facture__numero_facture'), ('date_paiment_client', 'date_paiment_client'),
+        ('date_paiment_commission', 'date_paiment_commission'), ('notes', 'notes'),
+        ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+    ]
 
     def get_queryset(self):
         """
@@ -60,23 +95,21 @@ class DealViewSet(viewsets.ModelViewSet):
                         'email': relation.lead.email,
                         'offre_nom': relation.offre.nom_offre,
                         'plan_commission': relation.offre.plan_commission,
-                        'taux_commission': float(relation.offre.taux_commission) if relation.offre.taux_commission else None
+                        'taux_commission': str(relation.offre.taux_commission) if relation.offre.taux_commission else None
                     })
             
-            print(f"✅ Relations disponibles envoyées: {len(relations_data)} relations")
+            logger.debug("Relations disponibles envoyées: %d", len(relations_data), extra={'user_id': request.user.pk})
             return Response(relations_data)
             
-        except Exception as e:
-            print(f"❌ Erreur dans available_relations: {str(e)}")
+        except Exception:
+            logger.exception("Erreur dans available_relations")
             return Response(
                 {"error": "Erreur lors du chargement des relations"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
     def create(self, request, *args, **kwargs):
-        print("=== DEBUG CREATE DEAL ===")
-        print("Données reçues:", request.data)
-        print("Utilisateur:", request.user.username)
+        logger.debug("Création de deal: données=%s", request.data, extra={'user_id': request.user.pk})
         
         try:
             # Vérifier si la relation existe et appartient à l'utilisateur
@@ -92,9 +125,8 @@ class DealViewSet(viewsets.ModelViewSet):
                     id=relation_id, 
                     commercial=request.user  # ✅ SECURITY: Ensure user owns this relation
                 )
-                print(f"✅ Relation trouvée: {relation.id} - {relation.lead.company_name if relation.lead else 'No Lead'}")
             except Relation.DoesNotExist:
-                print(f"❌ Relation non trouvée ou non autorisée avec ID: {relation_id}")
+                logger.info("Relation non trouvée ou non autorisée: %s", relation_id, extra={'user_id': request.user.pk})
                 return Response(
                     {"relation": ["La relation spécifiée n'existe pas ou vous n'y avez pas accès."]},
                     status=status.HTTP_400_BAD_REQUEST
@@ -106,9 +138,8 @@ class DealViewSet(viewsets.ModelViewSet):
             # S'assurer que le serializer a le contexte avec la request
             serializer = self.get_serializer(data=data)
             
-            print("Serializer valide?", serializer.is_valid())
             if not serializer.is_valid():
-                print("❌ Erreurs de validation:", serializer.errors)
+                logger.info("Deal invalide: %s", serializer.errors, extra={'user_id': request.user.pk})
                 return Response(
                     {"error": "Erreur de validation", "details": serializer.errors},
                     status=status.HTTP_400_BAD_REQUEST
@@ -116,7 +147,7 @@ class DealViewSet(viewsets.ModelViewSet):
             
             # Créer l'instance
             instance = serializer.save()
-            print(f"✅ Deal créé avec succès: {instance.id} - {instance.nom_deal}")
+            logger.debug("Deal créé: %s", instance.id, extra={'user_id': request.user.pk})
             
             # Retourner les données avec les relations
             response_serializer = self.get_serializer(instance)
@@ -124,9 +155,7 @@ class DealViewSet(viewsets.ModelViewSet):
             return Response(response_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
             
         except Exception as e:
-            print(f"❌ Erreur inattendue: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Erreur inattendue lors de la création d'un deal")
             return Response(
                 {"error": "Erreur serveur interne", "details": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -158,13 +187,102 @@ class DealViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(queryset, many=True)
             return Response(serializer.data)
             
-        except Exception as e:
-            print(f"❌ Erreur dans commissions: {str(e)}")
+        except Exception:
+            logger.exception("Erreur dans commissions")
             return Response(
                 {"error": "Erreur lors du chargement des commissions"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
+    @action(detail=False, methods=['get'])
+    def commission_ledger(self, request):
+        """
+        Grand livre des commissions, calculé en base : commission de chaque deal
+        (montant * taux effectif / 100), sous-totaux par offre / plan et par mois,
+        totaux généraux, puis lignes paginées (projection légère, sans serializer).
+        Les agrégats ne sont calculés et renvoyés qu'avec la première page ; les pages
+        suivantes (?cursor=) ne portent que les lignes. Montants décimaux en chaînes,
+        comme dans les serializers.
+        Par défaut : deals gagnés non facturés ; ?inclure_facturees=true pour tout l'historique.
+        """
+        queryset = self.get_queryset().filter(stage='gagne')
+        if request.query_params.get('inclure_facturees', '').lower() not in ('1', 'true', 'oui'):
+            queryset = queryset.filter(facture__isnull=True)
+        queryset = self.filter_queryset(queryset).annotate(
+            commission_centimes=commission_centimes_expression(),
+            taux_centiemes=taux_commission_expression(),
+            mois=TruncMonth(Coalesce('remporte_le', 'created_at')),
+        )
+
+        rows = queryset.values(
+            'id', 'nom_deal', 'nom_entreprise', 'type_deal', 'montant', 'remporte_le', 'created_at',
+            'date_paiment_client', 'date_paiment_commission', 'facture',
+            'commission_centimes', 'taux_centiemes',
+            offre_nom=F('relation__offre__nom_offre'),
+            plan_commission=F('relation__offre__plan_commission'),
+        )
+        page = self.paginate_queryset(rows)
+        lignes = page if page is not None else list(rows)
+        for ligne in lignes:
+            ligne['commission'] = str(centimes(ligne.pop('commission_centimes')))
+            ligne['taux_commission'] = str(centimes(ligne.pop('taux_centiemes')))
+
+        # Pages suivantes (curseur) : lignes seules, les agrégats viennent de la première page
+        if page is not None and self.paginator.cursor is not None:
+            return self.get_paginated_response(lignes)
+
+        data = self._ledger_aggregats(queryset)
+        if page is None:
+            data['results'] = lignes
+            return Response(data)
+        response = self.get_paginated_response(lignes)
+        response.data = {**data, **response.data}
+        return response
+
+    @staticmethod
+    def _ledger_aggregats(queryset):
+        """Totaux, sous-totaux par offre / plan / mois et par plan ; montants décimaux en chaînes"""
+        totaux = queryset.order_by().aggregate(
+            nb_deals=Count('id'),
+            montant=Coalesce(Sum('montant'), 0),
+            commission=Coalesce(Sum('commission_centimes'), 0),
+        )
+        groupes = [
+            {
+                'offre_id': row['relation__offre'],
+                'offre_nom': row['relation__offre__nom_offre'],
+                'plan_commission': row['relation__offre__plan_commission'],
+                'mois': row['mois'].date().isoformat() if row['mois'] else None,
+                'nb_deals': row['nb_deals'],
+                'montant': row['montant'],
+                'commission': centimes(row['commission']),
+            }
+            for row in queryset.order_by().values(
+                'relation__offre', 'relation__offre__nom_offre', 'relation__offre__plan_commission', 'mois'
+            ).annotate(
+                nb_deals=Count('id'),
+                montant=Coalesce(Sum('montant'), 0),
+                commission=Coalesce(Sum('commission_centimes'), 0),
+            ).order_by('-mois', 'relation__offre__nom_offre')
+        ]
+        par_plan = {}
+        for groupe in groupes:
+            plan = par_plan.setdefault(groupe['plan_commission'], {'nb_deals': 0, 'montant': 0, 'commission': Decimal('0')})
+            plan['nb_deals'] += groupe['nb_deals']
+            plan['montant'] += groupe['montant']
+            plan['commission'] += groupe['commission']
+        for ligne in [*groupes, *par_plan.values()]:
+            ligne['commission'] = str(ligne['commission'])
+        return {
+            'totaux': {
+                'nb_deals': totaux['nb_deals'],
+                'montant': totaux['montant'],
+                'commission': str(centimes(totaux['commission'])),
+            },
+            'par_plan': par_plan,
+            'groupes': groupes,
+        }
+
     @action(detail=False, methods=['post'])
     def create_facture_from_deals(self, request):
         """Create invoice from selected deals"""
@@ -177,43 +295,48 @@ class DealViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            with transaction.atomic():
+            with atomic_write():
+                # Generate invoice number first: l'UPDATE du compteur du jour verrouille
+                # la séquence jusqu'au commit, les créations concurrentes sont sérialisées
+                from datetime import datetime, timedelta
+                today = datetime.now().date()
+                invoice_number = allocate_numero_facture(today)
+
                 # Get selected deals (only those belonging to current user and without invoice)
-                deals = Deal.objects.filter(
+                locked_ids = list(Deal.objects.select_for_update(of=('self',)).filter(
                     id__in=deal_ids,
                     relation__commercial=request.user,  # Security: user owns these deals
                     stage='gagne',
                     facture__isnull=True
-                )
+                ).values_list('id', flat=True))
                 
-                if not deals:
+                if not locked_ids:
+                    # Annule la transaction pour rendre le numéro réservé
+                    transaction.set_rollback(True)
                     return Response(
                         {'error': 'Aucun deal valide trouvé'},
                         status=status.HTTP_400_BAD_REQUEST
                     )
                 
-                # Calculate total amounts
-                total_montant_ht = sum(deal.montant or 0 for deal in deals)
-                total_montant_ttc = total_montant_ht * 1.2  # Assuming 20% TVA
-                
-                # Generate invoice number
-                from datetime import datetime, timedelta
-                invoice_count = Facture.objects.count() + 1
-                invoice_number = f"FACT-{datetime.now().strftime('%Y%m%d')}-{invoice_count:04d}"
+                # Calculate total amounts (en base, en Decimal exact ; TVA selon settings.TAUX_TVA)
+                deals = Deal.objects.filter(id__in=locked_ids)
+                totaux = totaux_deals(deals)
                 
                 # Create invoice
                 facture = Facture.objects.create(
                     commercial=request.user,
                     numero_facture=invoice_number,
-                    montant_ht=total_montant_ht,
-                    montant_ttc=total_montant_ttc,
-                    date_facture=datetime.now().date(),
-                    date_echeance=datetime.now().date() + timedelta(days=30),  # 30 days due date
+                    montant_ht=totaux['montant_ht'],
+                    montant_ttc=totaux['montant_ttc'],
+                    date_facture=today,
+                    date_echeance=today + timedelta(days=30),  # 30 days due date
                     statut_paiement='pending'
                 )
                 
                 # Update deals with the invoice
-                deals.update(facture=facture)
+                deals.update(facture=facture, updated_at=timezone.now())
+                # queryset.update() ne déclenche pas les signaux : commissions en attente à recalculer
+                refresh_commercial_stats(request.user.pk)
                 
                 # Serialize the invoice with deals - use correct import path
                 # from .serializers import FactureSerializer  # Adjust path if needed
@@ -221,12 +344,105 @@ class DealViewSet(viewsets.ModelViewSet):
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
                 
         except Exception as e:
-            print(f"❌ Erreur création facture: {str(e)}")
+            logger.exception("Erreur création facture")
             return Response(
                 {'error': f'Erreur lors de la création de la facture: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def bulk_create_factures(self, request):
+        """
+        Facturation de fin de mois : une facture par commercial pour tous
+        ses deals gagnés non facturés (réservé aux administrateurs).
+        Paramètres optionnels : commercial_ids (liste), date (YYYY-MM-DD).
+        """
+        commercial_ids = None
+        if 'commercial_ids' in request.data:
+            commercial_ids = self._commercial_ids(request.data)
+            if commercial_ids is None:
+                return Response(
+                    {'error': 'commercial_ids : liste non vide d\'identifiants entiers attendue'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        day = None
+        if request.data.get('date'):
+            try:
+                day = parse_date(str(request.data['date']))
+            except ValueError:
+                # Bien formée mais impossible (ex. 2025-02-31)
+                day = None
+            if day is None:
+                return Response(
+                    {'error': 'Date invalide (format attendu: YYYY-MM-DD)'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        started = time.perf_counter()
+        factures, nb_deals = generer_factures_en_masse(commercial_ids=commercial_ids, day=day)
+        elapsed = time.perf_counter() - started
+
+        return Response({
+            'factures': len(factures),
+            'deals': nb_deals,
+            'montant_ht': sum((f.montant_ht for f in factures), Decimal('0')),
+            'montant_ttc': sum((f.montant_ttc for f in factures), Decimal('0')),
+            'duree_s': round(elapsed, 3),
+            'deals_par_seconde': round(nb_deals / elapsed) if elapsed > 0 else None,
+        }, status=status.HTTP_201_CREATED)
+    
+    @staticmethod
+    def _commercial_ids(data):
+        """Liste non vide d'ids entiers, ou None si invalide (jamais « tous les commerciaux » par erreur)"""
+        if hasattr(data, 'getlist'):
+            # Formulaire : commercial_ids=1&commercial_ids=2
+            values = data.getlist('commercial_ids')
+            if not all(isinstance(value, str) and value.strip().isdigit() for value in values):
+                return None
+            values = [int(value) for value in values]
+        else:
+            values = data['commercial_ids']
+            if not isinstance(values, list) or not all(
+                isinstance(value, int) and not isinstance(value, bool) for value in values
+            ):
+                return None
+        return values or None
+
+    @action(detail=False, methods=['post'])
+    def changer_stage(self, request):
+        """
+        Déplace plusieurs deals vers une étape : {"ids": [...], "stage": "gagne"}.
+        Une transaction, effets de bord (remporte_le, statut des leads, dernière
+        action des relations) en UPDATE ensemblistes : voir myapp/deal_stages.py.
+        """
+        stages = {value for value, _label in Deal.DEAL_STAGE_CHOICES}
+        stage = request.data.get('stage')
+        if stage not in stages:
+            return Response(
+                {'error': f"stage : valeur attendue parmi {', '.join(sorted(stages))}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids or len(ids) > MAX_IDS_EN_MASSE:
+            return Response(
+                {'error': f"ids : liste de 1 à {MAX_IDS_EN_MASSE} identifiants attendue."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            ids = {int(pk) for pk in ids}
+        except (TypeError, ValueError):
+            return Response({'error': "ids : identifiants entiers attendus."}, status=status.HTTP_400_BAD_REQUEST)
+
+        modifies = changer_stage_deals(request.user, ids, stage)
+        deals = self.get_queryset().filter(id__in=modifies) if modifies else []
+        serializer = self.get_serializer(deals, many=True)
+        logger.info("Deals passés à l'étape %s: %d", stage, len(modifies), extra={'user_id': request.user.pk})
+        return Response({
+            'modifies': len(modifies),
+            'deals': serializer.data,
+            'ignores': sorted(ids - set(modifies)),
+        })
+
     # @action(detail=False, methods=['post'])
     # def create_facture_from_deals(self, request):
     #     """Create invoice from selected deals"""
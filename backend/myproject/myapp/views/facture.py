@@ -2,13 +2,27 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
-from ..models import Facture
+from django.db.models import Prefetch
+from ..models import Facture, Deal
 from ..serializers import FactureSerializer
+from ..conditional import ConditionalGetMixin
+from ..exports import ExportMixin
 
-class FactureViewSet(viewsets.ModelViewSet):
-    queryset = Facture.objects.all().select_related('commercial', 'deal')
+class FactureViewSet(ConditionalGetMixin, ExportMixin, viewsets.ModelViewSet):
+    queryset = Facture.objects.all().select_related('commercial').prefetch_related(
+        Prefetch('deals', queryset=Deal.objects.select_related('relation__lead'))
+    )
     serializer_class = FactureSerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = '-date_facture'
+    keyset_ordering_fields = ['date_facture']
+    # Deals de la facture imbriqués, avec leur lead_info
+    etag_timestamp_fields = ['updated_at', 'deals__updated_at', 'deals__relation__lead__updated_at']
+    export_fields = [
+        ('id', 'id'), ('numero_facture', 'numero_facture'), ('date_facture', 'date_facture'),
+        ('date_echeance', 'date_echeance'), ('montant_ht', 'montant_ht'), ('montant_ttc', 'montant_ttc'),
+        ('statut_paiement', 'statut_paiement'), ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+    ]
     
     def get_queryset(self):
         """Return only invoices for the current user"""
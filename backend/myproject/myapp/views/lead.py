@@ -7,14 +7,44 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, MultiPartParser
+from django.db.models import Prefetch
+from ..logging import get_logger
+from ..search import LeadSearchFilter, search_tokens
+from ..conditional import ConditionalGetMixin
+from ..exports import ExportMixin
+from ..offres import offre_active, offres_actives
+from ..lead_import import ImportFormatError, LeadImporter, read_leads
 
+logger = get_logger(__name__)
 
-class LeadViewSet(viewsets.ModelViewSet):
+
+class LeadViewSet(ConditionalGetMixin, ExportMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.OrderingFilter, filters.SearchFilter]
+    filter_backends = [filters.OrderingFilter, LeadSearchFilter]
     ordering_fields = ["declared_at", "created_at"]
     ordering = ["-declared_at"]
     search_fields = ["company_name", "contact_name", "email", "siret"]
+    keyset_ordering = "-declared_at"
+    # ?ordering= repris par la pagination keyset pour ces colonnes (index (created_by, col, id))
+    keyset_ordering_fields = ["declared_at", "created_at"]
+    # Offre courante affichée par LeadSerializer
+    etag_timestamp_fields = ["updated_at", "relations__updated_at", "relations__offre__updated_at"]
+    export_fields = [
+        ("id", "id"), ("company_name", "company_name"), ("contact_name", "contact_name"),
+        ("email", "email"), ("phone", "phone"), ("siret", "siret"), ("status", "status"),
+        ("notes", "notes"), ("declared_at", "declared_at"), ("created_at", "created_at"),
+        ("updated_at", "updated_at"),
+    ]
+
+    def get_keyset_ordering(self):
+        # Avec ?search=, résultats classés par pertinence (annotation de LeadSearchFilter)
+        if search_tokens(self.request.query_params.get("search")):
+            return "search_rank"
+        ordering = self.request.query_params.get("ordering", "").strip()
+        if ordering.lstrip("-") in self.keyset_ordering_fields:
+            return ordering
+        return self.keyset_ordering
 
     def get_serializer_class(self):
         if self.action in ['update', 'partial_update']:
@@ -23,7 +53,15 @@ class LeadViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        return Lead.objects.filter(created_by=user).order_by("-declared_at")
+        # Relations (et leur offre) chargées en une requête pour toute la page,
+        # lues par LeadSerializer.current_offre_id / offre_details
+        relations = Relation.objects.select_related('offre').order_by('id')
+        return (
+            Lead.objects.filter(created_by=user)
+            .select_related('created_by')
+            .prefetch_related(Prefetch('relations', queryset=relations, to_attr='prefetched_relations'))
+            .order_by("-declared_at")
+        )
 
     def perform_create(self, serializer):
         # Save the lead first
@@ -37,20 +75,20 @@ class LeadViewSet(viewsets.ModelViewSet):
         Automatically create a Relation when a Lead is created with selected offer
         """
         try:
-            # ✅ Get the offer from the lead instance (stored by serializer)
-            offre = getattr(lead, '_offre', None)
-            
+            # ✅ Offre choisie : relation déjà créée par LeadSerializer.create
+            if getattr(lead, '_offre', None):
+                return
+
+            # Fallback: get any active offer (catalogue en cache)
+            offre = next(iter(offres_actives()), None)
             if not offre:
-                # Fallback: get any active offer
-                offre = Offre.objects.filter(actif=True).first()
-                if not offre:
-                    # Create a default offer if none exists
-                    offre = Offre.objects.create(
-                        nom_offre="Offre Standard",
-                        plan_commission="one_shot",
-                        taux_commission=15.00,
-                        actif=True
-                    )
+                # Create a default offer if none exists
+                offre = Offre.objects.create(
+                    nom_offre="Offre Standard",
+                    plan_commission="one_shot",
+                    taux_commission=15.00,
+                    actif=True
+                )
             
             # Create the relation
             relation = Relation.objects.create(
@@ -60,16 +98,15 @@ class LeadViewSet(viewsets.ModelViewSet):
                 statut='active'
             )
             
-            print(f"✅ Relation created: {relation.id} for Lead: {lead.company_name} with Offer: {offre.nom_offre}")
+            logger.debug("Relation %s créée pour le lead %s (offre %s)", relation.id, lead.id, offre.id)
             
-        except Exception as e:
-            print(f"❌ Error creating relation for lead {lead.id}: {str(e)}")
+        except Exception:
+            logger.exception("Erreur lors de la création de la relation du lead %s", lead.id)
 
     # ✅ API endpoint for available offers
     @action(detail=False, methods=['get'], url_path='available-offres')
     def available_offres(self, request):
         """Get all active offers for the lead creation form"""
-        offres = Offre.objects.filter(actif=True)
         data = [
             {
                 'id': offre.id,
@@ -77,6 +114,46 @@ class LeadViewSet(viewsets.ModelViewSet):
                 'plan_commission': offre.plan_commission,
                 'taux_commission': float(offre.taux_commission),
             }
-            for offre in offres
+            for offre in offres_actives()
         ]
         return Response(data)
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def import_leads(self, request):
+        """
+        Import CSV / XLSX (champ `fichier`) : validation et écriture par lots,
+        rapport d'erreurs par ligne. Options : offre_id, mise_a_jour=true
+        (met à jour les leads existants du commercial), batch_size.
+        """
+        fichier = request.FILES.get('fichier')
+        if fichier is None:
+            return Response({'error': 'Aucun fichier fourni'}, status=status.HTTP_400_BAD_REQUEST)
+        offre = None
+        if request.data.get('offre_id'):
+            try:
+                offre = offre_active(int(request.data['offre_id']))
+            except (TypeError, ValueError):
+                offre = None
+            if offre is None:
+                return Response({'offre_id': ['Offre inconnue ou inactive']}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            batch_size = min(max(int(request.data.get('batch_size', 1000)), 1), 5000)
+        except (TypeError, ValueError):
+            batch_size = 1000
+
+        importer = LeadImporter(
+            request.user,
+            offre=offre,
+            update_existing=request.data.get('mise_a_jour', '').lower() in ('1', 'true', 'oui'),
+            batch_size=batch_size,
+        )
+        try:
+            # fichier.file : flux binaire (en mémoire ou fichier temporaire selon la taille)
+            report = importer.run(read_leads(fichier.file, fichier.name))
+        except ImportFormatError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        logger.info(
+            "Import de leads: %d ligne(s), %d créé(s), %d erreur(s)",
+            report['lignes'], report['crees'], report['nb_erreurs'], extra={'user_id': request.user.pk},
+        )
+        return Response(report)
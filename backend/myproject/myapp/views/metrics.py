@@ -0,0 +1,15 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from ..metrics import LATENCY_BUCKETS_MS, registry
+
+@api_view(["GET", "DELETE"])
+@permission_classes([IsAdminUser])
+def request_metrics(request):
+    # Agrégats du processus courant uniquement (un par worker gunicorn / runserver)
+    if request.method == "DELETE":
+        registry.reset()
+    return Response({
+        "latency_buckets_ms": list(LATENCY_BUCKETS_MS),
+        "views": registry.snapshot(),
+    })
@@ -1,8 +1,11 @@
 from rest_framework import viewsets, permissions
 from ..models import Offre
 from ..serializers import OffreSerializer
+from ..conditional import ConditionalGetMixin
 
-class OffreViewSet(viewsets.ModelViewSet):
+class OffreViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Offre.objects.all()
     serializer_class = OffreSerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = '-created_at'
+    keyset_ordering_fields = ['created_at']
@@ -1,13 +1,13 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from ..models import Profil
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def profile(request):
     user = request.user
-    profil = Profil.objects.get(user=user)
+    # Profil porté par le jeton (myapp/authentication.py) : pas de requête
+    profil = user.profil
     return Response({
         "email": user.email,
         "username": user.username,
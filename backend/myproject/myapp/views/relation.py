@@ -5,6 +5,8 @@ from ..serializers import RelationSerializer
 class RelationViewSet(viewsets.ModelViewSet):
     serializer_class = RelationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = '-created_at'
+    keyset_ordering_fields = ['created_at']
 
     def get_queryset(self):
         user = self.request.user
@@ -1,21 +1,38 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum
 from rest_framework.response import Response
-from ..models import Lead, Deal
+from ..models import CommercialStats
+from ..commercial_stats import refresh_commercial_stats
+from ..logging import get_logger
+
+logger = get_logger(__name__)
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def dashboard_stats(request):
     user = request.user
-    print("===>", user)
-    total_leads = Lead.objects.filter(created_by=user).count()
-    active_deals = Deal.objects.filter(relation__commercial=user, stage__in=["prospection", "négociation"]).count()
-    won_deals = Deal.objects.filter(relation__commercial=user, stage="gagne").count()
-    # total_commissions = Commission.objects.filter(commercial=user).aggregate(total=Sum('montant_commission'))['total'] or 0
+    logger.debug("Statistiques du dashboard", extra={'user_id': user.pk})
+    # Compteurs dénormalisés (maintenus par signaux) : une lecture par clé primaire
+    stats = CommercialStats.objects.filter(pk=user.pk).first()
+    if stats is None:
+        stats = refresh_commercial_stats(user.pk)
 
     return Response({
-        "totalLeads": total_leads,
-        "activeDeals": active_deals,
-        "wonDeals": won_deals,
-    })
+        "totalLeads": stats.total_leads,
+        "activeDeals": stats.active_deals,
+        "wonDeals": stats.deals_gagne,
+        "leadsByStatus": {
+            "nouveau": stats.leads_nouveau,
+            "en_cours": stats.leads_en_cours,
+            "converti": stats.leads_converti,
+            "perdu": stats.leads_perdu,
+        },
+        "dealsByStage": {
+            "prospection": stats.deals_prospection,
+            "negociation": stats.deals_negociation,
+            "gagne": stats.deals_gagne,
+            "perdu": stats.deals_perdu,
+        },
+        "wonAmount": stats.montant_gagne,
+        "pendingCommission": stats.commission_en_attente,
+    })
\ No newline at end of file
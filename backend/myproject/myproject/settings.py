@@ -1,6 +1,10 @@
 from pathlib import Path
 from datetime import timedelta
+from decimal import Decimal
 import os
+import sys
+
+from corsheaders.defaults import default_headers
 
 # BASE DIR
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -27,6 +31,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "myapp.metrics.RequestMetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.security.SecurityMiddleware",
@@ -59,13 +64,64 @@ TEMPLATES = [
 ]
 
 # DATABASE (يمكنك تعديلها لاحقًا)
-DATABASES = {
+# DB_ENGINE=postgresql en production (pilote psycopg2), SQLite par défaut pour le développement
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite3")
+
+if DB_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DB_NAME", "crm"),
+            "USER": os.environ.get("DB_USER", "crm"),
+            "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+            "HOST": os.environ.get("DB_HOST", "127.0.0.1"),
+            "PORT": os.environ.get("DB_PORT", "5432"),
+            # Connexions persistantes : réutilisées entre requêtes pendant CONN_MAX_AGE secondes,
+            # vérifiées avant réutilisation (redémarrage du serveur, coupure réseau)
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+            "CONN_HEALTH_CHECKS": True,
+            # Derrière PgBouncer en mode transaction, les curseurs serveur (queryset.iterator())
+            # ne survivent pas à la transaction : DB_DISABLE_SERVER_SIDE_CURSORS=1
+            "DISABLE_SERVER_SIDE_CURSORS": os.environ.get("DB_DISABLE_SERVER_SIDE_CURSORS", "") == "1",
+            "OPTIONS": {
+                "connect_timeout": int(os.environ.get("DB_CONNECT_TIMEOUT", "5")),
+                "sslmode": os.environ.get("DB_SSLMODE", "prefer"),
+                # Une requête bloquée ne doit pas immobiliser un worker indéfiniment
+                "options": f"-c statement_timeout={int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', '30000'))}",
+            },
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            # Backend SQLite du projet : WAL et PRAGMA réglés à la connexion (voir myproject/sqlite3/base.py)
+            "ENGINE": "myproject.sqlite3",
+            # db.sqlite3 (versionnée) passe en WAL à la première connexion : voir myproject/sqlite3/base.py
+            "NAME": os.environ.get("DB_NAME", BASE_DIR / "db.sqlite3"),
+            "OPTIONS": {
+                # Attente maximale d'un verrou d'écriture, en secondes
+                "timeout": int(os.environ.get("DB_BUSY_TIMEOUT", "20")),
+            },
+            # Base de test sur fichier (et non en mémoire partagée) pour que les tests
+            # concurrents attendent les verrous SQLite au lieu d'échouer immédiatement
+            "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
+        }
+    }
+
+# CACHE : partagé par les workers (gunicorn) d'une même machine. Sert aux numéros de
+# version du catalogue d'offres (myapp/offres.py) : le catalogue lui-même reste en mémoire
+# dans chaque processus. Memcached / Redis via CACHE_BACKEND et CACHE_LOCATION.
+# Fichiers sous BASE_DIR/.cache (ignoré par git) : propres à ce checkout. Les tests
+# utilisent un LocMemCache (voir TEST_RUNNER).
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", str(BASE_DIR / ".cache")),
     }
 }
 
+TEST_RUNNER = "myapp.test_runner.CrmTestRunner"
+
 # PASSWORD VALIDATION
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -93,17 +149,24 @@ MEDIA_ROOT = BASE_DIR / "media"
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:8080",
 ]
+# GET conditionnels (myapp/conditional.py) : If-None-Match envoyé, ETag lu par le frontend
+CORS_ALLOW_HEADERS = (*default_headers, "if-none-match")
+CORS_EXPOSE_HEADERS = ["ETag"]
 
 # DJANGO REST FRAMEWORK + JWT
 # settings.py
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # ✅
+        # JWT sans lecture de auth_user par requête (champs signés, voir myapp/authentication.py)
+        'myapp.authentication.StatelessJWTAuthentication',  # ✅
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',  # ✅
     ],
+    # Pagination par curseur (keyset) : chaque vue précise sa colonne via `keyset_ordering`
+    'DEFAULT_PAGINATION_CLASS': 'myapp.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
     'DATETIME_INPUT_FORMATS': [
         "%Y-%m-%dT%H:%M:%S.%fZ",  # Accept 2025-11-21T09:21:00.000Z
         "%Y-%m-%dT%H:%M:%S",      # Accept 2025-11-21T09:21:00
@@ -119,6 +182,62 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "ROTATE_REFRESH_TOKENS": False,
     "BLACKLIST_AFTER_ROTATION": False,
+    # Jetons avec les champs de l'utilisateur et du profil (myapp/authentication.py)
+    "TOKEN_OBTAIN_SERIALIZER": "myapp.authentication.CrmTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "myapp.authentication.CrmTokenRefreshSerializer",
 }
+# Durée (s) pendant laquelle l'état d'un compte actif (champs signés des jetons) est servi depuis le cache
+AUTH_USER_CACHE_TTL = int(os.environ.get("AUTH_USER_CACHE_TTL", "60"))
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# FACTURATION
+# Taux de TVA en pour-cent appliqué au total HT des factures (voir myapp/taxes.py)
+TAUX_TVA = Decimal(os.environ.get("TAUX_TVA", "20.00"))
+
+# LOGGING
+# Production : LOG_LEVEL=WARNING. DEBUG pour un endpoint précis :
+# LOG_DEBUG_LOGGERS="myapp.views.deal,myapp.serializers". LOG_SAMPLE_RATE échantillonne DEBUG/INFO.
+# Tests (manage.py test) : WARNING par défaut, les logs INFO se vérifient avec assertLogs.
+TESTING = sys.argv[1:2] == ["test"]
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO" if DEBUG and not TESTING else "WARNING")
+LOG_DEBUG_LOGGERS = [name for name in os.environ.get("LOG_DEBUG_LOGGERS", "").split(",") if name]
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "1.0"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {
+        "sampling": {
+            "()": "myapp.logging.SamplingFilter",
+            "rate": LOG_SAMPLE_RATE,
+        },
+    },
+    "formatters": {
+        "keyvalue": {
+            "()": "myapp.logging.KeyValueFormatter",
+            "format": "%(asctime)s %(levelname)s %(name)s %(message)s",
+        },
+    },
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+            "formatter": "keyvalue",
+            "filters": ["sampling"],
+        },
+    },
+    "loggers": {
+        "myapp": {
+            "handlers": ["console"],
+            "level": LOG_LEVEL,
+            "propagate": False,
+        },
+        **{name: {"level": "DEBUG"} for name in LOG_DEBUG_LOGGERS},
+    },
+}
+
+# INSTRUMENTATION (voir myapp/metrics.py)
+# Au-delà de QUERY_BUDGET requêtes SQL, la requête est signalée (WARNING + compteur over_budget).
+# QUERY_BUDGETS surcharge le budget pour une vue donnée : {"deal-commission-ledger": 10}
+QUERY_BUDGET = int(os.environ.get("QUERY_BUDGET", "30"))
+QUERY_BUDGETS = {}
@@ -0,0 +1,57 @@
+"""
+Backend SQLite du projet (ENGINE "myproject.sqlite3") pour un déploiement mono-serveur.
+
+Par rapport à django.db.backends.sqlite3 :
+- PRAGMA appliqués à chaque connexion (WAL : les lectures ne bloquent plus
+  pendant une écriture ; synchronous=NORMAL ; cache et mmap plus grands) ;
+- OPTIONS["transaction_mode"] et DatabaseWrapper.begin_mode pour ouvrir une
+  transaction en BEGIN IMMEDIATE : le verrou d'écriture est pris dès le début,
+  une transaction concurrente attend (busy timeout) au lieu d'échouer avec
+  "database is locked" lorsqu'elle passe de la lecture à l'écriture.
+  Voir myapp.transactions.atomic_write.
+
+journal_mode=WAL est persistant : la première connexion convertit le fichier,
+y compris la base de développement versionnée db.sqlite3, qui apparaît alors
+modifiée dans git (fichiers -wal / -shm ignorés). Pour la garder intacte :
+DB_NAME vers une copie locale, ou OPTIONS["pragmas"] = {"journal_mode": "DELETE"}.
+
+Django 5.1 offre nativement OPTIONS "init_command" / "transaction_mode" :
+ce backend pourra alors être remplacé par django.db.backends.sqlite3.
+"""
+from django.db.backends.sqlite3 import base
+
+# Le busy timeout vient de OPTIONS["timeout"] (secondes), passé à sqlite3.connect()
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,  # en Kio (négatif) : ~64 Mo
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+}
+CUSTOM_OPTIONS = ("pragmas", "transaction_mode")
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Mode du prochain BEGIN (DEFERRED, IMMEDIATE, EXCLUSIVE), prioritaire sur OPTIONS
+        self.begin_mode = None
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for option in CUSTOM_OPTIONS:
+            params.pop(option, None)
+        return params
+
+    def pragmas(self):
+        return {**DEFAULT_PRAGMAS, **self.settings_dict["OPTIONS"].get("pragmas", {})}
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas().items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.begin_mode or self.settings_dict["OPTIONS"].get("transaction_mode")
+        self.cursor().execute(f"BEGIN {mode}" if mode else "BEGIN")
@@ -0,0 +1,21 @@
+import { Loader2 } from "lucide-react";
+import { Button } from "@/components/ui/button";
+
+interface LoadMoreButtonProps {
+  hasMore: boolean;
+  loading: boolean;
+  onClick: () => void;
+}
+
+// « Charger plus » sous une liste paginée par curseur ; masqué une fois la dernière page affichée
+export const LoadMoreButton = ({ hasMore, loading, onClick }: LoadMoreButtonProps) => {
+  if (!hasMore) return null;
+  return (
+    <div className="flex justify-center pt-2">
+      <Button variant="outline" onClick={onClick} disabled={loading}>
+        {loading && <Loader2 className="mr-2 h-4 w-4 animate-spin" />}
+        Charger plus
+      </Button>
+    </div>
+  );
+};
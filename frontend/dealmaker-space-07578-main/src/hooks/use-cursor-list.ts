@@ -0,0 +1,32 @@
+import { useCallback, useState } from "react";
+import { fetchPage } from "@/services/api";
+
+// Liste paginée par curseur (pagination keyset de l'API) : load() affiche la première
+// page, loadMore() ajoute la suivante en suivant le lien `next`.
+// Les erreurs sont propagées : chaque écran garde son propre message.
+export function useCursorList<T>() {
+  const [items, setItems] = useState<T[]>([]);
+  const [next, setNext] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  const load = useCallback(async (url: string, params?: Record<string, unknown>) => {
+    const page = await fetchPage<T>(url, params);
+    setItems(page.results);
+    setNext(page.next);
+    return page.results;
+  }, []);
+
+  const loadMore = useCallback(async () => {
+    if (!next) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchPage<T>(next);
+      setItems((prev) => [...prev, ...page.results]);
+      setNext(page.next);
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [next]);
+
+  return { items, setItems, hasMore: next !== null, loadingMore, load, loadMore };
+}
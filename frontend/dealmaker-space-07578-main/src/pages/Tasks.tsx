@@ -3,11 +3,14 @@ import Layout from "@/components/Layout";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
 import { Button } from "@/components/ui/button";
+import { Checkbox } from "@/components/ui/checkbox";
 import { Calendar, Clock, CheckCircle2, XCircle, Phone, Mail, Users, FileText } from "lucide-react";
 import { toast } from "sonner";
 import { format } from "date-fns";
 import { fr } from "date-fns/locale";
 import apiClient from "@/services/api";
+import { useCursorList } from "@/hooks/use-cursor-list";
+import { LoadMoreButton } from "@/components/LoadMoreButton";
 
 interface Action {
   id: string;
@@ -26,9 +29,21 @@ interface Action {
   commercial_name?: string;
 }
 
+const BULK_STATUS_MAX_IDS = 500;
+
+interface BulkStatusResponse {
+  modifiees: number;
+  actions: Action[];
+  ignorees: number[];
+}
+
 const Tasks = () => {
-  const [actions, setActions] = useState<Action[]>([]);
+  // Première page des actions en attente, la suite via « Charger plus » (pagination par curseur)
+  const actionList = useCursorList<Action>();
+  const actions = actionList.items;
   const [loading, setLoading] = useState(true);
+  const [selectedIds, setSelectedIds] = useState<string[]>([]);
+  const [updating, setUpdating] = useState(false);
 
   useEffect(() => {
     loadActions();
@@ -36,10 +51,8 @@ const Tasks = () => {
 
   const loadActions = async () => {
     try {
-      const response = await apiClient.get('/actions/');
-      // Filtrer pour n'afficher que les actions en attente
-      const pendingActions = response.data.filter((action: Action) => action.statut === 'en_attente');
-      setActions(pendingActions);
+      // Seules les actions en attente sont affichées
+      await actionList.load('/actions/', { statut: 'en_attente' });
     } catch (error: any) {
       console.error("Error loading actions:", error);
       toast.error(error.response?.data?.error || "Erreur lors du chargement des actions");
@@ -48,28 +61,62 @@ const Tasks = () => {
     }
   };
 
-  const handleToggleStatus = async (actionId: string, newStatus: string) => {
+  // Un seul appel pour une ou plusieurs actions : la liste n'est pas rechargée
+  const changeStatus = async (actionIds: string[], newStatus: "terminee" | "annulee") => {
+    if (actionIds.length === 0) return;
+    setUpdating(true);
     try {
-      if (newStatus === 'terminee') {
-        // Utiliser l'endpoint spécifique pour marquer comme terminée
-        await apiClient.post(`/actions/${actionId}/marquer_terminee/`);
-      } else {
-        // Mettre à jour le statut normalement
-        await apiClient.patch(`/actions/${actionId}/`, { 
-          statut: newStatus 
+      const endpoint = newStatus === "terminee" ? "marquer_terminees" : "marquer_annulees";
+      let modifiees = 0;
+      let ignorees = 0;
+      // L'API accepte BULK_STATUS_MAX_IDS ids par appel
+      for (let start = 0; start < actionIds.length; start += BULK_STATUS_MAX_IDS) {
+        const { data } = await apiClient.post<BulkStatusResponse>(`/actions/${endpoint}/`, {
+          ids: actionIds.slice(start, start + BULK_STATUS_MAX_IDS).map(Number),
         });
+        modifiees += data.modifiees;
+        ignorees += data.ignorees.length;
       }
 
-      toast.success(
-        newStatus === "terminee" ? "Action marquée comme terminée" : "Action annulée"
-      );
-      loadActions();
+      // Modifiées ou ignorées (déjà traitées, supprimées) : plus en attente
+      const done = new Set(actionIds);
+      actionList.setItems((prev) => prev.filter((action) => !done.has(String(action.id))));
+      setSelectedIds((prev) => prev.filter((id) => !done.has(id)));
+
+      const label = newStatus === "terminee" ? "terminée(s)" : "annulée(s)";
+      toast.success(`${modifiees} action(s) ${label}`);
+      if (ignorees > 0) {
+        toast.info(`${ignorees} action(s) déjà traitée(s) ou introuvable(s)`);
+      }
+    } catch (error: any) {
+      console.error("Error updating actions:", error);
+      toast.error(error.response?.data?.error || "Erreur lors de la mise à jour des actions");
+    } finally {
+      setUpdating(false);
+    }
+  };
+
+  const loadMoreActions = async () => {
+    try {
+      await actionList.loadMore();
     } catch (error: any) {
-      console.error("Error updating action:", error);
-      toast.error(error.response?.data?.error || "Erreur lors de la mise à jour de l'action");
+      console.error("Error loading actions:", error);
+      toast.error(error.response?.data?.error || "Erreur lors du chargement des actions");
     }
   };
 
+  const toggleSelected = (actionId: string) => {
+    setSelectedIds((prev) =>
+      prev.includes(actionId) ? prev.filter((id) => id !== actionId) : [...prev, actionId]
+    );
+  };
+
+  const allSelected = actions.length > 0 && selectedIds.length === actions.length;
+
+  const toggleAll = () => {
+    setSelectedIds(allSelected ? [] : actions.map((action) => String(action.id)));
+  };
+
   const getActionTypeLabel = (type: string) => {
     const types: { [key: string]: string } = {
       call: "Appel",
@@ -132,6 +179,40 @@ const Tasks = () => {
           </p>
         </div>
 
+        {actions.length > 0 && (
+          <div className="flex flex-wrap items-center gap-4">
+            <div className="flex items-center gap-2">
+              <Checkbox
+                checked={allSelected}
+                onCheckedChange={toggleAll}
+                aria-label="Tout sélectionner"
+              />
+              <span className="text-sm text-muted-foreground">
+                {selectedIds.length > 0 ? `${selectedIds.length} sélectionnée(s)` : "Tout sélectionner"}
+              </span>
+            </div>
+            <Button
+              size="sm"
+              variant="outline"
+              disabled={selectedIds.length === 0 || updating}
+              onClick={() => changeStatus(selectedIds, "terminee")}
+            >
+              <CheckCircle2 className="h-4 w-4 mr-2" />
+              Terminer la sélection
+            </Button>
+            <Button
+              size="sm"
+              variant="ghost"
+              className="hover:bg-red-500 hover:text-white"
+              disabled={selectedIds.length === 0 || updating}
+              onClick={() => changeStatus(selectedIds, "annulee")}
+            >
+              <XCircle className="h-4 w-4 mr-2" />
+              Annuler la sélection
+            </Button>
+          </div>
+        )}
+
         {actions.length === 0 ? (
           <Card>
             <CardContent className="p-12 text-center">
@@ -144,20 +225,28 @@ const Tasks = () => {
               <Card key={action.id} className={isOverdue(action.date_echeance) ? "border-destructive" : ""}>
                 <CardHeader>
                   <div className="flex items-start justify-between">
-                    <div className="space-y-1">
-                      <CardTitle className="text-xl">{action.titre}</CardTitle>
-                      <div className="flex items-center gap-2 text-sm text-muted-foreground">
-                        {action.lead_company && (
-                          <>
-                            <span className="font-medium">
-                              {action.lead_company}
-                            </span>
-                            <span>•</span>
-                          </>
-                        )}
-                        <div className="flex items-center gap-2">
-                          {getActionTypeIcon(action.action_type)}
-                          <span>{getActionTypeLabel(action.action_type)}</span>
+                    <div className="flex items-start gap-3">
+                      <Checkbox
+                        className="mt-1.5"
+                        checked={selectedIds.includes(String(action.id))}
+                        onCheckedChange={() => toggleSelected(String(action.id))}
+                        aria-label={`Sélectionner ${action.titre}`}
+                      />
+                      <div className="space-y-1">
+                        <CardTitle className="text-xl">{action.titre}</CardTitle>
+                        <div className="flex items-center gap-2 text-sm text-muted-foreground">
+                          {action.lead_company && (
+                            <>
+                              <span className="font-medium">
+                                {action.lead_company}
+                              </span>
+                              <span>•</span>
+                            </>
+                          )}
+                          <div className="flex items-center gap-2">
+                            {getActionTypeIcon(action.action_type)}
+                            <span>{getActionTypeLabel(action.action_type)}</span>
+                          </div>
                         </div>
                       </div>
                     </div>
@@ -198,7 +287,8 @@ const Tasks = () => {
                       <Button
                         size="sm"
                         variant="outline"
-                        onClick={() => handleToggleStatus(action.id, "terminee")}
+                        disabled={updating}
+                        onClick={() => changeStatus([String(action.id)], "terminee")}
                       >
                         <CheckCircle2 className="h-4 w-4 mr-2" />
                         Marquer comme terminée
@@ -207,7 +297,8 @@ const Tasks = () => {
                         size="sm"
                         variant="ghost"
                         className="hover:bg-red-500 hover:text-white"
-                        onClick={() => handleToggleStatus(action.id, "annulee")}
+                        disabled={updating}
+                        onClick={() => changeStatus([String(action.id)], "annulee")}
                       >
                         <XCircle className="h-4 w-4 mr-2" />
                         Annuler
@@ -219,6 +310,7 @@ const Tasks = () => {
             ))}
           </div>
         )}
+        <LoadMoreButton hasMore={actionList.hasMore} loading={actionList.loadingMore} onClick={loadMoreActions} />
       </div>
     </Layout>
   );
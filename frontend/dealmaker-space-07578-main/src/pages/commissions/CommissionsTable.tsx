@@ -1,6 +1,7 @@
 import { useState, useRef } from "react";
-import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
-import apiClient from "@/services/api";
+import { useInfiniteQuery, useMutation, useQueryClient } from "@tanstack/react-query";
+import apiClient, { CursorPage, fetchPage } from "@/services/api";
+import { LoadMoreButton } from "@/components/LoadMoreButton";
 import {
   Table,
   TableBody,
@@ -16,7 +17,7 @@ import { Badge } from "@/components/ui/badge";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import { useToast } from "@/components/ui/use-toast";
-import { Deal } from "../deals/types"; // Import your existing types
+import { CommissionLedgerPage, Deal } from "../deals/types"; // Import your existing types
 
 // Define Facture interface based on your backend, including the new file field
 interface Facture {
@@ -34,15 +35,16 @@ interface Facture {
 }
 
 // Fetch commissions (won deals without invoices)
-const fetchCommissions = async (): Promise<Deal[]> => {
-  const response = await apiClient.get("/deals/commissions/");
-  return response.data.results || response.data;
+// Grand livre calculé côté serveur : lignes paginées par curseur, totaux et sous-totaux
+// renvoyés avec la première page
+const fetchCommissions = async ({ pageParam }: { pageParam: string }): Promise<CommissionLedgerPage> => {
+  const response = await apiClient.get<CommissionLedgerPage>(pageParam);
+  return response.data;
 };
 
-// Fetch invoices
-const fetchFactures = async (): Promise<Facture[]> => {
-  const response = await apiClient.get("/factures/");
-  return response.data.results || response.data;
+// Factures : une page par appel (première page, puis lien `next` du curseur)
+const fetchFactures = async ({ pageParam }: { pageParam: string }): Promise<CursorPage<Facture>> => {
+  return fetchPage<Facture>(pageParam);
 };
 
 // Create invoice from selected deals
@@ -63,16 +65,38 @@ function CommissionsPage() {
   const [uploadingFactureId, setUploadingFactureId] = useState<number | null>(null);
 
   // Fetch commissions data
-  const { data: deals, isLoading: dealsLoading, isError: dealsError, error } = useQuery<Deal[]>({
+  const {
+    data: ledgerPages,
+    isLoading: dealsLoading,
+    isError: dealsError,
+    error,
+    hasNextPage: hasMoreDeals,
+    fetchNextPage: fetchMoreDeals,
+    isFetchingNextPage: fetchingMoreDeals,
+  } = useInfiniteQuery({
     queryKey: ["commissions"],
     queryFn: fetchCommissions,
+    initialPageParam: "/deals/commission_ledger/",
+    getNextPageParam: (lastPage) => lastPage.next,
   });
+  const deals = ledgerPages?.pages.flatMap((page) => page.results);
+  // Agrégats du serveur, sur tout le grand livre (pas seulement les lignes chargées)
+  const ledger = ledgerPages?.pages[0];
 
   // Fetch invoices data
-  const { data: factures, isLoading: facturesLoading } = useQuery<Facture[]>({
+  const {
+    data: facturePages,
+    isLoading: facturesLoading,
+    hasNextPage: hasMoreFactures,
+    fetchNextPage: fetchMoreFactures,
+    isFetchingNextPage: fetchingMoreFactures,
+  } = useInfiniteQuery({
     queryKey: ["factures"],
     queryFn: fetchFactures,
+    initialPageParam: "/factures/",
+    getNextPageParam: (lastPage) => lastPage.next,
   });
+  const factures = facturePages?.pages.flatMap((page) => page.results);
 
   // File upload mutation
   const uploadFileMutation = useMutation({
@@ -182,9 +206,10 @@ function CommissionsPage() {
     return new Date(dateString).toLocaleDateString("fr-FR");
   };
 
-  // Format currency
-  const formatCurrency = (amount: number | null) => {
+  // Format currency (les décimaux de l'API arrivent en chaînes)
+  const formatCurrency = (amount: number | string | null) => {
     if (amount === null) return "N/A";
+    if (typeof amount === "string") amount = parseFloat(amount);
     return new Intl.NumberFormat("fr-FR", { 
       style: "currency", 
       currency: "EUR" 
@@ -213,14 +238,6 @@ function CommissionsPage() {
     }
   };
 
-  // Get company name from deal
-  const getCompanyName = (deal: Deal): string => {
-    if (deal.nom_entreprise) return deal.nom_entreprise;
-    if (deal.lead_info?.company_name) return deal.lead_info.company_name;
-    if (deal.relation_info?.lead_company) return deal.relation_info.lead_company;
-    return "N/A";
-  };
-
   // Check if all eligible deals are selected
   const isAllSelected = dealsWithClientPayment.length > 0 && 
     selectedDeals.length === dealsWithClientPayment.length;
@@ -268,6 +285,18 @@ function CommissionsPage() {
                   <CardDescription>
                     Sélectionnez les deals avec paiement client pour créer une facture.
                   </CardDescription>
+                  {ledger?.totaux && (
+                    <div className="flex flex-wrap gap-2 mt-2">
+                      <Badge variant="outline">{ledger.totaux.nb_deals} deal(s)</Badge>
+                      <Badge variant="outline">Montant : {formatCurrency(ledger.totaux.montant)}</Badge>
+                      <Badge>Commission : {formatCurrency(ledger.totaux.commission)}</Badge>
+                      {Object.entries(ledger.par_plan ?? {}).map(([plan, sousTotal]) => (
+                        <Badge key={plan} variant="secondary">
+                          {plan === "durable" ? "Durable" : "One-shot"} : {formatCurrency(sousTotal.commission)}
+                        </Badge>
+                      ))}
+                    </div>
+                  )}
                 </div>
                 <Button 
                   onClick={handleCreateFacture} 
@@ -302,6 +331,7 @@ function CommissionsPage() {
                       <TableHead>Remporté le</TableHead>
                       <TableHead>Montant</TableHead>
                       <TableHead>Taux Commission</TableHead>
+                      <TableHead>Commission</TableHead>
                       <TableHead>Paiement Client</TableHead>
                       <TableHead>Paiement Commission</TableHead>
                     </TableRow>
@@ -329,7 +359,7 @@ function CommissionsPage() {
                             {deal.nom_deal}
                           </TableCell>
                           <TableCell className={!hasPayment ? "text-muted-foreground" : ""}>
-                            {getCompanyName(deal)}
+                            {deal.nom_entreprise || "N/A"}
                           </TableCell>
                           <TableCell>
                             <Badge 
@@ -350,9 +380,12 @@ function CommissionsPage() {
                               variant="outline"
                               className={!hasPayment ? "opacity-50" : ""}
                             >
-                              {deal.taux_commission !== null ? `${deal.taux_commission}%` : "N/A"}
+                              {`${parseFloat(deal.taux_commission)}%`}
                             </Badge>
                           </TableCell>
+                          <TableCell className={!hasPayment ? "text-muted-foreground" : ""}>
+                            {formatCurrency(deal.commission)}
+                          </TableCell>
                           <TableCell className={!hasPayment ? "text-muted-foreground" : ""}>
                             {hasPayment ? (
                               formatDate(deal.date_paiment_client)
@@ -368,7 +401,7 @@ function CommissionsPage() {
                     })}
                     {deals?.length === 0 && (
                       <TableRow>
-                        <TableCell colSpan={9} className="text-center py-8 text-muted-foreground">
+                        <TableCell colSpan={10} className="text-center py-8 text-muted-foreground">
                           Aucun deal gagné disponible pour la commission
                         </TableCell>
                       </TableRow>
@@ -376,8 +409,52 @@ function CommissionsPage() {
                   </TableBody>
                 </Table>
               )}
+              <LoadMoreButton
+                hasMore={hasMoreDeals}
+                loading={fetchingMoreDeals}
+                onClick={() => fetchMoreDeals()}
+              />
             </CardContent>
           </Card>
+
+          {ledger?.groupes && ledger.groupes.length > 0 && (
+            <Card>
+              <CardHeader>
+                <CardTitle>Sous-totaux par offre et par mois</CardTitle>
+                <CardDescription>Calculés par le serveur sur l'ensemble des deals du grand livre.</CardDescription>
+              </CardHeader>
+              <CardContent>
+                <Table>
+                  <TableHeader>
+                    <TableRow>
+                      <TableHead>Mois</TableHead>
+                      <TableHead>Offre</TableHead>
+                      <TableHead>Plan</TableHead>
+                      <TableHead>Deals</TableHead>
+                      <TableHead>Montant</TableHead>
+                      <TableHead>Commission</TableHead>
+                    </TableRow>
+                  </TableHeader>
+                  <TableBody>
+                    {ledger.groupes.map((groupe) => (
+                      <TableRow key={`${groupe.mois}-${groupe.offre_id}`}>
+                        <TableCell>
+                          {groupe.mois
+                            ? new Date(groupe.mois).toLocaleDateString("fr-FR", { month: "long", year: "numeric" })
+                            : "N/A"}
+                        </TableCell>
+                        <TableCell>{groupe.offre_nom || "N/A"}</TableCell>
+                        <TableCell>{groupe.plan_commission === "durable" ? "Durable" : "One-shot"}</TableCell>
+                        <TableCell>{groupe.nb_deals}</TableCell>
+                        <TableCell>{formatCurrency(groupe.montant)}</TableCell>
+                        <TableCell>{formatCurrency(groupe.commission)}</TableCell>
+                      </TableRow>
+                    ))}
+                  </TableBody>
+                </Table>
+              </CardContent>
+            </Card>
+          )}
         </TabsContent>
 
         {/* Factures Tab */}
@@ -462,6 +539,11 @@ function CommissionsPage() {
                   </TableBody>
                 </Table>
               )}
+              <LoadMoreButton
+                hasMore={hasMoreFactures}
+                loading={fetchingMoreFactures}
+                onClick={() => fetchMoreFactures()}
+              />
             </CardContent>
           </Card>
         </TabsContent>
@@ -1,8 +1,9 @@
 
 
 import { useRef, useState } from "react";
-import { useQuery, useQueryClient } from "@tanstack/react-query";
-import apiClient from "@/services/api";
+import { useInfiniteQuery, useQueryClient } from "@tanstack/react-query";
+import apiClient, { CursorPage, fetchPage } from "@/services/api";
+import { LoadMoreButton } from "@/components/LoadMoreButton";
 import {
   Table,
   TableBody,
@@ -25,9 +26,9 @@ interface Facture {
   fichier: string | null;
 }
 
-const fetchFactures = async (): Promise<Facture[]> => {
-  const response = await apiClient.get("/factures/");
-  return response.data.results || response.data;
+// Une page de factures : première page, puis lien `next` du curseur
+const fetchFactures = async ({ pageParam }: { pageParam: string }): Promise<CursorPage<Facture>> => {
+  return fetchPage<Facture>(pageParam);
 };
 
 function FactureRow({ facture }: { facture: Facture }) {
@@ -103,10 +104,13 @@ function FactureRow({ facture }: { facture: Facture }) {
 
 
 function FacturesTable() {
-  const { data: factures, isLoading, isError, error } = useQuery<Facture[]>({
+  const { data, isLoading, isError, error, hasNextPage, fetchNextPage, isFetchingNextPage } = useInfiniteQuery({
     queryKey: ["factures"],
     queryFn: fetchFactures,
+    initialPageParam: "/factures/",
+    getNextPageParam: (lastPage) => lastPage.next,
   });
+  const factures = data?.pages.flatMap((page) => page.results);
 
   if (isLoading) {
     return (
@@ -123,6 +127,7 @@ function FacturesTable() {
   }
 
   return (
+    <>
     <Table>
       <TableHeader>
         <TableRow>
@@ -140,6 +145,8 @@ function FacturesTable() {
         ))}
       </TableBody>
     </Table>
+    <LoadMoreButton hasMore={hasNextPage} loading={isFetchingNextPage} onClick={() => fetchNextPage()} />
+    </>
   );
 }
 
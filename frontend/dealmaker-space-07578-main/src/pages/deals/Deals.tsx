@@ -3,13 +3,16 @@ import Layout from "@/components/Layout";
 import { Button } from "@/components/ui/button";
 import { toast } from "sonner";
 import apiClient from "@/services/api";
+import { useCursorList } from "@/hooks/use-cursor-list";
+import { LoadMoreButton } from "@/components/LoadMoreButton";
 import { Deal, Lead } from "./types";
 import { CreateDealDialog } from "./components/CreateDealDialog";
 import { DealPipeline } from "./components/DealPipeline";
 import { Plus } from "lucide-react";
 
 const Deals = () => {
-  const [deals, setDeals] = useState<Deal[]>([]);
+  // Première page du pipeline, la suite via « Charger plus » (pagination par curseur)
+  const dealList = useCursorList<Deal>();
   const [leads, setLeads] = useState<Lead[]>([]);
   const [loading, setLoading] = useState(true);
   const [dialogOpen, setDialogOpen] = useState(false);
@@ -21,8 +24,7 @@ const Deals = () => {
 
   const loadDeals = async () => {
     try {
-      const response = await apiClient.get('/deals/');
-      setDeals(response.data);
+      await dealList.load('/deals/');
     } catch (error: any) {
       console.error('Error loading deals:', error);
       toast.error(error.response?.data?.error || "Erreur lors du chargement des deals");
@@ -41,6 +43,15 @@ const Deals = () => {
     }
     };
 
+  const loadMoreDeals = async () => {
+    try {
+      await dealList.loadMore();
+    } catch (error: any) {
+      console.error('Error loading deals:', error);
+      toast.error(error.response?.data?.error || "Erreur lors du chargement des deals");
+    }
+  };
+
   if (loading) {
     return (
       <Layout>
@@ -74,7 +85,8 @@ const Deals = () => {
           </CreateDealDialog>
         </div>
 
-        <DealPipeline deals={deals} onDealMoved={loadDeals} />
+        <DealPipeline deals={dealList.items} onDealMoved={loadDeals} />
+        <LoadMoreButton hasMore={dealList.hasMore} loading={dealList.loadingMore} onClick={loadMoreDeals} />
       </div>
     </Layout>
   );
@@ -1,6 +1,7 @@
 import { useState } from "react";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
+import { Checkbox } from "@/components/ui/checkbox";
 import { Building, Euro, Percent, FileText, NotebookTabs, CalendarFold, ChevronDown, ChevronUp, User, Mail } from "lucide-react";
 import { Deal } from "../types";
 import { getStageColor, getTypeDealLabel, getPlanCommissionLabel, calculateCommission } from "../utils/dealUtils";
@@ -8,11 +9,13 @@ import { getStageColor, getTypeDealLabel, getPlanCommissionLabel, calculateCommi
 interface DealCardProps {
   deal: Deal;
   draggedDeal: string | null;
+  selected: boolean;
+  onToggleSelect: (dealId: string) => void;
   onDragStart: (dealId: string) => void;
   onDragEnd: () => void;
 }
 
-export const DealCard = ({ deal, draggedDeal, onDragStart, onDragEnd }: DealCardProps) => {
+export const DealCard = ({ deal, draggedDeal, selected, onToggleSelect, onDragStart, onDragEnd }: DealCardProps) => {
   const [isExpanded, setIsExpanded] = useState(false);
 
   const toggleExpansion = () => {
@@ -20,7 +23,9 @@ export const DealCard = ({ deal, draggedDeal, onDragStart, onDragEnd }: DealCard
   };
 
   const planCommission = deal.plan_commission || deal.relation_info?.offre_info?.plan_commission;
-  const tauxCommission = deal.taux_commission || deal.relation_info?.offre_info?.taux_commission;
+  // Taux de l'offre : décimal reçu en chaîne
+  const tauxOffre = deal.relation_info?.offre_info?.taux_commission;
+  const tauxCommission = deal.taux_commission || (tauxOffre ? parseFloat(tauxOffre) : null);
   const commissionPotentielle = calculateCommission(deal.montant, tauxCommission);
 
   // Get lead information from the new lead_info field
@@ -36,14 +41,22 @@ export const DealCard = ({ deal, draggedDeal, onDragStart, onDragEnd }: DealCard
       onDragEnd={onDragEnd}
       className={`cursor-move transition-all border-2 ${
         draggedDeal === deal.id ? 'opacity-50' : ''
-      } ${getStageColor(deal.stage)}`}
+      } ${selected ? 'ring-2 ring-primary' : ''} ${getStageColor(deal.stage)}`}
     >
       <CardHeader 
         className="pb-3 cursor-pointer" 
         onClick={toggleExpansion}
       >
         <div className="flex items-center justify-between">
-          <CardTitle className="text-base">{deal.nom_deal}</CardTitle>
+          <div className="flex items-center gap-2">
+            <Checkbox
+              checked={selected}
+              onClick={(e) => e.stopPropagation()}
+              onCheckedChange={() => onToggleSelect(deal.id)}
+              aria-label={`Sélectionner ${deal.nom_deal}`}
+            />
+            <CardTitle className="text-base">{deal.nom_deal}</CardTitle>
+          </div>
           <Button
             variant="ghost"
             size="sm"
@@ -8,6 +8,8 @@ interface DealColumnProps {
   stageLabel: string;
   deals: Deal[];
   draggedDeal: string | null;
+  selectedDeals: string[];
+  onToggleSelect: (dealId: string) => void;
   onDragStart: (dealId: string) => void;
   onDragEnd: () => void;
   onDrop: (e: React.DragEvent, newStage: string) => void;
@@ -18,6 +20,8 @@ export const DealColumn = ({
   stageLabel,
   deals,
   draggedDeal,
+  selectedDeals,
+  onToggleSelect,
   onDragStart,
   onDragEnd,
   onDrop
@@ -42,6 +46,8 @@ export const DealColumn = ({
             key={deal.id}
             deal={deal}
             draggedDeal={draggedDeal}
+            selected={selectedDeals.includes(deal.id)}
+            onToggleSelect={onToggleSelect}
             onDragStart={onDragStart}
             onDragEnd={onDragEnd}
           />
@@ -7,6 +7,15 @@ import { Deal } from "../types";
 import { DealColumn } from "./DealColumn";
 import { getStageLabel } from "../utils/dealUtils";
 
+// L'API accepte STAGE_MAX_IDS deals par appel
+const STAGE_MAX_IDS = 500;
+
+interface StageChangeResponse {
+  modifies: number;
+  deals: Deal[];
+  ignores: number[];
+}
+
 interface DealPipelineProps {
   deals: Deal[];
   onDealMoved: () => void;
@@ -14,6 +23,13 @@ interface DealPipelineProps {
 
 export const DealPipeline = ({ deals, onDealMoved }: DealPipelineProps) => {
   const [draggedDeal, setDraggedDeal] = useState<string | null>(null);
+  const [selectedDeals, setSelectedDeals] = useState<string[]>([]);
+
+  const handleToggleSelect = (dealId: string) => {
+    setSelectedDeals((prev) =>
+      prev.includes(dealId) ? prev.filter((id) => id !== dealId) : [...prev, dealId]
+    );
+  };
 
   const handleDragStart = (dealId: string) => {
     setDraggedDeal(dealId);
@@ -27,12 +43,21 @@ export const DealPipeline = ({ deals, onDealMoved }: DealPipelineProps) => {
     e.preventDefault();
     if (!draggedDeal) return;
 
+    // Un deal sélectionné entraîne toute la sélection
+    const dealIds = selectedDeals.includes(draggedDeal) ? selectedDeals : [draggedDeal];
+
     try {
-      await apiClient.patch(`/deals/${draggedDeal}/`, {
-        stage: newStage
-      });
+      let modifies = 0;
+      for (let start = 0; start < dealIds.length; start += STAGE_MAX_IDS) {
+        const { data } = await apiClient.post<StageChangeResponse>('/deals/changer_stage/', {
+          ids: dealIds.slice(start, start + STAGE_MAX_IDS).map(Number),
+          stage: newStage
+        });
+        modifies += data.modifies;
+      }
 
-      toast.success("Deal déplacé avec succès !");
+      toast.success(modifies > 1 ? `${modifies} deals déplacés avec succès !` : "Deal déplacé avec succès !");
+      setSelectedDeals([]);
       onDealMoved();
     } catch (error: any) {
       console.error('--- Full Drag & Drop Error ---');
@@ -62,6 +87,8 @@ export const DealPipeline = ({ deals, onDealMoved }: DealPipelineProps) => {
           stageLabel={getStageLabel(stage)}
           deals={stageDeals}
           draggedDeal={draggedDeal}
+          selectedDeals={selectedDeals}
+          onToggleSelect={handleToggleSelect}
           onDragStart={handleDragStart}
           onDragEnd={handleDragEnd}
           onDrop={handleDrop}
@@ -1,3 +1,5 @@
+import { CursorPage } from "@/services/api";
+
 export interface Deal {
   id: string;
   nom_deal: string;
@@ -37,7 +39,7 @@ export interface OffreInfo {
   id: string;
   nom: string;
   plan_commission: string | null;
-  taux_commission: number | null;
+  taux_commission: string | null; // Décimal sérialisé en chaîne ("12.50")
 }
 
 export interface Lead {
@@ -55,7 +57,7 @@ export interface AvailableRelation {
   email: string;
   offre_nom?: string;
   plan_commission?: string;
-  taux_commission?: number;
+  taux_commission?: string | null; // Décimal sérialisé en chaîne ("12.50")
 }
 
 export interface FormData {
@@ -98,4 +100,41 @@ export interface Facture {
   created_at: string;
   updated_at: string;
   fichier?: string | null; // Added file field for upload functionality
-}
\ No newline at end of file
+}
+// Grand livre des commissions (/deals/commission_ledger/) : montants décimaux en chaînes
+export interface CommissionLedgerRow {
+  id: string;
+  nom_deal: string;
+  nom_entreprise: string;
+  type_deal: string;
+  montant: number | null;
+  remporte_le: string | null;
+  created_at: string;
+  date_paiment_client: string | null;
+  date_paiment_commission: string | null;
+  facture: string | null;
+  offre_nom: string | null;
+  plan_commission: string | null;
+  taux_commission: string; // Taux effectif ("12.50")
+  commission: string; // Commission en euros ("125.00")
+}
+
+export interface CommissionLedgerTotaux {
+  nb_deals: number;
+  montant: number;
+  commission: string;
+}
+
+export interface CommissionLedgerGroupe extends CommissionLedgerTotaux {
+  offre_id: string | null;
+  offre_nom: string | null;
+  plan_commission: string | null;
+  mois: string | null;
+}
+
+// Agrégats calculés par le serveur, renvoyés avec la première page seulement
+export interface CommissionLedgerPage extends CursorPage<CommissionLedgerRow> {
+  totaux?: CommissionLedgerTotaux;
+  par_plan?: Record<string, CommissionLedgerTotaux>;
+  groupes?: CommissionLedgerGroupe[];
+}
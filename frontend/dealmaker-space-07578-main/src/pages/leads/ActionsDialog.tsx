@@ -5,12 +5,17 @@ import { Card, CardContent } from "@/components/ui/card";
 import { Plus, Calendar } from "lucide-react";
 import { Lead, Action } from "./utils/leadTypes";
 import { ActionCard } from "./ActionCard";
+import { LoadMoreButton } from "@/components/LoadMoreButton";
 
 interface ActionsDialogProps {
   open: boolean;
   onOpenChange: (open: boolean) => void;
   selectedLead: Lead | null;
   leadActions: Action[];
+  // Actions du lead paginées par curseur
+  hasMoreActions: boolean;
+  loadingMoreActions: boolean;
+  onLoadMoreActions: () => void;
   onOpenActionForm: (action?: Action) => void;
   onMarkActionDone: (actionId: string) => void;
   onMarkActionCancelled: (actionId: string) => void;
@@ -22,6 +27,9 @@ export const ActionsDialog = ({
   onOpenChange,
   selectedLead,
   leadActions,
+  hasMoreActions,
+  loadingMoreActions,
+  onLoadMoreActions,
   onOpenActionForm,
   onMarkActionDone,
   onMarkActionCancelled,
@@ -62,6 +70,7 @@ export const ActionsDialog = ({
                 />
               ))
             )}
+            <LoadMoreButton hasMore={hasMoreActions} loading={loadingMoreActions} onClick={onLoadMoreActions} />
           </div>
         </div>
       </DialogContent>
@@ -6,6 +6,8 @@ import { Dialog, DialogTrigger } from "@/components/ui/dialog";
 import { Plus, Loader2 } from "lucide-react";
 import { toast } from "sonner";
 import apiClient from "@/services/api";
+import { useCursorList } from "@/hooks/use-cursor-list";
+import { LoadMoreButton } from "@/components/LoadMoreButton";
 
 // Import des composants
 import { LeadList } from "./LeadList";
@@ -23,8 +25,9 @@ import {
 } from "./utils/leadTypes";
 
 const Leads = () => {
-  // États principaux
-  const [leads, setLeads] = useState<Lead[]>([]);
+  // États principaux : listes paginées par curseur, complétées par « Charger plus »
+  const leadList = useCursorList<Lead>();
+  const leads = leadList.items;
   const [loading, setLoading] = useState(true);
   const [offres, setOffres] = useState<any[]>([]);
   
@@ -38,7 +41,7 @@ const Leads = () => {
   const [selectedLead, setSelectedLead] = useState<Lead | null>(null);
   const [editingLead, setEditingLead] = useState<Lead | null>(null);
   const [editingAction, setEditingAction] = useState<Action | null>(null);
-  const [leadActions, setLeadActions] = useState<Action[]>([]);
+  const actionList = useCursorList<Action>();
   
   // États pour la soumission
   const [isSubmitting, setIsSubmitting] = useState(false);
@@ -54,22 +57,9 @@ const Leads = () => {
   setLoading(true);
   try {
     console.log("🔄 Loading leads from:", '/leads/');
-    const response = await apiClient.get('/leads/');
-    console.log("✅ Full response object:", response);
-    
-    if (response.data && Array.isArray(response.data)) {
-      setLeads(response.data);
-      console.log("✅ Leads loaded as array:", response.data.length);
-    } else if (response.data && response.data.results) {
-      setLeads(response.data.results);
-      console.log("✅ Leads loaded with pagination:", response.data.results.length);
-    } else if (response.data && response.data.leads) {
-      setLeads(response.data.leads);
-      console.log("✅ Leads loaded with 'leads' key:", response.data.leads.length);
-    } else {
-      console.error("❌ Unknown response structure:", response.data);
-      toast.error("Format de réponse inattendu");
-    }
+    // Première page seulement : la suite via le lien `next` (bouton « Charger plus »)
+    const firstPage = await leadList.load('/leads/');
+    console.log("✅ Leads loaded:", firstPage.length);
   } catch (error: any) {
     console.error('❌ Full error object:', error);
     console.error('❌ Error response:', error.response);
@@ -101,14 +91,22 @@ const Leads = () => {
 
   const loadLeadActions = async (leadId: string) => {
     try {
-      const response = await apiClient.get(`/actions/?lead=${leadId}`);
-      setLeadActions(response.data);
+      await actionList.load('/actions/', { lead: leadId });
     } catch (error: any) {
       console.error('Error loading actions:', error);
       toast.error(error.response?.data?.error || "Erreur lors du chargement des actions");
     }
   };
 
+  const loadMore = async (list: { loadMore: () => Promise<void> }) => {
+    try {
+      await list.loadMore();
+    } catch (error: any) {
+      console.error('Error loading next page:', error);
+      toast.error(error.response?.data?.error || "Erreur lors du chargement de la page suivante");
+    }
+  };
+
   // Gestion des leads
   const handleSubmitLead = async (formData: LeadFormData) => {
     try {
@@ -284,7 +282,8 @@ const Leads = () => {
           <div>
             <h1 className="text-3xl font-bold">Mes Leads</h1>
             <p className="text-muted-foreground mt-1">
-              {leads.length} lead{leads.length > 1 ? 's' : ''} au total
+              {leads.length} lead{leads.length > 1 ? 's' : ''} affiché{leads.length > 1 ? 's' : ''}
+              {leadList.hasMore ? ' (plus disponibles)' : ''}
             </p>
           </div>
           
@@ -310,6 +309,11 @@ const Leads = () => {
           onOpenActions={handleOpenActions}
           onOpenEdit={handleOpenEdit}
         />
+        <LoadMoreButton
+          hasMore={leadList.hasMore}
+          loading={leadList.loadingMore}
+          onClick={() => loadMore(leadList)}
+        />
 
         {/* Dialogs */}
         <LeadEditForm
@@ -324,7 +328,10 @@ const Leads = () => {
           open={actionsDialogOpen}
           onOpenChange={setActionsDialogOpen}
           selectedLead={selectedLead}
-          leadActions={leadActions}
+          leadActions={actionList.items}
+          hasMoreActions={actionList.hasMore}
+          loadingMoreActions={actionList.loadingMore}
+          onLoadMoreActions={() => loadMore(actionList)}
           onOpenActionForm={handleOpenActionForm}
           onMarkActionDone={handleMarkActionDone}
           onMarkActionCancelled={handleMarkActionCancelled}
@@ -1,4 +1,4 @@
-import axios from 'axios';
+import axios, { type InternalAxiosRequestConfig } from 'axios';
 
 const API_BASE_URL = 'http://127.0.0.1:8000/api';
 
@@ -11,6 +11,25 @@ const apiClient = axios.create({
   },
 });
 
+// GET conditionnels : dernière réponse de chaque URL (avec son ETag) gardée en mémoire.
+// La requête suivante envoie If-None-Match ; sur 304 le serveur ne renvoie rien et la
+// réponse en mémoire est resservie. Clé : jeton + URL complète (paramètres compris).
+interface CachedResponse {
+  etag: string;
+  data: unknown;
+}
+
+const etagCache = new Map<string, CachedResponse>();
+
+function etagCacheKey(config: InternalAxiosRequestConfig): string {
+  const token = localStorage.getItem('access_token') ?? '';
+  return `${token} ${apiClient.getUri(config)}`;
+}
+
+export function clearEtagCache() {
+  etagCache.clear();
+}
+
 // Intercepteur pour ajouter automatiquement le token
 apiClient.interceptors.request.use(
   (config) => {
@@ -18,6 +37,14 @@ apiClient.interceptors.request.use(
     if (token) {
       config.headers.Authorization = `Bearer ${token}`;
     }
+    if ((config.method ?? 'get').toLowerCase() === 'get') {
+      const cached = etagCache.get(etagCacheKey(config));
+      if (cached) {
+        config.headers['If-None-Match'] = cached.etag;
+      }
+      // 304 traité comme un succès (voir l'intercepteur de réponse ci-dessous)
+      config.validateStatus = (status) => (status >= 200 && status < 300) || status === 304;
+    }
     return config;
   },
   (error) => {
@@ -25,6 +52,24 @@ apiClient.interceptors.request.use(
   }
 );
 
+apiClient.interceptors.response.use((response) => {
+  if ((response.config.method ?? 'get').toLowerCase() !== 'get') {
+    return response;
+  }
+  const key = etagCacheKey(response.config);
+  if (response.status === 304) {
+    const cached = etagCache.get(key);
+    if (cached) {
+      return { ...response, status: 200, data: cached.data };
+    }
+  }
+  const etag = response.headers['etag'] as string | undefined;
+  if (etag) {
+    etagCache.set(key, { etag, data: response.data });
+  }
+  return response;
+});
+
 // Intercepteur pour gérer les erreurs globalement
 apiClient.interceptors.response.use(
   (response) => response,
@@ -32,6 +77,7 @@ apiClient.interceptors.response.use(
     if (error.response?.status === 401) {
       // Token expiré ou invalide
       localStorage.removeItem('access_token');
+      clearEtagCache();
       window.location.href = '/login'; // Redirection vers login
     }
     return Promise.reject(error);
@@ -49,4 +95,18 @@ apiClient.interceptors.response.use(
   }
 );
 
+// Les listes de l'API sont paginées par curseur : { next, previous, results }.
+export interface CursorPage<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
+// Une page : `url` est la route de la liste (avec `params`) ou un lien `next` reçu,
+// qui contient déjà tous les paramètres de la requête.
+export async function fetchPage<T>(url: string, params?: Record<string, unknown>): Promise<CursorPage<T>> {
+  const response = await apiClient.get<CursorPage<T>>(url, { params });
+  return response.data;
+}
+
 export default apiClient;
\ No newline at end of file